@@ -0,0 +1,100 @@
+import random
+from pathlib import Path
+
+# Deterministic synthetic corpora, so runs on different machines and commits
+# compress exactly the same bytes. Sizes are scaled by a single factor; at
+# scale 1.0 every corpus is a few tens of MB.
+
+WORDS = (
+    "the of and to in is was for on that with as by at from archive file "
+    "data compress folder backup update monitor schedule batch profile level "
+    "stream block chunk index header member entry size time value result"
+).split()
+
+LOG_LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+LOG_SOURCES = ["scheduler", "monitor", "compression", "jobs", "ui", "dedup"]
+
+def _write_text(path, size, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        written = 0
+        while written < size:
+            line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+            line = line.capitalize() + '.\n'
+            f.write(line)
+            written += len(line)
+
+def _write_log(path, size, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        written = 0
+        t = 1_700_000_000
+        while written < size:
+            t += rng.randint(0, 3)
+            line = (f"{t} {rng.choice(LOG_LEVELS):7} [{rng.choice(LOG_SOURCES)}] "
+                    f"request={rng.randrange(1 << 32):08x} took={rng.randint(1, 5000)}ms "
+                    f"bytes={rng.randint(0, 1 << 20)}\n")
+            f.write(line)
+            written += len(line)
+
+def _write_binary(path, size, rng):
+    # Structured binary: repeated records with small random fields, roughly
+    # like executables or databases rather than noise
+    record = bytearray(rng.randbytes(256))
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            for _ in range(8):
+                record[rng.randrange(256)] = rng.randrange(256)
+            f.write(record)
+            f.write(rng.randint(0, 1 << 32).to_bytes(4, 'little') * 4)
+            written += len(record) + 16
+
+def _write_random(path, size, rng):
+    # Stands in for media and other already-compressed data
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            n = min(remaining, 1024 * 1024)
+            f.write(rng.randbytes(n))
+            remaining -= n
+
+def _text(root, scale, rng):
+    return [_make(root / 'document.txt', int(16e6 * scale), _write_text, rng)]
+
+def _logs(root, scale, rng):
+    return [_make(root / f'service-{i}.log', int(8e6 * scale), _write_log, rng) for i in range(3)]
+
+def _binaries(root, scale, rng):
+    return [_make(root / f'program-{i}.bin', int(8e6 * scale), _write_binary, rng) for i in range(2)]
+
+def _media(root, scale, rng):
+    return [_make(root / f'photo-{i}.jpg', int(4e6 * scale), _write_random, rng) for i in range(4)]
+
+def _small_files(root, scale, rng):
+    writers = [_write_text, _write_log, _write_binary]
+    return [
+        _make(root / f'note-{i:05d}.txt', rng.randint(200, 8000), rng.choice(writers), rng)
+        for i in range(max(1, int(2000 * scale)))
+    ]
+
+def _huge_file(root, scale, rng):
+    return [_make(root / 'dump.log', int(96e6 * scale), _write_log, rng)]
+
+def _make(path, size, writer, rng):
+    writer(path, max(1, size), rng)
+    return path
+
+CORPORA = {
+    "text": _text,
+    "logs": _logs,
+    "binaries": _binaries,
+    "media": _media,
+    "small_files": _small_files,
+    "huge_file": _huge_file
+}
+
+def build_corpus(name, root, scale=1.0, seed=0):
+    # Creates the corpus under root/name and returns its files
+    root = Path(root) / name
+    root.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(f"{name}:{seed}")
+    return CORPORA[name](root, scale, rng)
@@ -0,0 +1,83 @@
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.corpus import build_corpus
+from zipper_app.features.compression import Compressor, CompressionProfile
+
+# CPU cost of reading the input. Compresses the same files with inputs read
+# through buffered reads ("read", as the folder monitor still does) and
+# memory-mapped ("mapped": codecs get slices of the mapping, and stored ZIP
+# members are copied into the archive by the kernel), and reports CPU
+# seconds per GB of input for each. Runs in-process with one worker, so the
+# CPU time covers all of the work.
+#
+#   stored    ZIP of already-compressed media, every member stored
+#   deflate   ZIP of logs
+#   xz        a single large log at Maximum
+#
+#   python -m benchmarks.input_io
+#   python -m benchmarks.input_io --case stored --scale 8
+
+CASES = {
+    # name: (corpus, profile)
+    "stored": ("media", CompressionProfile.FAST),
+    "deflate": ("huge_file", CompressionProfile.FAST),
+    "xz": ("huge_file", CompressionProfile.MAXIMUM)
+}
+MODES = {"read": False, "mapped": True}
+
+def measure(files, profile, output, mapped, runs):
+    compressor = Compressor()
+    compressor.map_inputs = mapped
+    cpu = []
+    wall = []
+    for _ in range(runs):
+        Path(output).unlink(missing_ok=True)
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        result = compressor.compress_files(files, output, profile, workers=1)
+        wall.append(time.perf_counter() - start)
+        cpu.append(time.process_time() - start_cpu)
+    return result["bytes"], statistics.median(cpu), statistics.median(wall)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zipper input I/O benchmark")
+    parser.add_argument('--case', choices=sorted(CASES), action='append',
+                        help="case to run, repeatable (default: all)")
+    parser.add_argument('--scale', type=float, default=2.0,
+                        help="corpus size factor (inputs under 4 MiB are never mapped)")
+    parser.add_argument('--runs', type=int, default=3, help="median of this many runs")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    report = {"scale": args.scale, "cases": {}}
+    with tempfile.TemporaryDirectory() as root:
+        for case in args.case or CASES:
+            corpus, profile = CASES[case]
+            files = [str(f) for f in build_corpus(corpus, root, args.scale)]
+            ext = "zip" if profile == CompressionProfile.FAST else "xz"
+            output = str(Path(root) / f"{case}.{ext}")
+            # Warm the page cache, so both modes read from memory
+            measure(files, profile, output, True, 1)
+            results = {}
+            for mode, mapped in MODES.items():
+                size, cpu, wall = measure(files, profile, output, mapped, args.runs)
+                gb = size / 1e9
+                results[mode] = {"cpu_s_per_gb": round(cpu / gb, 3),
+                                 "mb_per_s": round(size / 1e6 / wall, 1)}
+                print(f"{case:8} {mode:7} {cpu / gb:8.2f} CPU s/GB  {size / 1e6 / wall:9.1f} MB/s")
+            saved = 1 - results["mapped"]["cpu_s_per_gb"] / results["read"]["cpu_s_per_gb"]
+            results["cpu_saved"] = round(saved, 3)
+            print(f"{case:8} mapped uses {saved:.0%} less CPU per GB")
+            report["cases"][case] = results
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
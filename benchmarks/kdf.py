@@ -0,0 +1,77 @@
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from zipper_app.features.encryption import EncryptingWriter
+from zipper_app.features.keys import KDF_ITERATIONS, KeyCache, pbkdf2
+
+# Key derivation cost. Reports how long one PBKDF2 derivation takes at several
+# iteration counts, what a cache hit costs, and the time to start N encrypted
+# archives with one password with and without the session key cache.
+#
+#   python -m benchmarks.kdf
+#   python -m benchmarks.kdf --archives 50 --iterations 100000 600000
+
+def time_derivation(iterations, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pbkdf2("benchmark password", b'\0' * 16, iterations)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def time_cache_hit(iterations, runs=1000):
+    cache = KeyCache()
+    password = "benchmark password"
+    cache.prefetch(password, iterations).result()
+    salt = cache.session_salt(password, iterations)
+    start = time.perf_counter()
+    for _ in range(runs):
+        cache.derive(password, salt, iterations)
+    return (time.perf_counter() - start) / runs
+
+def time_archives(count, iterations, cached):
+    # Only the header and one empty segment: this measures key setup
+    start = time.perf_counter()
+    cache = KeyCache()
+    for _ in range(count):
+        if not cached:
+            cache.clear()
+        EncryptingWriter(io.BytesIO(), "benchmark password", iterations=iterations,
+                         keys=cache).close()
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zipper key derivation benchmark")
+    parser.add_argument('--iterations', type=int, nargs='+',
+                        default=[100_000, KDF_ITERATIONS, 2_000_000])
+    parser.add_argument('--archives', type=int, default=20,
+                        help="encrypted archives per batch (default: 20)")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    report = []
+    print(f"{'iterations':>12} {'derive ms':>10} {'hit us':>8} "
+          f"{'batch cold s':>13} {'batch cached s':>15}")
+    for iterations in args.iterations:
+        entry = {
+            "iterations": iterations,
+            "derive_ms": round(time_derivation(iterations, args.runs) * 1000, 2),
+            "cache_hit_us": round(time_cache_hit(iterations) * 1e6, 2),
+            "archives": args.archives,
+            "batch_uncached_s": round(time_archives(args.archives, iterations, False), 3),
+            "batch_cached_s": round(time_archives(args.archives, iterations, True), 3)
+        }
+        report.append(entry)
+        print(f"{iterations:>12} {entry['derive_ms']:>10} {entry['cache_hit_us']:>8} "
+              f"{entry['batch_uncached_s']:>13} {entry['batch_cached_s']:>15}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .corpus import CORPORA, build_corpus
+
+# Runs Compressor.compress_files and extract_files for every profile over the
+# synthetic corpora and records throughput, ratio, peak RSS and wall time.
+# Each measurement runs in a fresh interpreter so peak RSS belongs to that
+# operation alone.
+#
+#   python -m benchmarks.run --scale 0.25
+#   python -m benchmarks.run --save-baseline
+#   python -m benchmarks.run --baseline benchmarks/baseline.json
+
+PROFILES = ["Fast", "Normal", "Maximum", "Zstandard", "LZ4"]
+DEFAULT_BASELINE = Path(__file__).with_name('baseline.json')
+DEFAULT_OUTPUT = Path(__file__).with_name('results.json')
+DEFAULT_TOLERANCE = 0.15   # relative slowdown or RSS growth still accepted
+RATIO_TOLERANCE = 0.02     # ratios are deterministic, so only allow noise
+MIN_WALL = 0.05            # shorter runs are too noisy to compare throughput
+
+def archive_name(profile, files):
+    # Same extensions the main window picks for each profile
+    if profile == "Fast":
+        return "archive.zip"
+    if profile == "Normal":
+        return "archive.7z"
+    ext = {"Zstandard": ".zst", "LZ4": ".lz4"}.get(profile, ".xz")
+    return f"archive.tar{ext}" if len(files) > 1 else f"archive{ext}"
+
+def peak_rss():
+    # Peak resident set size in bytes of this process and its pool workers
+    try:
+        import resource
+    except ImportError:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return max(own, children) * unit
+
+def run_case(operation, source, target, profile, workers):
+    # Executed in the child interpreter; prints one JSON object
+    from zipper_app.features.compression import Compressor
+
+    compressor = Compressor()
+    start = time.perf_counter()
+    if operation == "compress":
+        files = sorted(Path(source).iterdir())
+        result = compressor.compress_files(files, target, profile, workers=workers)
+        nbytes = result["bytes"]
+    else:
+        compressor.extract_files(source, target, workers=workers)
+        nbytes = sum(p.stat().st_size for p in Path(target).rglob('*') if p.is_file())
+    wall = time.perf_counter() - start
+    json.dump({"wall": wall, "bytes": nbytes, "peak_rss": peak_rss()}, sys.stdout)
+
+def _spawn(operation, source, target, profile, workers):
+    cmd = [sys.executable, '-m', 'benchmarks.run', '--case', operation,
+           str(source), str(target), profile]
+    if workers:
+        cmd += ['--workers', str(workers)]
+    root = Path(__file__).resolve().parent.parent
+    proc = subprocess.run(cmd, cwd=root, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{operation} {profile} {source} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout)
+
+def _measure(corpus_dir, profile, workers, scratch):
+    files = sorted(corpus_dir.iterdir())
+    input_bytes = sum(p.stat().st_size for p in files)
+    archive = scratch / archive_name(profile, files)
+    out_dir = scratch / 'extracted'
+    try:
+        compress = _spawn("compress", corpus_dir, archive, profile, workers)
+        archive_size = archive.stat().st_size
+        extract = _spawn("extract", archive, out_dir, profile, workers)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        if archive.exists():
+            archive.unlink()
+
+    def summary(stats):
+        return {
+            "wall_s": round(stats["wall"], 4),
+            "mb_s": round(input_bytes / 1e6 / max(stats["wall"], 1e-9), 2),
+            "peak_rss": stats["peak_rss"]
+        }
+
+    return {
+        "input_bytes": input_bytes,
+        "archive_bytes": archive_size,
+        "files": len(files),
+        "ratio": round(input_bytes / max(archive_size, 1), 4),
+        "compress": summary(compress),
+        "extract": summary(extract)
+    }
+
+def run_suite(corpora, profiles, scale=1.0, workers=None, data_dir=None, log=print):
+    results = {}
+    temp_dir = None
+    if data_dir is None:
+        temp_dir = tempfile.mkdtemp(prefix='zipper-bench-')
+        data_dir = temp_dir
+    data_dir = Path(data_dir)
+    try:
+        for corpus in corpora:
+            corpus_dir = data_dir / corpus
+            if not corpus_dir.is_dir() or not any(corpus_dir.iterdir()):
+                log(f"building corpus {corpus} ...")
+                build_corpus(corpus, data_dir, scale)
+            for profile in profiles:
+                scratch = data_dir / '_scratch'
+                scratch.mkdir(exist_ok=True)
+                try:
+                    entry = _measure(corpus_dir, profile, workers, scratch)
+                except RuntimeError as e:
+                    # Keep going so one broken backend doesn't hide the others
+                    results[f"{corpus}/{profile}"] = {"error": str(e)}
+                    log(f"{corpus:12} {profile:8} FAILED\n{e}")
+                    continue
+                finally:
+                    shutil.rmtree(scratch, ignore_errors=True)
+                results[f"{corpus}/{profile}"] = entry
+                log(f"{corpus:12} {profile:8} ratio {entry['ratio']:7.3f}  "
+                    f"compress {entry['compress']['mb_s']:8.2f} MB/s  "
+                    f"extract {entry['extract']['mb_s']:8.2f} MB/s")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return {
+        "meta": {
+            "scale": scale,
+            "workers": workers,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        "results": results
+    }
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    # Returns a list of human readable regressions against the baseline
+    regressions = []
+    if baseline.get("meta", {}).get("scale") != current["meta"]["scale"]:
+        regressions.append("baseline was recorded at a different --scale; numbers are not comparable")
+        return regressions
+    for key, entry in current["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if "error" in entry:
+            regressions.append(f"{key}: failed")
+            continue
+        if not old or "error" in old:
+            continue
+        if entry["ratio"] < old["ratio"] * (1 - RATIO_TOLERANCE):
+            regressions.append(f"{key}: ratio {old['ratio']} -> {entry['ratio']}")
+        for operation in ("compress", "extract"):
+            new_op, old_op = entry[operation], old[operation]
+            if min(new_op["wall_s"], old_op["wall_s"]) >= MIN_WALL and \
+                    new_op["mb_s"] < old_op["mb_s"] * (1 - tolerance):
+                regressions.append(
+                    f"{key}: {operation} {old_op['mb_s']} -> {new_op['mb_s']} MB/s"
+                )
+            if new_op["peak_rss"] and old_op["peak_rss"] and \
+                    new_op["peak_rss"] > old_op["peak_rss"] * (1 + tolerance):
+                regressions.append(
+                    f"{key}: {operation} peak RSS {old_op['peak_rss'] // 2**20} -> "
+                    f"{new_op['peak_rss'] // 2**20} MiB"
+                )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zipper compression benchmarks")
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                        help="corpus to run (repeatable, default: all)")
+    parser.add_argument('--profile', action='append', choices=PROFILES,
+                        help="profile to run (repeatable, default: all)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="corpus size factor (default: 1.0)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--data-dir', help="keep generated corpora here between runs")
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT))
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--case', nargs=4, metavar=('OP', 'SOURCE', 'TARGET', 'PROFILE'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        operation, source, target, profile = args.case
+        run_case(operation, source, target, profile, args.workers)
+        return 0
+
+    report = run_suite(args.corpus or list(CORPORA), args.profile or PROFILES,
+                       args.scale, args.workers, args.data_dir)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (use --save-baseline to create one)")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("no regressions against baseline")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
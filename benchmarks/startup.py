@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Import-time benchmark with a budget. Every target is imported in a fresh
+# interpreter several times; the median import time must stay within its
+# budget and none of the backends that should load lazily may show up in
+# sys.modules. Exits with 1 when a budget is broken, so it can gate CI.
+#
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --budget-scale 2   # slower machine
+
+LAZY_BACKENDS = ("py7zr", "cryptography", "watchdog", "zstandard", "lz4")
+
+TARGETS = {
+    # name: (module, budget in ms, modules that must not be loaded)
+    "cli": ("zipper_app.cli", 150, LAZY_BACKENDS + ("PyQt6",)),
+    "compression": ("zipper_app.features.compression", 150, LAZY_BACKENDS + ("PyQt6",)),
+    "gui": ("zipper", 400, LAZY_BACKENDS)
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+json.dump({{"ms": elapsed * 1000, "modules": sorted(sys.modules)}}, sys.stdout)
+"""
+
+def measure(module, runs=5):
+    root = Path(__file__).resolve().parent.parent
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    times = []
+    modules = set()
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)],
+                              cwd=root, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+        data = json.loads(proc.stdout)
+        times.append(data["ms"])
+        modules.update(data["modules"])
+    return statistics.median(times), modules
+
+def check(targets, runs=5, budget_scale=1.0, log=print):
+    # Returns (report, failures)
+    report = {}
+    failures = []
+    for name in targets:
+        module, budget, forbidden = TARGETS[name]
+        try:
+            ms, modules = measure(module, runs)
+        except RuntimeError as e:
+            failures.append(f"{name}: {e}")
+            continue
+        budget *= budget_scale
+        leaked = sorted(m for m in forbidden if m in modules)
+        report[name] = {"module": module, "ms": round(ms, 1), "budget_ms": budget,
+                        "leaked": leaked}
+        log(f"{name:12} {ms:7.1f} ms  (budget {budget:.0f} ms)"
+            + (f"  loads {', '.join(leaked)}" if leaked else ""))
+        if ms > budget:
+            failures.append(f"{name}: import took {ms:.1f} ms, budget is {budget:.0f} ms")
+        if leaked:
+            failures.append(f"{name}: eagerly imports {', '.join(leaked)}")
+    return report, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zipper import-time budget")
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS),
+                        help="target to check (repeatable, default: all)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help="multiply every budget, e.g. for slow CI machines")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    report, failures = check(args.target or list(TARGETS), args.runs, args.budget_scale)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"results": report, "failures": failures}, f, indent=2)
+    for line in failures:
+        print(f"OVER BUDGET {line}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
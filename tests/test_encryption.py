@@ -0,0 +1,124 @@
+import filecmp
+import io
+import os
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from zipper_app.features.compression import (Compressor, CompressionProfile,
+                                             FRAME_PROFILES)
+from zipper_app.features.encryption import (HEADER_SIZE, TAG_SIZE, DamagedArchiveError,
+                                            DecryptingReader, DecryptionError,
+                                            EncryptingWriter, is_encrypted)
+from zipper_app.features.keys import MIN_KDF_ITERATIONS, KeyCache
+
+# The AEAD stage: every profile round-trips through an encrypted archive,
+# and a wrong password, a damaged segment or a cut-off end never yield
+# plaintext. The cheapest allowed KDF keeps the tests quick.
+
+PASSWORD = "correct horse"
+SEGMENT = 4096
+
+def _extension(profile):
+    if profile == CompressionProfile.FAST:
+        return ".zip"
+    if profile == CompressionProfile.NORMAL:
+        return ".7z"
+    return ".tar" + FRAME_PROFILES.get(profile, ".xz")
+
+@pytest.fixture
+def keys():
+    return KeyCache()
+
+@pytest.fixture
+def sealed(keys):
+    # Five full segments and a short last one
+    plain = os.urandom(5 * SEGMENT + 100)
+    buf = io.BytesIO()
+    with EncryptingWriter(buf, PASSWORD, SEGMENT, MIN_KDF_ITERATIONS, keys) as enc:
+        enc.write(plain)
+    return plain, buf.getvalue()
+
+def _open(data, keys, password=PASSWORD):
+    return io.BufferedReader(DecryptingReader(io.BytesIO(data), password, keys=keys), SEGMENT)
+
+def _read(data, keys, password=PASSWORD):
+    with _open(data, keys, password) as reader:
+        return reader.read()
+
+@pytest.mark.parametrize("profile", [
+    CompressionProfile.FAST, CompressionProfile.NORMAL, CompressionProfile.MAXIMUM,
+    CompressionProfile.ZSTANDARD, CompressionProfile.LZ4
+])
+def test_round_trip(tmp_path, profile):
+    source = tmp_path / "src"
+    (source / "sub").mkdir(parents=True)
+    files = [source / "notes.txt", source / "sub" / "random.bin", source / "empty"]
+    files[0].write_bytes(b"the same line again\n" * 50000)
+    files[1].write_bytes(os.urandom(300 * 1024))
+    files[2].write_bytes(b"")
+    archive = tmp_path / f"out{_extension(profile)}.enc"
+
+    compressor = Compressor(kdf_iterations=MIN_KDF_ITERATIONS)
+    compressor.compress_files(files, archive, profile, workers=2, password=PASSWORD)
+    assert is_encrypted(archive)
+    assert b"the same line again" not in archive.read_bytes()
+
+    output = tmp_path / "out"
+    compressor.extract_files(archive, output, password=PASSWORD)
+    for file in files:
+        assert filecmp.cmp(file, output / file.name, shallow=False)
+
+def test_round_trip_segments(sealed, keys):
+    plain, data = sealed
+    assert len(data) == HEADER_SIZE + len(plain) + 6 * TAG_SIZE
+    assert _read(data, keys) == plain
+    with _open(data, keys) as reader:
+        reader.seek(3 * SEGMENT - 10)
+        assert reader.read(20) == plain[3 * SEGMENT - 10:3 * SEGMENT + 10]
+
+def test_wrong_password(sealed, keys):
+    _, data = sealed
+    with pytest.raises(DecryptionError) as excinfo:
+        _read(data, keys, "wrong horse")
+    assert not isinstance(excinfo.value, DamagedArchiveError)
+
+def test_wrong_password_archive(tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_bytes(b"secret" * 1000)
+    archive = tmp_path / "a.zip.enc"
+    compressor = Compressor(kdf_iterations=MIN_KDF_ITERATIONS)
+    compressor.compress_files([source], archive, CompressionProfile.FAST, password=PASSWORD)
+    with pytest.raises(DecryptionError):
+        compressor.extract_files(archive, tmp_path / "out", password="wrong horse")
+    assert not (tmp_path / "out").exists()
+
+def test_flipped_byte_in_middle_segment(sealed, keys):
+    plain, data = sealed
+    damaged = bytearray(data)
+    damaged[HEADER_SIZE + 2 * (SEGMENT + TAG_SIZE) + 123] ^= 0x01
+    with _open(bytes(damaged), keys) as reader:
+        # Segments before the damage still read
+        assert reader.read(2 * SEGMENT) == plain[:2 * SEGMENT]
+        with pytest.raises(DamagedArchiveError, match="segment 2"):
+            reader.read()
+
+@pytest.mark.parametrize("cut", [
+    1,                  # inside the final segment
+    100 + TAG_SIZE,     # the whole final segment, at a segment boundary
+    100 + TAG_SIZE + 1  # into the segment before it
+])
+def test_truncated_final_segment(sealed, keys, cut):
+    _, data = sealed
+    with pytest.raises(DamagedArchiveError):
+        _read(data[:-cut], keys)
+
+def test_reordered_segments(sealed, keys):
+    _, data = sealed
+    stride = SEGMENT + TAG_SIZE
+    first = HEADER_SIZE + stride
+    swapped = (data[:first] + data[first + stride:first + 2 * stride] +
+               data[first:first + stride] + data[first + 2 * stride:])
+    with pytest.raises(DamagedArchiveError):
+        _read(swapped, keys)
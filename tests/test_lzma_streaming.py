@@ -0,0 +1,71 @@
+import hashlib
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+resource = pytest.importorskip("resource")
+
+# Maximum compresses and extracts in fixed-size chunks, so peak memory must
+# not follow the size of the input. Each size runs in a fresh interpreter,
+# as ru_maxrss only ever goes up within a process.
+
+ROOT = Path(__file__).resolve().parent.parent
+MB = 1024 * 1024
+SMALL = 64 * MB
+LARGE = 320 * MB
+# Allowed growth of peak RSS between the two runs; buffering the input
+# would add about LARGE - SMALL
+RSS_SLACK = 32 * MB
+
+_ROUND_TRIP = """
+import json, resource, sys
+from zipper_app.features.compression import Compressor, CompressionProfile
+source, archive, output = sys.argv[1:]
+compressor = Compressor()
+# Mapped pages count towards RSS while they are read; measure the buffers
+compressor.map_inputs = False
+compressor.compress_files([source], archive, CompressionProfile.MAXIMUM, workers=1)
+compressor.extract_files(archive, output, workers=1)
+scale = 1 if sys.platform == 'darwin' else 1024
+json.dump({"max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale}, sys.stdout)
+"""
+
+def _make_input(path, size):
+    # Sparse, with a little random data every 16 MB so misplaced chunks show
+    with open(path, 'wb') as f:
+        f.truncate(size)
+        for offset in range(0, size, 16 * MB):
+            f.seek(offset)
+            f.write(hashlib.sha256(str(offset).encode()).digest() * 128)
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(MB), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _round_trip(tmp_path, size):
+    work = tmp_path / str(size)
+    work.mkdir()
+    source = work / "input.bin"
+    _make_input(source, size)
+    archive = work / "input.bin.xz"
+    output = work / "out"
+    proc = subprocess.run([sys.executable, '-c', _ROUND_TRIP, str(source), str(archive),
+                           str(output)], cwd=ROOT, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert archive.stat().st_size < size
+    assert _digest(output / source.name) == _digest(source)
+    return json.loads(proc.stdout)["max_rss"]
+
+def test_round_trip_memory_does_not_grow_with_input(tmp_path):
+    small = _round_trip(tmp_path, SMALL)
+    large = _round_trip(tmp_path, LARGE)
+    assert large - small < RSS_SLACK, (
+        f"peak RSS grew by {(large - small) / MB:.0f} MB for "
+        f"{(LARGE - SMALL) / MB:.0f} MB more input"
+    )
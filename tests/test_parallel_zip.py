@@ -0,0 +1,78 @@
+import os
+import random
+import zipfile
+import zlib
+
+import pytest
+
+from zipper_app.features.compression import Compressor, CompressionProfile
+
+# ZIP members deflated in a process pool and stitched in order must give the
+# same archive as the serial writer: valid CRCs, the same sizes and
+# methods, and byte-identical extraction, including an empty member and
+# members stored as they are.
+
+def _inputs(root):
+    root.mkdir()
+    rng = random.Random(2)
+    files = []
+    for i in range(12):
+        path = root / f"text{i:02d}.txt"
+        path.write_bytes(b"".join(b"line %d of file %d\n" % (n, i)
+                                  for n in range(rng.randint(10, 20000))))
+        files.append(path)
+    empty = root / "empty.txt"
+    empty.write_bytes(b"")
+    photo = root / "photo.jpg"     # stored by extension
+    photo.write_bytes(os.urandom(200 * 1024))
+    noise = root / "noise.bin"     # stored after the trial compression
+    noise.write_bytes(os.urandom(300 * 1024))
+    large = root / "large.log"     # memory-mapped while read
+    large.write_bytes(b"0123456789abcdef" * (320 * 1024))
+    files[3:3] = [empty, photo]
+    return files + [noise, large]
+
+@pytest.mark.parametrize("map_inputs", [True, False])
+def test_parallel_matches_serial(tmp_path, map_inputs):
+    files = _inputs(tmp_path / "src")
+    compressor = Compressor()
+    compressor.map_inputs = map_inputs
+    serial = tmp_path / "serial.zip"
+    parallel = tmp_path / "parallel.zip"
+    compressor.compress_files(files, serial, CompressionProfile.FAST, workers=1)
+    result = compressor.compress_files(files, parallel, CompressionProfile.FAST, workers=3)
+    assert [m["name"] for m in result["members"]] == [f.name for f in files]
+
+    with zipfile.ZipFile(serial) as a, zipfile.ZipFile(parallel) as b:
+        assert b.testzip() is None
+        assert b.namelist() == [f.name for f in files]
+        for x, y in zip(a.infolist(), b.infolist()):
+            assert (y.filename, y.CRC, y.file_size, y.compress_type) == \
+                (x.filename, x.CRC, x.file_size, x.compress_type)
+        methods = {info.filename: info.compress_type for info in b.infolist()}
+    assert methods["empty.txt"] == zipfile.ZIP_STORED
+    assert methods["photo.jpg"] == zipfile.ZIP_STORED
+    assert methods["noise.bin"] == zipfile.ZIP_STORED
+    assert methods["text00.txt"] == zipfile.ZIP_DEFLATED
+    assert methods["large.log"] == zipfile.ZIP_DEFLATED
+
+    output = tmp_path / "out"
+    compressor.extract_files(parallel, output, workers=2)
+    with zipfile.ZipFile(parallel) as zf:
+        for file in files:
+            data = file.read_bytes()
+            assert (output / file.name).read_bytes() == data
+            info = zf.getinfo(file.name)
+            assert info.CRC == zlib.crc32(data)
+            assert info.file_size == len(data)
+
+def test_parallel_without_adaptive(tmp_path):
+    files = _inputs(tmp_path / "src")
+    archive = tmp_path / "all.zip"
+    Compressor().compress_files(files, archive, CompressionProfile.FAST, workers=2,
+                                adaptive=False)
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.testzip() is None
+        assert all(info.compress_type == zipfile.ZIP_DEFLATED for info in zf.infolist())
+        for file in files:
+            assert zf.read(file.name) == file.read_bytes()
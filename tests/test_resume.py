@@ -0,0 +1,95 @@
+import filecmp
+
+import pytest
+
+from zipper_app.features import compression, journal
+from zipper_app.features.compression import Compressor, CompressionProfile, JobInterrupted
+from zipper_app.features.journal import JOURNAL_SUFFIX, read_job
+from zipper_app.features.keys import MIN_KDF_ITERATIONS
+
+# A resumable job interrupted after some members picks up from its journal:
+# the members already in the partial archive are not compressed again, the
+# finished archive round-trips, and nothing of the journal is left over.
+
+COUNT = 8
+INTERRUPT_AFTER = 3
+SIZE = 10 * 1024
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    # A checkpoint after every member
+    monkeypatch.setattr(journal, "CHECKPOINT_BYTES", 1)
+    source = tmp_path / "src"
+    source.mkdir()
+    files = []
+    for i in range(COUNT):
+        path = source / f"f{i}.txt"
+        path.write_bytes(f"member {i} ".encode() * (SIZE // 10))
+        files.append(path)
+    return files
+
+@pytest.fixture
+def decided(monkeypatch):
+    # The inputs that get compressed, in order
+    names = []
+    decide = compression._decide
+    def spy(file_path, adaptive):
+        names.append(str(file_path))
+        return decide(file_path, adaptive)
+    monkeypatch.setattr(compression, "_decide", spy)
+    return names
+
+def _interrupt_after(nbytes):
+    def progress(done, total, *rate):
+        if done > nbytes:
+            raise JobInterrupted()
+    return progress
+
+def _leftovers(folder):
+    return [p.name for p in folder.iterdir()
+            if ".partial" in p.name or p.name.endswith(JOURNAL_SUFFIX)]
+
+@pytest.mark.parametrize("profile, name, password", [
+    (CompressionProfile.FAST, "out.zip", None),
+    (CompressionProfile.MAXIMUM, "out.tar.xz", None),
+    (CompressionProfile.FAST, "out.zip.enc", "secret"),
+])
+def test_resume_after_interrupt(tmp_path, files, decided, profile, name, password):
+    archive = tmp_path / name
+    compressor = Compressor(kdf_iterations=MIN_KDF_ITERATIONS)
+    with pytest.raises(JobInterrupted):
+        compressor.compress_files(files, archive, profile, workers=1, password=password,
+                                  resumable=True,
+                                  progress=_interrupt_after(INTERRUPT_AFTER * SIZE))
+    assert not archive.exists()
+    assert read_job(archive)["committed"] == INTERRUPT_AFTER
+
+    decided.clear()
+    result = compressor.compress_files(files, archive, profile, workers=1, password=password,
+                                       resumable=True)
+    assert result["resumed"] == INTERRUPT_AFTER
+    assert decided == [str(f) for f in files[INTERRUPT_AFTER:]]
+    assert [m["name"] for m in result["members"]] == [f.name for f in files]
+    assert _leftovers(tmp_path) == []
+
+    output = tmp_path / "out"
+    compressor.extract_files(archive, output, password=password)
+    assert sorted(p.name for p in output.iterdir()) == sorted(f.name for f in files)
+    for file in files:
+        assert filecmp.cmp(file, output / file.name, shallow=False)
+
+def test_resume_after_change_starts_over(tmp_path, files, decided):
+    archive = tmp_path / "out.zip"
+    compressor = Compressor()
+    with pytest.raises(JobInterrupted):
+        compressor.compress_files(files, archive, CompressionProfile.FAST, workers=1,
+                                  resumable=True,
+                                  progress=_interrupt_after(INTERRUPT_AFTER * SIZE))
+    files[0].write_bytes(b"changed since")
+
+    decided.clear()
+    result = compressor.compress_files(files, archive, CompressionProfile.FAST, workers=1,
+                                       resumable=True)
+    assert result["resumed"] == 0
+    assert decided == [str(f) for f in files]
+    assert _leftovers(tmp_path) == []
@@ -0,0 +1,121 @@
+import fnmatch
+from pathlib import PurePosixPath
+
+import pytest
+
+from zipper_app.features.rules import FileRules, PatternSet
+
+# The compiled rules must decide exactly like the per-pattern Path.match
+# filter they replaced, and like fnmatch for ignored directory names.
+
+ROOT = "/data/watch"
+
+PATHS = [
+    "/data/watch/report.txt",
+    "/data/watch/REPORT.TXT",
+    "/data/watch/archive.tar.gz",
+    "/data/watch/notes.txt.bak",
+    "/data/watch/.txt",
+    "/data/watch/txt",
+    "/data/watch/file1.txt",
+    "/data/watch/file12.txt",
+    "/data/watch/a.log",
+    "/data/watch/b.log",
+    "/data/watch/x/y",
+    "/data/watch/xay",
+    "/data/watch/[abc.txt",
+    "/data/watch/logs/app.log",
+    "/data/watch/mylogs/app.log",
+    "/data/watch/logs/2024/app.log",
+    "/data/watch/src/main.c",
+    "/data/watch/src/main.h",
+    "/data/watch/src/main.cpp",
+    "/data/watch/node_modules/pkg/index.js",
+    "/data/watch/.git/objects/ab/cdef",
+    "/data/watch/build-1/out.o",
+    "/data/watch/deep/tmp/cache.part",
+    "/data/watch/photo.jpeg.part",
+    "/data/node_modules/outside.txt",
+]
+
+PATTERNS = [
+    "*",
+    "*.txt",
+    "*.TXT",
+    "*.gz",
+    "*.tar.gz",
+    "*.bak",
+    "file?.txt",
+    "file*.txt",
+    "[ab].log",
+    "[!a].log",
+    "[a-c]*",
+    "x[!a]y",
+    "x?y",
+    "[abc.txt",
+    "logs/*.log",
+    "logs/*",
+    "*/*.log",
+    "/data/watch/*.txt",
+    "/data/watch/logs/*.log",
+    "src/*.[ch]",
+    "*.c*",
+    "deep/*/*.part",
+    "*.part",
+]
+
+def _path_match(path, patterns):
+    return any(PurePosixPath(path).match(pattern) for pattern in patterns)
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_pattern_matches_like_path_match(pattern):
+    patterns = PatternSet([pattern])
+    for path in PATHS:
+        name = path.rsplit('/', 1)[1]
+        assert patterns.match(path, name) == _path_match(path, [pattern]), path
+
+@pytest.mark.parametrize("include, exclude", [
+    (["*.txt", "*.log"], []),
+    (["*.txt", "file?.txt", "logs/*.log"], ["*.bak"]),
+    (["*"], ["*.part", "*.tmp", "[ab].log"]),
+    ([], ["*.txt"]),
+    (["src/*.[ch]", "*.tar.gz"], ["main.*"]),
+    ([], []),
+])
+def test_include_exclude(include, exclude):
+    rules = FileRules(include, exclude, root=ROOT)
+    for path in PATHS:
+        expected = (not include or _path_match(path, include)) and \
+            not _path_match(path, exclude)
+        assert rules.match_name(path) == expected, path
+
+@pytest.mark.parametrize("ignore_dirs", [
+    ["node_modules"],
+    [".git", "node_modules"],
+    ["build-*"],
+    ["tmp", "logs"],
+    ["2024", "[xy]"],
+    ["/node_modules/", " .git "],
+])
+def test_ignore_dirs(ignore_dirs):
+    rules = FileRules(ignore_dirs=ignore_dirs, root=ROOT)
+    names = [d.strip().strip('/') for d in ignore_dirs]
+    for path in PATHS:
+        if not path.startswith(ROOT + '/'):
+            continue
+        parts = path[len(ROOT) + 1:].split('/')
+        ignored = any(fnmatch.fnmatchcase(part, name) for part in parts[:-1] for name in names)
+        assert rules.match_name(path) != ignored, path
+        parent = path.rsplit('/', 1)[0]
+        assert rules.ignores_dir(parent) == ignored, path
+
+def test_ignore_dirs_above_root():
+    # Directories above the monitored folder never count
+    rules = FileRules(ignore_dirs=["data", "watch"], root=ROOT)
+    assert rules.match_name("/data/watch/report.txt")
+    assert not rules.match_name("/data/watch/watch/report.txt")
+
+def test_empty_patterns_are_skipped():
+    assert not PatternSet(["", "  "])
+    assert FileRules(["", "*.txt"]).match_name("/a/b.txt")
+    assert not FileRules(["", "*.txt"]).match_name("/a/b.log")
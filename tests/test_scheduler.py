@@ -0,0 +1,158 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("PyQt6.QtCore")
+
+from zipper_app.features.scheduler import (CATCH_UP_GRACE, CATCH_UP_RUN, CATCH_UP_SKIP,
+                                           QUEUED, RUNNING, JobSchedule, in_window,
+                                           parse_window, window_closes, window_opens)
+
+# Time windows, due-job ordering and catch-up after a restart, against a
+# fixed clock. Times are local, on days without a DST change.
+
+def at(hhmm, day=10):
+    hours, minutes = map(int, hhmm.split(':'))
+    return datetime(2026, 6, day, hours, minutes).timestamp()
+
+@pytest.mark.parametrize("window, when, expected", [
+    (None, "12:00", True),
+    ("01:00-05:00", "00:59", False),
+    ("01:00-05:00", "01:00", True),
+    ("01:00-05:00", "04:59", True),
+    ("01:00-05:00", "05:00", False),
+    ("01:00-05:00", "13:00", False),
+    # Past midnight
+    ("22:00-02:00", "21:59", False),
+    ("22:00-02:00", "22:00", True),
+    ("22:00-02:00", "23:59", True),
+    ("22:00-02:00", "00:00", True),
+    ("22:00-02:00", "01:59", True),
+    ("22:00-02:00", "02:00", False),
+    # Start == end is open all day
+    ("08:00-08:00", "08:00", True),
+    ("08:00-08:00", "07:59", True),
+    ("00:00-00:00", "23:59", True),
+])
+def test_in_window(window, when, expected):
+    assert in_window(window, at(when)) is expected
+
+@pytest.mark.parametrize("window, when, expected", [
+    (None, at("12:00"), at("12:00")),
+    ("01:00-05:00", at("00:30"), at("01:00")),
+    ("01:00-05:00", at("02:15"), at("02:15")),
+    ("01:00-05:00", at("05:00"), at("01:00", day=11)),
+    ("01:00-05:00", at("12:00"), at("01:00", day=11)),
+    ("22:00-02:00", at("12:00"), at("22:00")),
+    ("22:00-02:00", at("23:00"), at("23:00")),
+    ("22:00-02:00", at("01:00"), at("01:00")),
+    ("22:00-02:00", at("02:00"), at("22:00")),
+    ("08:00-08:00", at("03:00"), at("03:00")),
+])
+def test_window_opens(window, when, expected):
+    assert window_opens(window, when) == expected
+
+@pytest.mark.parametrize("window, when, expected", [
+    (None, at("12:00"), None),
+    ("08:00-08:00", at("12:00"), None),
+    ("01:00-05:00", at("01:00"), at("05:00")),
+    ("01:00-05:00", at("04:59"), at("05:00")),
+    ("22:00-02:00", at("22:30"), at("02:00", day=11)),
+    ("22:00-02:00", at("00:30", day=11), at("02:00", day=11)),
+])
+def test_window_closes(window, when, expected):
+    assert window_closes(window, when) == expected
+
+@pytest.mark.parametrize("window", ["", "01:00", "1-2", "25:00-01:00", "01:60-02:00",
+                                    "a:b-c:d"])
+def test_invalid_window(window):
+    with pytest.raises(ValueError):
+        parse_window(window)
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return Clock(at("12:00"))
+
+@pytest.fixture
+def schedule(tmp_path, clock):
+    return JobSchedule(tmp_path / "schedule.json", clock)
+
+def _add(schedule, name, **options):
+    return schedule.add([f"/data/{name}"], f"/out/{name}.zip", "Fast", **options)
+
+def test_take_due_order(schedule, clock):
+    jobs = {
+        "low-early": _add(schedule, "a", when=at("09:00"), priority=0),
+        "high-late": _add(schedule, "b", when=at("11:00"), priority=5),
+        "high-early": _add(schedule, "c", when=at("10:00"), priority=5),
+        "low-late": _add(schedule, "d", when=at("11:30"), priority=0),
+        "tie": _add(schedule, "e", when=at("09:00"), priority=0),
+        "future": _add(schedule, "f", when=at("13:00"), priority=9),
+        "closed": _add(schedule, "g", when=at("08:00"), priority=9, window="01:00-05:00"),
+    }
+    ids = {job_id: name for name, job_id in jobs.items()}
+    taken = schedule.take_due(3)
+    assert [ids[job["id"]] for job in taken] == ["high-early", "high-late", "low-early"]
+    assert all(job["state"] == RUNNING and job["started"] for job in taken)
+    taken = schedule.take_due(10)
+    assert [ids[job["id"]] for job in taken] == ["tie", "low-late"]
+    assert schedule.take_due(10) == []
+
+    clock.now = at("13:00")
+    assert [ids[job["id"]] for job in schedule.take_due(10)] == ["future"]
+    assert schedule.next_start() == at("01:00", day=11)
+
+def test_take_due_ready(schedule):
+    held = _add(schedule, "a", when=at("10:00"), priority=1)
+    free = _add(schedule, "b", when=at("11:00"))
+    taken = schedule.take_due(1, ready=lambda job: job["id"] != held)
+    assert [job["id"] for job in taken] == [free]
+    assert schedule.jobs[held]["state"] == QUEUED
+    assert [job["id"] for job in schedule.take_due(1)] == [held]
+
+def test_take_due_persists(schedule, tmp_path, clock):
+    job_id = _add(schedule, "a", when=at("10:00"))
+    schedule.take_due(1)
+    reloaded = JobSchedule(tmp_path / "schedule.json", clock)
+    assert reloaded.jobs[job_id]["state"] == RUNNING
+
+# A queued job found by the start at `now`
+@pytest.mark.parametrize("catch_up, when, window, started, now, kept", [
+    # Missed by more than the grace period
+    (CATCH_UP_RUN, at("10:00"), None, False, at("12:00"), True),
+    (CATCH_UP_SKIP, at("10:00"), None, False, at("12:00"), False),
+    # Late by less than the grace period
+    (CATCH_UP_SKIP, at("10:00"), None, False, at("10:00") + CATCH_UP_GRACE - 1, True),
+    # Not due yet
+    (CATCH_UP_SKIP, at("13:00"), None, False, at("12:00"), True),
+    # Due, but its window only opens later
+    (CATCH_UP_SKIP, at("10:00"), "22:00-02:00", False, at("21:00"), True),
+    # Its window opened and went by while closed
+    (CATCH_UP_SKIP, at("10:00"), "22:00-02:00", False, at("03:00", day=11), False),
+    # Had started before; its journal resumes it
+    (CATCH_UP_SKIP, at("10:00"), None, True, at("12:00"), True),
+])
+def test_recover(schedule, clock, catch_up, when, window, started, now, kept):
+    job_id = _add(schedule, "a", when=when, window=window, catch_up=catch_up)
+    schedule.jobs[job_id]["started"] = started
+    clock.now = now
+    missed = schedule.recover()
+    assert (job_id in schedule.jobs) is kept
+    assert [job["id"] for job in missed] == ([] if kept else [job_id])
+
+def test_recover_requeues_running(schedule, clock, tmp_path):
+    job_id = _add(schedule, "a", when=at("10:00"), catch_up=CATCH_UP_SKIP)
+    assert schedule.take_due(1)
+    # Closed while running, started again the next day
+    clock.now = at("12:00", day=11)
+    restarted = JobSchedule(tmp_path / "schedule.json", clock)
+    assert restarted.recover() == []
+    assert restarted.jobs[job_id]["state"] == QUEUED
+    assert [job["id"] for job in restarted.take_due(1)] == [job_id]
@@ -0,0 +1,12 @@
+import os
+from benchmarks import startup
+
+# The import-time budget of benchmarks/startup.py, as a test: fails when a
+# target imports too slowly or loads a backend that should wait for first
+# use. ZIPPER_BUDGET_SCALE relaxes the budgets on slow machines, like
+# --budget-scale.
+
+def test_import_budget():
+    scale = float(os.environ.get("ZIPPER_BUDGET_SCALE", "1"))
+    _, failures = startup.check(list(startup.TARGETS), budget_scale=scale, log=lambda line: None)
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,88 @@
+import filecmp
+import shutil
+
+import pytest
+
+from zipper_app.features.compression import Compressor, CompressionProfile
+from zipper_app.features.manifest import manifest_path
+
+# "Only update changed files": each way of bringing an archive up to date
+# must leave one that extracts to exactly the current set of files.
+
+ARCHIVES = [(CompressionProfile.FAST, "out.zip"), (CompressionProfile.NORMAL, "out.7z")]
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    for i in range(4):
+        (source / f"f{i}.txt").write_bytes(f"file {i}\n".encode() * 2000)
+    return source
+
+def _files(source):
+    return sorted(source.iterdir())
+
+def _update(archive, source, profile):
+    result = Compressor().compress_files(_files(source), archive, profile, workers=2,
+                                         update=True)
+    return result["update"]
+
+def _check(archive, source, tmp_path):
+    output = tmp_path / "out"
+    shutil.rmtree(output, ignore_errors=True)
+    Compressor().extract_files(archive, output)
+    assert sorted(p.name for p in output.iterdir()) == [f.name for f in _files(source)]
+    for file in _files(source):
+        assert filecmp.cmp(file, output / file.name, shallow=False)
+
+@pytest.mark.parametrize("profile, name", ARCHIVES)
+def test_rebuilt_without_manifest(tmp_path, source, profile, name):
+    archive = tmp_path / name
+    summary = _update(archive, source, profile)
+    assert summary["mode"] == "rebuilt"
+    assert manifest_path(archive).exists()
+    _check(archive, source, tmp_path)
+
+@pytest.mark.parametrize("profile, name", ARCHIVES)
+def test_unchanged(tmp_path, source, profile, name):
+    archive = tmp_path / name
+    _update(archive, source, profile)
+    before = archive.read_bytes()
+    summary = _update(archive, source, profile)
+    assert summary["mode"] == "unchanged"
+    assert summary["unchanged"] == 4
+    assert archive.read_bytes() == before
+    _check(archive, source, tmp_path)
+
+@pytest.mark.parametrize("profile, name", ARCHIVES)
+def test_appended(tmp_path, source, profile, name):
+    archive = tmp_path / name
+    _update(archive, source, profile)
+    (source / "new1.txt").write_bytes(b"added later\n" * 500)
+    (source / "new2.txt").write_bytes(b"and another one\n" * 500)
+    summary = _update(archive, source, profile)
+    assert summary["mode"] == "appended"
+    assert sorted(summary["added"]) == ["new1.txt", "new2.txt"]
+    _check(archive, source, tmp_path)
+    # The appended archive can be appended to again
+    (source / "new3.txt").write_bytes(b"third\n" * 500)
+    assert _update(archive, source, profile)["mode"] == "appended"
+    _check(archive, source, tmp_path)
+
+@pytest.mark.parametrize("profile, name, mode", [
+    (CompressionProfile.FAST, "out.zip", "rewritten"),
+    # py7zr cannot replace members, so 7z archives are built again
+    (CompressionProfile.NORMAL, "out.7z", "rebuilt"),
+])
+def test_changed_and_removed(tmp_path, source, profile, name, mode):
+    archive = tmp_path / name
+    _update(archive, source, profile)
+    (source / "f1.txt").write_bytes(b"different content\n" * 3000)
+    (source / "f2.txt").unlink()
+    (source / "new.txt").write_bytes(b"new\n" * 100)
+    summary = _update(archive, source, profile)
+    assert summary["mode"] == mode
+    assert summary["changed"] == ["f1.txt"]
+    assert summary["removed"] == ["f2.txt"]
+    assert summary["added"] == ["new.txt"]
+    _check(archive, source, tmp_path)
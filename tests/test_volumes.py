@@ -0,0 +1,125 @@
+import filecmp
+import io
+import os
+import random
+
+import pytest
+
+from zipper_app.features.compression import Compressor, CompressionProfile
+from zipper_app.features.keys import MIN_KDF_ITERATIONS
+from zipper_app.features.volumes import (MIN_VOLUME_SIZE, VolumeReader, VolumeWriter,
+                                         find_volumes, volume_path)
+
+# Split archives: every profile is written straight into volumes of at most
+# volume_size bytes and extracts from them, and the volumes read back as one
+# seekable file.
+
+VOLUME_SIZE = MIN_VOLUME_SIZE
+
+def _volume_files(tmp_path, sizes):
+    data = os.urandom(sum(sizes))
+    paths = []
+    start = 0
+    for number, size in enumerate(sizes, 1):
+        paths.append(volume_path(tmp_path / "a.bin", number))
+        paths[-1].write_bytes(data[start:start + size])
+        start += size
+    return data, paths
+
+def test_reader_seeks_across_volumes(tmp_path):
+    data, paths = _volume_files(tmp_path, [1000, 1, 4096, 0, 2500])
+    rng = random.Random(3)
+    with VolumeReader(paths) as reader:
+        assert reader.size == len(data)
+        assert reader.read() == data
+        for _ in range(200):
+            pos = rng.randrange(len(data) + 10)
+            length = rng.randrange(6000)
+            assert reader.seek(pos) == pos
+            buf = bytearray(length)
+            filled = 0
+            while filled < length:
+                n = reader.readinto(memoryview(buf)[filled:])
+                if not n:
+                    break
+                filled += n
+            assert bytes(buf[:filled]) == data[pos:pos + length]
+        assert reader.seek(-10, io.SEEK_END) == len(data) - 10
+        assert reader.read() == data[-10:]
+
+def test_reader_removes_read_volumes(tmp_path):
+    data, paths = _volume_files(tmp_path, [3000, 3000, 3000])
+    with VolumeReader(paths, remove_read=True) as reader:
+        assert reader.read(4000) == data[:4000]
+        assert not paths[0].exists()
+        assert reader.read() == data[4000:]
+    assert not paths[1].exists()
+
+def test_writer_spreads_over_volumes(tmp_path):
+    base = tmp_path / "a.bin"
+    data = bytearray(os.urandom(3 * VOLUME_SIZE + 123))
+    with VolumeWriter(base, VOLUME_SIZE) as writer:
+        assert writer.write(data) == len(data)
+        # Patch a header-like range across a volume boundary
+        writer.seek(VOLUME_SIZE - 5)
+        writer.write(b"X" * 10)
+        data[VOLUME_SIZE - 5:VOLUME_SIZE + 5] = b"X" * 10
+        writer.seek(VOLUME_SIZE - 20)
+        assert writer.read(40) == data[VOLUME_SIZE - 20:VOLUME_SIZE + 20]
+    volumes = find_volumes(base)
+    assert [p.stat().st_size for p in volumes] == [VOLUME_SIZE] * 3 + [123]
+    with VolumeReader(volumes) as reader:
+        assert reader.read() == data
+
+    with VolumeWriter(base, VOLUME_SIZE, resume=True) as writer:
+        assert writer.truncate(VOLUME_SIZE + 7) == VOLUME_SIZE + 7
+    assert [p.stat().st_size for p in find_volumes(base)] == [VOLUME_SIZE, 7]
+
+def _inputs(source):
+    source.mkdir()
+    files = []
+    for i in range(3):
+        path = source / f"random{i}.bin"
+        path.write_bytes(os.urandom(100 * 1024))
+        files.append(path)
+    text = source / "text.txt"
+    text.write_bytes(b"some text\n" * 20000)
+    empty = source / "empty.txt"
+    empty.write_bytes(b"")
+    return files + [text, empty]
+
+@pytest.mark.parametrize("resumable", [False, True])
+@pytest.mark.parametrize("profile, name, password", [
+    (CompressionProfile.FAST, "out.zip", None),
+    (CompressionProfile.NORMAL, "out.7z", None),
+    (CompressionProfile.MAXIMUM, "out.tar.xz", None),
+    (CompressionProfile.FAST, "out.zip.enc", "secret"),
+    (CompressionProfile.MAXIMUM, "out.tar.xz.enc", "secret"),
+])
+def test_split_round_trip(tmp_path, profile, name, password, resumable):
+    files = _inputs(tmp_path / "src")
+    folder = tmp_path / "archive"
+    folder.mkdir()
+    archive = folder / name
+    # Left from an earlier, longer archive of that name
+    for number in range(1, 21):
+        volume_path(archive, number).write_bytes(b"stale")
+    archive.write_bytes(b"stale")
+
+    compressor = Compressor(kdf_iterations=MIN_KDF_ITERATIONS)
+    result = compressor.compress_files(files, archive, profile, workers=2, password=password,
+                                       resumable=resumable, volume_size=VOLUME_SIZE)
+    volumes = find_volumes(archive)
+    assert 3 <= len(volumes) < 20
+    assert result["volumes"] == [str(p) for p in volumes]
+    assert sorted(p.name for p in folder.iterdir()) == sorted(p.name for p in volumes)
+    sizes = [p.stat().st_size for p in volumes]
+    assert sizes[:-1] == [VOLUME_SIZE] * (len(sizes) - 1)
+    assert 0 < sizes[-1] <= VOLUME_SIZE
+
+    for start in (archive, volumes[0]):
+        output = tmp_path / f"out-{start.name}"
+        compressor.extract_files(start, output, password=password)
+        assert sorted(p.name for p in output.iterdir()) == sorted(f.name for f in files)
+        for file in files:
+            assert filecmp.cmp(file, output / file.name, shallow=False)
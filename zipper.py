@@ -4,14 +4,24 @@ from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QLabel, QVBoxLayout,
                           QWidget, QPushButton, QMessageBox, QProgressDialog,
                           QFileDialog, QHBoxLayout, QMenuBar, QMenu,
-                          QListWidget)
-from PyQt6.QtCore import Qt, QSize, QSettings, QDateTime
+                          QListWidget, QInputDialog, QLineEdit)
+from PyQt6.QtCore import Qt, QSize, QSettings, QDateTime, QTimer, QStandardPaths
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QAction
 
-from zipper_app.features.compression import Compressor, CompressionProfile
+from zipper_app.features.compression import FRAME_PROFILES, Compressor, CompressionProfile
 from zipper_app.features.monitor import FolderMonitor
+from zipper_app.features.autocompress import AutoCompressor, OUTPUT_DIR, default_workers
+from zipper_app.features.jobs import JobManager
+from zipper_app.features.dedup import STORE_DIR
+from zipper_app.features.encryption import ENCRYPTED_SUFFIX, is_encrypted
+from zipper_app.features.keys import KDF_ITERATIONS, session_keys
+from zipper_app.features.journal import read_job, discard_journal
+from zipper_app.features.scanner import DirectoryScan
+from zipper_app.features.scheduler import JobSchedule, Scheduler
+from zipper_app.features.governor import ResourceLimits
+from zipper_app.features.volumes import first_volume
 from zipper_app.ui.theme import ThemeManager
-from zipper_app.ui.dialogs import (ScheduleDialog, MonitoredFolderDialog,
+from zipper_app.ui.dialogs import (ScheduleDialog, ScheduledJobsDialog, MonitoredFolderDialog,
                                 MonitorSettingsDialog, FilePreviewDialog,
                                 BatchProcessDialog, EncryptionDialog,
                                 ExtractDialog, HelpDialog)
@@ -28,13 +38,41 @@ class MainWindow(QMainWindow):
         self.is_dark_mode = self.settings.value('dark_mode', False, type=bool)
         self.folder_monitors = self.settings.value('folder_monitors', [])
         
-        # Initialize compressor and monitors
-        self.compressor = Compressor()
+        # Initialize compressor, background jobs and monitors
+        self.compressor = Compressor(
+            kdf_iterations=self.settings.value('kdf_iterations', KDF_ITERATIONS, type=int)
+        )
+        self.job_manager = JobManager(self.compressor, parent=self)
+        self.job_manager.job_progress.connect(self.on_job_progress)
+        self.job_manager.job_finished.connect(self.on_job_finished)
+        self.job_manager.job_failed.connect(self.on_job_failed)
+        self.job_manager.job_cancelled.connect(self.on_job_cancelled)
+        self.job_dialogs = {}
+        # Monitored folders are compressed unattended by a pool of their own
+        self.auto_compressor = AutoCompressor(
+            workers=self.settings.value('monitor_workers', default_workers(), type=int),
+            folder_limit=self.settings.value('monitor_folder_limit', 1, type=int),
+            compressor=self.compressor, parent=self
+        )
+        self.auto_compressor.batch_finished.connect(self.on_monitored_batch_finished)
+        self.auto_compressor.batch_failed.connect(self.on_monitored_batch_failed)
+        self.auto_compressor.start()
+        # Scheduled jobs run unattended as well, on a job manager of their own
+        schedule_dir = QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.GenericDataLocation
+        )
+        self.scheduler = Scheduler(
+            JobSchedule(Path(schedule_dir) / "Zipper" / "schedule.json"), self.compressor,
+            max_running=self.settings.value('scheduled_max_running', 1, type=int), parent=self
+        )
+        self.scheduler.job_started.connect(self.on_scheduled_job_started)
+        self.scheduler.job_finished.connect(self.on_scheduled_job_finished)
+        self.scheduler.job_failed.connect(self.on_scheduled_job_failed)
         self.active_monitors = []
         self.setup_folder_monitors()
         
-        # Initialize encryption key
-        self.encryption_key = None
+        # Archives are encrypted while a password is set
+        self.encryption_password = None
         
         # Create menu bar
         self.create_menu_bar()
@@ -91,6 +129,11 @@ class MainWindow(QMainWindow):
         # Apply theme
         if self.is_dark_mode:
             ThemeManager.apply_dark_theme(QApplication.instance())
+        
+        # Once the window is up, offer to finish jobs cut short last time
+        # and catch up on scheduled ones
+        QTimer.singleShot(0, self.resume_interrupted_jobs)
+        QTimer.singleShot(0, self.start_scheduler)
     
     def create_menu_bar(self):
         menubar = self.menuBar()
@@ -160,6 +203,10 @@ class MainWindow(QMainWindow):
         schedule_action.triggered.connect(self.schedule_compression)
         tools_menu.addAction(schedule_action)
         
+        scheduled_jobs_action = QAction("Scheduled Jobs...", self)
+        scheduled_jobs_action.triggered.connect(self.show_scheduled_jobs)
+        tools_menu.addAction(scheduled_jobs_action)
+        
         # Help menu
         help_menu = menubar.addMenu("Help")
         
@@ -221,46 +268,47 @@ class MainWindow(QMainWindow):
     def set_encryption_password(self):
         dialog = EncryptionDialog(self)
         if dialog.exec():
-            password = dialog.get_password()
-            self.encryption_key = self.compressor.generate_key()
-            QMessageBox.information(self, "Success", "Encryption password set successfully!")
+            self.encryption_password = dialog.get_password()
+            # Derive the key in the background while the user picks files
+            session_keys.prefetch(self.encryption_password, self.compressor.kdf_iterations)
+            self.auto_compressor.password = self.encryption_password
+            # Encrypted scheduled jobs wait for it
+            self.scheduler.password = self.encryption_password
+            self.scheduler.check()
+            QMessageBox.information(
+                self,
+                "Success",
+                "Encryption password set successfully!\n\n"
+                "New archives will be encrypted until Zipper is closed."
+            )
     
     def schedule_compression(self):
         if not self.files_to_compress:
             QMessageBox.warning(self, "Error", "Please select files to compress first!")
             return
         
-        dialog = ScheduleDialog(self)
-        if dialog.exec():
-            schedule_time = dialog.get_schedule_time()
-            QMessageBox.information(
-                self,
-                "Compression Scheduled",
-                f"Compression scheduled for {schedule_time.toString('yyyy-MM-dd hh:mm')}"
-            )
+        self.process_files(self.files_to_compress, schedule=True)
     
     def show_batch_dialog(self):
         dialog = BatchProcessDialog(self)
         if dialog.exec():
-            settings = dialog.get_settings()
-            if settings["schedule"]:
-                self.schedule_compression()
-            else:
-                self.process_batch(settings)
+            self.process_batch(dialog.get_settings())
     
     def process_batch(self, settings):
         if not settings["source_dir"]:
             return
         
-        files = []
-        for filter_pattern in settings["filters"] or ["*.*"]:
-            files.extend(Path(settings["source_dir"]).glob(filter_pattern))
-        
-        if not files:
-            QMessageBox.warning(self, "No Files Found", "No files match the specified filters!")
+        if not os.path.isdir(settings["source_dir"]):
+            QMessageBox.warning(self, "Folder Not Found",
+                                f"The folder {settings['source_dir']} does not exist!")
             return
         
-        self.process_files([str(f) for f in files])
+        # The folder is scanned by the compression job itself, which starts
+        # on the first files while the rest are still being found
+        scan = DirectoryScan(settings["source_dir"], settings["filters"],
+                             recursive=settings.get("recursive", False))
+        self.process_files(scan, update=settings.get("update", False),
+                           schedule=settings.get("schedule", False))
     
     def update_recent_files_list(self):
         self.recent_list.clear()
@@ -295,13 +343,22 @@ class MainWindow(QMainWindow):
                 self.settings.setValue('recent_files', self.recent_files)
                 self.update_recent_files_list()
     
-    def process_files(self, files):
+    def process_files(self, files, update=False, schedule=False):
+        # files is a list of paths or a DirectoryScan; with schedule, the
+        # job is queued to run later instead of now
         self.files_to_compress = files
-        total_size = sum(os.path.getsize(f) for f in files)
-        self.status_label.setText(f"Selected {len(files)} files ({self.format_size(total_size)})")
+        scanned = isinstance(files, DirectoryScan)
+        if scanned:
+            self.status_label.setText(f"Selected folder {files.root}")
+        else:
+            total_size = sum(os.path.getsize(f) for f in files)
+            self.status_label.setText(f"Selected {len(files)} files ({self.format_size(total_size)})")
         
         # Show file preview dialog
-        preview_dialog = FilePreviewDialog(files, self)
+        preview_dialog = FilePreviewDialog(
+            files, self, limits=self.settings.value('job_limits', {}),
+            volume_size=self.settings.value('volume_size', 0, type=int)
+        )
         
         # Load last used settings
         last_profile = self.settings.value('compression_profile', 'Normal')
@@ -309,6 +366,10 @@ class MainWindow(QMainWindow):
         
         if preview_dialog.exec():
             settings = preview_dialog.get_settings()
+            self.settings.setValue('job_limits', settings['limits'])
+            self.settings.setValue('volume_size', settings['volume_size'] or 0)
+            # Split archives are always written anew
+            update = update and not settings['volume_size']
             self.last_used_settings = settings
             
             if settings['profile'] == "Fast":
@@ -316,10 +377,14 @@ class MainWindow(QMainWindow):
             elif settings['profile'] == "Normal":
                 ext = ".7z"
             else:
-                ext = ".xz"
+                ext = FRAME_PROFILES.get(settings['profile'], ".xz")
+                if scanned or len(files) > 1:
+                    ext = ".tar" + ext
+            if self.encryption_password:
+                ext += ENCRYPTED_SUFFIX
             
             # Get save location
-            default_name = Path(files[0]).stem + ext
+            default_name = (Path(files.root).name if scanned else Path(files[0]).stem) + ext
             save_path, _ = QFileDialog.getSaveFileName(
                 self,
                 "Save Compressed File",
@@ -327,36 +392,215 @@ class MainWindow(QMainWindow):
                 f"Compressed Files (*{ext})"
             )
             
-            if save_path:
-                try:
-                    # Show progress dialog
-                    progress = QProgressDialog("Compressing files...", "Cancel", 0, len(files), self)
-                    progress.setWindowModality(Qt.WindowModality.WindowModal)
-                    progress.show()
-                    
-                    self.compressor.compress_files(files, save_path, settings['profile'])
-                    
-                    # Add to recent files
-                    if save_path not in self.recent_files:
-                        self.recent_files.insert(0, save_path)
-                        if len(self.recent_files) > 10:
-                            self.recent_files.pop()
-                        self.settings.setValue('recent_files', self.recent_files)
-                        self.update_recent_files_list()
-                    
-                    QMessageBox.information(
-                        self,
-                        "Success",
-                        f"Files compressed successfully to {save_path}"
-                    )
-                except Exception as e:
-                    QMessageBox.critical(
-                        self,
-                        "Error",
-                        f"Failed to compress files: {str(e)}"
+            if save_path and schedule:
+                self.schedule_job(files, save_path, settings['profile'],
+                                  update and not self.encryption_password, settings['limits'],
+                                  settings['volume_size'], settings['level'])
+            elif save_path:
+                update = update and not self.encryption_password
+                job_id = self.job_manager.submit_compress(
+                    files, save_path, settings['profile'],
+                    update=update,
+                    password=self.encryption_password,
+                    resumable=not update,
+                    limits=ResourceLimits.from_settings(settings['limits']),
+                    volume_size=settings['volume_size'],
+                    level=settings['level']
+                )
+                if not update:
+                    self.remember_resumable(save_path)
+                self.track_job(job_id, "Compressing files...", "compress", save_path)
+    
+    def schedule_job(self, files, save_path, profile, update, limits=None, volume_size=None,
+                     level=None):
+        dialog = ScheduleDialog(self)
+        if not dialog.exec():
+            return
+        schedule = dialog.get_schedule()
+        self.scheduler.add(files, save_path, profile, update=update,
+                           encrypted=bool(self.encryption_password), limits=limits or {},
+                           volume_size=volume_size, level=level, **schedule)
+        when = QDateTime.fromSecsSinceEpoch(schedule["when"]).toString('yyyy-MM-dd hh:mm')
+        if schedule["window"]:
+            when += f", between {schedule['window'].replace('-', ' and ')}"
+        self.status_label.setText(f"Compression to {os.path.basename(save_path)} scheduled")
+        QMessageBox.information(
+            self,
+            "Compression Scheduled",
+            f"Compression scheduled for {when}"
+        )
+    
+    def start_scheduler(self):
+        missed = self.scheduler.start()
+        if missed:
+            QMessageBox.information(
+                self,
+                "Scheduled Jobs Skipped",
+                "These scheduled jobs were due while Zipper was closed and were skipped:\n\n"
+                + "\n".join(job["output"] for job in missed)
+            )
+    
+    def show_scheduled_jobs(self):
+        dialog = ScheduledJobsDialog(self.scheduler.schedule.jobs.values(),
+                                     self.scheduler.max_running, self)
+        if dialog.exec():
+            for job_id in dialog.get_removed():
+                self.scheduler.remove(job_id)
+            max_running = dialog.get_max_running()
+            self.settings.setValue('scheduled_max_running', max_running)
+            self.scheduler.max_running = max_running
+    
+    def on_scheduled_job_started(self, job):
+        self.status_label.setText(f"Running scheduled compression to {job['output']}")
+    
+    def on_scheduled_job_finished(self, job, result):
+        self.status_label.setText(
+            f"Scheduled compression finished: {result['files']} files to {job['output']}"
+        )
+    
+    def on_scheduled_job_failed(self, job, error):
+        self.status_label.setText(f"Scheduled compression to {job['output']} failed: {error}")
+    
+    def remember_resumable(self, archive_path):
+        # Archives whose journal is looked for on the next start
+        jobs = self.settings.value('resumable_jobs', [])
+        if archive_path not in jobs:
+            jobs.append(archive_path)
+            self.settings.setValue('resumable_jobs', jobs)
+    
+    def resume_interrupted_jobs(self):
+        pending = []
+        running = {target for _, _, kind, target in self.job_dialogs.values()
+                   if kind == "compress"}
+        for archive_path in self.settings.value('resumable_jobs', []):
+            if archive_path in running:
+                # Started in this session before the check ran
+                pending.append(archive_path)
+                continue
+            job = read_job(archive_path)
+            if job is None:
+                continue  # finished or cancelled
+            if job["source"]:
+                files = DirectoryScan(**job["source"])
+                done = f"{job['committed']} files from {files.root}"
+            else:
+                files = job["files"]
+                done = f"{job['committed']} of {len(files)} files"
+            answer = QMessageBox.question(
+                self,
+                "Resume Compression",
+                f"Compressing {os.path.basename(archive_path)} was interrupted with "
+                f"{done} done.\n\n"
+                "Resume it where it stopped?"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                discard_journal(archive_path)
+                continue
+            pending.append(archive_path)
+            password = None
+            if job["options"]["encrypted"]:
+                password = self.encryption_password
+                if not password:
+                    password, ok = QInputDialog.getText(
+                        self, "Encrypted Archive",
+                        f"Password for {os.path.basename(archive_path)}:",
+                        QLineEdit.EchoMode.Password
                     )
-                finally:
-                    progress.close()
+                    if not ok or not password:
+                        continue  # asked again next time
+            job_id = self.job_manager.submit_compress(
+                files, archive_path, job["profile"],
+                adaptive=job["options"]["adaptive"],
+                password=password,
+                resumable=True,
+                volume_size=job["options"].get("volume_size"),
+                level=job["options"].get("level"),
+                limits=ResourceLimits.from_settings(job["options"].get("limits"))
+            )
+            self.track_job(job_id, "Resuming compression...", "compress", archive_path)
+        self.settings.setValue('resumable_jobs', pending)
+    
+    def track_job(self, job_id, label, kind, target):
+        # Progress dialog for a queued background job; several can be open
+        progress = QProgressDialog(label, "Cancel", 0, 1000, self)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(lambda: self.job_manager.cancel(job_id))
+        progress.show()
+        self.job_dialogs[job_id] = (progress, label, kind, target)
+    
+    def on_job_progress(self, job_id, done, total, rate):
+        if job_id not in self.job_dialogs:
+            return
+        progress, label, kind, target = self.job_dialogs[job_id]
+        if total:
+            progress.setValue(min(1000, done * 1000 // total))
+            detail = f"{self.format_size(done)} of {self.format_size(total)}"
+        else:
+            detail = self.format_size(done)
+        progress.setLabelText(f"{label}\n{detail} ({self.format_size(rate)}/s)")
+    
+    def finish_job(self, job_id):
+        entry = self.job_dialogs.pop(job_id, None)
+        if entry:
+            # Closing emits canceled(), which must not reach a finished job
+            entry[0].canceled.disconnect()
+            entry[0].close()
+        return entry
+    
+    def on_job_finished(self, job_id, result):
+        entry = self.finish_job(job_id)
+        if not entry:
+            return
+        _, _, kind, target = entry
+        if kind == "compress":
+            volumes = (result or {}).get("volumes")
+            if volumes:
+                # A split archive is opened through its first volume
+                target = volumes[0]
+            # Add to recent files
+            if target not in self.recent_files:
+                self.recent_files.insert(0, target)
+                if len(self.recent_files) > 10:
+                    self.recent_files.pop()
+                self.settings.setValue('recent_files', self.recent_files)
+                self.update_recent_files_list()
+            
+            if result and not result.get("files"):
+                QMessageBox.warning(self, "No Files Found",
+                                    f"No files matched the filters; {target} is empty.")
+                return
+            message = f"Files compressed successfully to {target}"
+            if volumes and len(volumes) > 1:
+                message += f" and {len(volumes) - 1} more volumes"
+            skipped = [m for m in (result or {}).get("members", [])
+                       if m["method"] in ("stored", "copy", "lzma2-fast")]
+            if skipped:
+                message += (f"\n\n{len(skipped)} of {len(result['members'])} files were "
+                            "already compressed and were stored as is.")
+            QMessageBox.information(self, "Success", message)
+        else:
+            QMessageBox.information(
+                self,
+                "Success",
+                f"Files extracted successfully to {target}"
+            )
+    
+    def on_job_failed(self, job_id, error):
+        entry = self.finish_job(job_id)
+        if not entry:
+            return
+        action = "compress" if entry[2] == "compress" else "extract"
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Failed to {action} files: {error}"
+        )
+    
+    def on_job_cancelled(self, job_id):
+        self.finish_job(job_id)
+        self.status_label.setText("Operation cancelled")
     
     @staticmethod
     def format_size(size):
@@ -404,28 +648,21 @@ class MainWindow(QMainWindow):
         if dialog.exec():
             archive_path, output_dir = dialog.get_paths()
             if archive_path and output_dir:
-                try:
-                    # Show progress dialog
-                    progress = QProgressDialog("Extracting files...", "Cancel", 0, 100, self)
-                    progress.setWindowModality(Qt.WindowModality.WindowModal)
-                    progress.show()
-                    
-                    # Extract files
-                    self.compressor.extract_files(archive_path, output_dir)
-                    
-                    QMessageBox.information(
-                        self,
-                        "Success",
-                        f"Files extracted successfully to {output_dir}"
-                    )
-                except Exception as e:
-                    QMessageBox.critical(
-                        self,
-                        "Error",
-                        f"Failed to extract files: {str(e)}"
-                    )
-                finally:
-                    progress.close()
+                password = None
+                if is_encrypted(first_volume(archive_path)):
+                    password = self.encryption_password
+                    if not password:
+                        password, ok = QInputDialog.getText(
+                            self, "Encrypted Archive",
+                            f"Password for {os.path.basename(archive_path)}:",
+                            QLineEdit.EchoMode.Password
+                        )
+                        if not ok or not password:
+                            return
+                job_id = self.job_manager.submit_extract(
+                    archive_path, output_dir, password=password
+                )
+                self.track_job(job_id, "Extracting files...", "extract", output_dir)
     
     def show_about(self):
         QMessageBox.about(
@@ -447,48 +684,60 @@ class MainWindow(QMainWindow):
             monitor = FolderMonitor(
                 monitor_settings["folder"],
                 monitor_settings["patterns"],
-                monitor_settings["min_size"]
-            )
-            monitor.file_found.connect(
-                lambda f, s=monitor_settings: self.handle_monitored_file(f, s)
+                monitor_settings["min_size"],
+                exclude=monitor_settings.get("exclude"),
+                # Never pick up Zipper's own output
+                ignore_dirs=[STORE_DIR, OUTPUT_DIR] + monitor_settings.get("ignore_dirs", []),
+                max_size=monitor_settings.get("max_size"),
+                max_age=monitor_settings.get("max_age"),
+                # Queued straight from the monitor thread; a full queue
+                # holds the files back until there is room
+                sink=lambda f, s=monitor_settings: self.auto_compressor.submit(s["folder"], f, s)
             )
             monitor.start()
             self.active_monitors.append(monitor)
     
     def show_monitor_settings(self):
-        dialog = MonitorSettingsDialog(self.folder_monitors, self)
+        dialog = MonitorSettingsDialog(
+            self.folder_monitors, self.auto_compressor.workers,
+            self.auto_compressor.folder_limit, self
+        )
         if dialog.exec():
             self.folder_monitors = dialog.get_monitors()
+            workers, folder_limit = dialog.get_limits()
             self.settings.setValue('folder_monitors', self.folder_monitors)
+            self.settings.setValue('monitor_workers', workers)
+            self.settings.setValue('monitor_folder_limit', folder_limit)
+            self.auto_compressor.folder_limit = folder_limit
+            if workers != self.auto_compressor.workers:
+                # Takes effect for batches found from now on
+                self.auto_compressor.resize(workers)
             self.setup_folder_monitors()
     
-    def handle_monitored_file(self, file_path, settings):
-        # Create output path
-        output_dir = os.path.join(os.path.dirname(file_path), "compressed")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        base_name = os.path.basename(file_path)
-        if settings["profile"] == "Fast":
-            ext = ".zip"
-        elif settings["profile"] == "Normal":
-            ext = ".7z"
+    def on_monitored_batch_finished(self, folder, output, files, result):
+        if "new_chunks" in result:
+            self.status_label.setText(
+                f"Stored {len(files)} files from {os.path.basename(folder)}: "
+                f"{result['new_chunks']} of {result['chunks']} chunks new "
+                f"({self.format_size(result['stored_bytes'])} written)"
+            )
         else:
-            ext = ".xz"
-        
-        output_path = os.path.join(output_dir, os.path.splitext(base_name)[0] + ext)
-        
-        # Start compression
-        self.process_files(
-            [file_path],
-            output_path=output_path,
-            profile=settings["profile"],
-            auto_delete=settings["auto_delete"]
+            self.status_label.setText(f"Compressed {len(files)} files to {output}")
+    
+    def on_monitored_batch_failed(self, folder, files, error):
+        self.status_label.setText(
+            f"Failed to compress {len(files)} files from {os.path.basename(folder)}: {error}"
         )
     
     def closeEvent(self, event):
         # Stop all monitors before closing
         for monitor in self.active_monitors:
             monitor.stop()
+        # Cancel queued and running jobs; partial output is removed
+        self.job_manager.shutdown()
+        self.auto_compressor.shutdown()
+        # Scheduled jobs that were running carry on at the next start
+        self.scheduler.shutdown()
         super().closeEvent(event)
     
     def save_settings(self):
@@ -0,0 +1,277 @@
+import argparse
+import getpass
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from .features.compression import FRAME_PROFILES, Compressor, CompressionProfile
+from .features.encryption import is_encrypted
+from .features.frames import check_level
+from .features.governor import IO_CLASSES, ResourceLimits, parse_size
+from .features.keys import KDF_ITERATIONS
+from .features.scanner import DirectoryScan
+from .features.volumes import archive_size, check_volume_size, first_volume, remove_volumes
+
+# Headless entry point: python -m zipper_app <command> ...
+# Must never import PyQt6, so it stays usable in cron jobs and containers.
+# Results go to stdout (tab-separated, or JSON with --json), errors to
+# stderr, and the exit status tells scripts what happened.
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2       # also what argparse uses for bad arguments
+EXIT_DAMAGED = 3     # test found damaged members
+EXIT_INTERRUPTED = 130
+
+PASSWORD_ENV = "ZIPPER_PASSWORD"
+
+PROFILES = {
+    "fast": CompressionProfile.FAST,
+    "normal": CompressionProfile.NORMAL,
+    "maximum": CompressionProfile.MAXIMUM,
+    "zstd": CompressionProfile.ZSTANDARD,
+    "lz4": CompressionProfile.LZ4
+}
+
+class UsageError(Exception):
+    pass
+
+def _emit(args, data, lines):
+    if args.json:
+        json.dump(data, sys.stdout)
+        sys.stdout.write('\n')
+    else:
+        for fields in lines:
+            print('\t'.join('' if f is None else str(f) for f in fields))
+
+def _input_files(paths):
+    files = []
+    for path in paths:
+        path = Path(path)
+        if not path.is_file():
+            raise UsageError(f"Not a file: {path}")
+        files.append(path)
+    return files
+
+def _password(args, confirm=False):
+    # --password-file, then $ZIPPER_PASSWORD, then a prompt on a terminal.
+    # Never a command line argument, where other users could see it.
+    if args.password_file:
+        with open(args.password_file, 'r', encoding='utf-8') as f:
+            return f.readline().rstrip('\r\n')
+    if os.environ.get(PASSWORD_ENV):
+        return os.environ[PASSWORD_ENV]
+    if not sys.stdin.isatty():
+        raise UsageError(f"A password is needed: use --password-file or set {PASSWORD_ENV}")
+    password = getpass.getpass("Password: ")
+    if confirm and getpass.getpass("Confirm password: ") != password:
+        raise UsageError("Passwords do not match")
+    return password
+
+def _limits(args):
+    try:
+        return ResourceLimits.from_settings({
+            "cores": args.cores,
+            "nice": args.nice,
+            "io_class": args.ionice,
+            "bandwidth": parse_size(args.bwlimit) if args.bwlimit else None,
+            "memory": parse_size(args.memory) if args.memory else None
+        })
+    except ValueError as e:
+        raise UsageError(e) from None
+
+def _archive_password(args):
+    return _password(args) if is_encrypted(first_volume(args.archive)) else None
+
+def _compress(args, files):
+    if not files:
+        raise UsageError("No input files")
+    if args.volume_size and args.update:
+        raise UsageError("--volume-size cannot be combined with --update")
+    if args.level is not None and PROFILES[args.profile] not in FRAME_PROFILES:
+        raise UsageError("--level only applies to the zstd and lz4 profiles")
+    password = _password(args, confirm=True) if args.encrypt else None
+    start = time.perf_counter()
+    try:
+        compressor = Compressor(kdf_iterations=args.kdf_iterations)
+        volume_size = None
+        if args.volume_size:
+            volume_size = check_volume_size(parse_size(args.volume_size))
+        if args.level is not None:
+            check_level(FRAME_PROFILES[PROFILES[args.profile]], args.level)
+    except ValueError as e:
+        raise UsageError(e) from None
+    # A new archive is journaled, so running the same command again after
+    # an interruption carries on where it stopped
+    result = compressor.compress_files(
+        files, args.output, PROFILES[args.profile], workers=args.workers,
+        update=args.update, adaptive=not args.no_adaptive, password=password,
+        resumable=not args.update, restart=args.restart, limits=_limits(args),
+        volume_size=volume_size, level=args.level
+    )
+    if not result["files"]:
+        # A folder scan that found nothing
+        Path(args.output).unlink(missing_ok=True)
+        remove_volumes(args.output)
+        raise UsageError("No input files")
+    result["archive_bytes"] = archive_size(args.output)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    _emit(args, result, [(result["output"], result["files"], result["bytes"],
+                          result["archive_bytes"], result["seconds"])])
+    return EXIT_OK
+
+def cmd_compress(args):
+    return _compress(args, _input_files(args.files))
+
+def cmd_batch(args):
+    # Same file selection as the Batch Processing dialog. The folder is
+    # scanned while compressing, except for --update, which compares the
+    # whole selection with the archive first.
+    source = Path(args.source_dir)
+    if not source.is_dir():
+        raise UsageError(f"Not a directory: {source}")
+    scan = DirectoryScan(source, args.filter, recursive=args.recursive)
+    return _compress(args, list(scan) if args.update else scan)
+
+def cmd_extract(args):
+    start = time.perf_counter()
+    if args.member:
+        try:
+            extracted = Compressor().extract_members(args.archive, args.member, args.output,
+                                                     workers=args.workers,
+                                                     password=_archive_password(args),
+                                                     limits=_limits(args))
+        except KeyError as e:
+            raise UsageError(e.args[0]) from None
+    else:
+        Compressor().extract_files(args.archive, args.output, workers=args.workers,
+                                   password=_archive_password(args), limits=_limits(args))
+        extracted = None
+    result = {
+        "archive": str(args.archive),
+        "output": str(args.output),
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+    if extracted is not None:
+        result["extracted"] = extracted
+    _emit(args, result, [(result["archive"], result["output"], result["seconds"])])
+    return EXIT_OK
+
+def cmd_list(args):
+    entries = Compressor().list_archive(args.archive, password=_archive_password(args))
+    _emit(args, entries, [
+        (e["size"], e["compressed_size"],
+         datetime.fromtimestamp(e["mtime"]).isoformat(timespec='seconds') if e["mtime"] else None,
+         e["name"] + ('/' if e["is_dir"] and not e["name"].endswith('/') else ''))
+        for e in entries
+    ])
+    return EXIT_OK
+
+def cmd_test(args):
+    bad = Compressor().test_archive(args.archive, workers=args.workers,
+                                    password=_archive_password(args))
+    result = {"archive": str(args.archive), "ok": not bad, "damaged": bad}
+    _emit(args, result, [("DAMAGED", name) for name in bad] or [("OK", args.archive)])
+    return EXIT_DAMAGED if bad else EXIT_OK
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', action='store_true', help="print results as JSON")
+    common.add_argument('--workers', type=int, default=None,
+                        help="worker threads/processes (default: all cores)")
+    common.add_argument('--password-file',
+                        help=f"read the password from this file (default: ${PASSWORD_ENV}, "
+                             "or a prompt)")
+
+    # For sharing a busy machine
+    limit_options = argparse.ArgumentParser(add_help=False)
+    limit_options.add_argument('--cores', type=int, help="use at most this many cores")
+    limit_options.add_argument('--nice', type=int, help="CPU niceness, 1-19")
+    limit_options.add_argument('--ionice', choices=sorted(IO_CLASSES),
+                               help="disk priority (Linux)")
+    limit_options.add_argument('--bwlimit', metavar='SIZE',
+                               help="read at most SIZE per second, e.g. 20M")
+    limit_options.add_argument('--memory', metavar='SIZE',
+                               help="keep buffers within SIZE, e.g. 512M")
+
+    archive_options = argparse.ArgumentParser(add_help=False)
+    archive_options.add_argument('-o', '--output', required=True, help="archive to write")
+    archive_options.add_argument('-p', '--profile', choices=sorted(PROFILES), default="normal",
+                                 help="fast (ZIP), normal (7Z), maximum (XZ), zstd or lz4; "
+                                      "default: normal")
+    archive_options.add_argument('--level', type=int,
+                                 help="compression level of the zstd (-7 to 22, default 3) "
+                                      "or lz4 profile (0 to 16, default 0)")
+    archive_options.add_argument('--update', action='store_true',
+                                 help="only recompress changed files of an existing ZIP/7Z archive")
+    archive_options.add_argument('--restart', action='store_true',
+                                 help="start over instead of resuming an interrupted run")
+    archive_options.add_argument('--no-adaptive', action='store_true',
+                                 help="compress every file, even already-compressed ones")
+    archive_options.add_argument('--volume-size', metavar='SIZE',
+                                 help="split the archive into volumes of SIZE, e.g. 4G "
+                                      "(archive.zip.001, .002, ...)")
+    archive_options.add_argument('--encrypt', action='store_true',
+                                 help="encrypt the archive with AES-256-GCM")
+    archive_options.add_argument('--kdf-iterations', type=int, default=KDF_ITERATIONS,
+                                 help="PBKDF2 iterations for --encrypt "
+                                      f"(default: {KDF_ITERATIONS})")
+
+    parser = argparse.ArgumentParser(prog='python -m zipper_app',
+                                     description="Zipper command line interface")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('compress', parents=[common, archive_options, limit_options],
+                            help="compress files into an archive")
+    p.add_argument('files', nargs='+')
+    p.set_defaults(func=cmd_compress)
+
+    p = commands.add_parser('batch', parents=[common, archive_options, limit_options],
+                            help="compress the files of a folder that match filters")
+    p.add_argument('source_dir')
+    p.add_argument('-f', '--filter', action='append',
+                   help="glob pattern, repeatable (default: *.*)")
+    p.add_argument('-r', '--recursive', action='store_true',
+                   help="also compress matching files in subfolders")
+    p.set_defaults(func=cmd_batch)
+
+    p = commands.add_parser('extract', parents=[common, limit_options],
+                            help="extract an archive")
+    p.add_argument('archive')
+    p.add_argument('-o', '--output', default='.', help="output folder (default: current folder)")
+    p.add_argument('-m', '--member', action='append',
+                   help="only extract this member, as 'list' shows it (repeatable)")
+    p.set_defaults(func=cmd_extract)
+
+    p = commands.add_parser('list', parents=[common], help="list the members of an archive")
+    p.add_argument('archive')
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser('test', parents=[common], help="verify an archive's checksums")
+    p.add_argument('archive')
+    p.set_defaults(func=cmd_test)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except UsageError as e:
+        parser.print_usage(sys.stderr)
+        _error(args, e)
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        _error(args, e)
+        return EXIT_ERROR
+
+def _error(args, error):
+    if args.json:
+        json.dump({"error": str(error), "type": type(error).__name__}, sys.stderr)
+        sys.stderr.write('\n')
+    else:
+        print(f"zipper: error: {error}", file=sys.stderr)
@@ -0,0 +1,55 @@
+import json
+import os
+from pathlib import Path
+
+# Member index for tar.xz archives. A tar stream has no central directory, so
+# without it listing or extracting one member means decoding everything in
+# front of it. The index lives next to the archive and records where every
+# member's data starts in the uncompressed stream; together with the xz
+# block layout that lets a reader start decoding at the right block. Like
+# the manifest it is only trusted while the archive is exactly the one it
+# describes. Encrypted archives never get one: it would give away the names.
+
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+
+def index_path(archive_path):
+    archive_path = Path(archive_path)
+    return archive_path.with_name(archive_path.name + INDEX_SUFFIX)
+
+def index_entry(name, offset, size, mtime, is_dir):
+    return {"name": name, "offset": offset, "size": size, "mtime": mtime, "is_dir": is_dir}
+
+def load_index(archive_path):
+    # Returns the member entries, or None when there is no usable index
+    archive_path = Path(archive_path)
+    try:
+        with open(index_path(archive_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        st = archive_path.stat()
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_VERSION:
+        return None
+    if data.get("archive_size") != st.st_size or data.get("archive_mtime_ns") != st.st_mtime_ns:
+        return None
+    return data.get("members", [])
+
+def save_index(archive_path, members):
+    archive_path = Path(archive_path)
+    st = archive_path.stat()
+    data = {
+        "version": INDEX_VERSION,
+        "archive_size": st.st_size,
+        "archive_mtime_ns": st.st_mtime_ns,
+        "members": members
+    }
+    path = index_path(archive_path)
+    temp_path = path.with_name(path.name + '.tmp')
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except OSError:
+        # Only an optimisation, e.g. the archive sits in a read-only folder
+        Path(temp_path).unlink(missing_ok=True)
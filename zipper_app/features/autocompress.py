@@ -0,0 +1,254 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from PyQt6.QtCore import QObject, pyqtSignal
+from .compression import FRAME_PROFILES, Compressor, CompressionProfile, JobCancelled
+from .dedup import ChunkStore, STORE_DIR
+from .encryption import ENCRYPTED_SUFFIX
+from .governor import ResourceLimits
+from .scanner import arcname
+
+# Unattended compression for monitored folders. Batches of new files wait in
+# per-folder queues and a fixed pool of worker threads drains them, at most
+# `folder_limit` batches of one folder at a time, taking folders in turn so a
+# busy folder cannot starve the others. The queues are bounded: submit()
+# refuses a batch when they are full and the monitor keeps the files and
+# offers them again later, instead of memory growing without limit. A folder
+# may also have resource limits of its own (see governor.py).
+
+DEFAULT_MAX_PENDING = 64     # batches waiting across all folders
+OUTPUT_DIR = "compressed"    # next to the files, as the monitor has always done
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) // 2)
+
+def _archive_extension(profile, count):
+    if profile == CompressionProfile.FAST:
+        return ".zip"
+    if profile == CompressionProfile.NORMAL:
+        return ".7z"
+    ext = FRAME_PROFILES.get(profile, ".xz")
+    return ".tar" + ext if count > 1 else ext
+
+class AutoCompressor(QObject):
+    # folder, output (archive or chunk store), files, result dict
+    batch_finished = pyqtSignal(str, str, list, object)
+    batch_failed = pyqtSignal(str, list, str)  # folder, files, error
+
+    def __init__(self, workers=None, folder_limit=1, max_pending=DEFAULT_MAX_PENDING,
+                 compressor=None, parent=None):
+        super().__init__(parent)
+        self.workers = max(1, workers or default_workers())
+        self.folder_limit = max(1, folder_limit)
+        self.max_pending = max(1, max_pending)
+        self.compressor = compressor or Compressor()
+        self.password = None
+        self._queues = OrderedDict()  # folder -> deque of (files, settings)
+        self._active = {}             # folder -> batches being compressed
+        self._pending = 0
+        self._stores = {}
+        self._limits = {}             # folder -> (settings, ResourceLimits)
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+        self._closed = False
+        self._threads = []
+        self._serial = 0
+
+    def start(self):
+        with self._cond:
+            self._closed = False
+            self._cancel.clear()
+            self._spawn()
+
+    def _spawn(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f'zipper-auto-{len(self._threads)}',
+                                      daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def resize(self, workers):
+        # Surplus workers leave once they are idle
+        with self._cond:
+            self.workers = max(1, workers)
+            if not self._closed:
+                self._spawn()
+            self._cond.notify_all()
+
+    def pending_count(self):
+        with self._cond:
+            return self._pending + sum(self._active.values())
+
+    def submit(self, folder, files, settings):
+        # False when the queues are full; the caller should offer the files
+        # again later
+        with self._cond:
+            if self._closed:
+                return False
+            if self._pending >= self.max_pending:
+                return False
+            self._queues.setdefault(folder, deque()).append((list(files), settings))
+            self._pending += 1
+            self._cond.notify()
+        return True
+
+    def _limit(self, settings):
+        # One chunk store has a single writer at a time anyway, and a core
+        # limit holds for the folder as a whole
+        if settings.get("storage") == "dedup" or (settings.get("limits") or {}).get("cores"):
+            return 1
+        return self.folder_limit
+
+    def _folder_limits(self, folder, settings):
+        # Shared by the folder's batches, so they share its bandwidth
+        wanted = settings.get("limits") or {}
+        with self._cond:
+            cached = self._limits.get(folder)
+            if cached is None or cached[0] != wanted:
+                cached = self._limits[folder] = (dict(wanted), ResourceLimits.from_settings(wanted))
+        return cached[1]
+
+    def _next_task(self):
+        # Called with the lock held: the first folder in turn that has work
+        # and is below its limit, which then moves to the back of the line
+        for folder, queue in self._queues.items():
+            if queue and self._active.get(folder, 0) < self._limit(queue[0][1]):
+                files, settings = queue.popleft()
+                self._queues.move_to_end(folder)
+                if not queue:
+                    del self._queues[folder]
+                self._pending -= 1
+                self._active[folder] = self._active.get(folder, 0) + 1
+                return folder, files, settings
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                task = None
+                while not self._closed:
+                    if len(self._threads) > self.workers:
+                        self._threads.remove(threading.current_thread())
+                        return
+                    task = self._next_task()
+                    if task:
+                        break
+                    self._cond.wait()
+                if task is None:
+                    return
+            folder, files, settings = task
+            try:
+                self._process(folder, files, settings)
+            finally:
+                with self._cond:
+                    self._active[folder] -= 1
+                    if not self._active[folder]:
+                        del self._active[folder]
+                    self._cond.notify_all()
+
+    def _process(self, folder, files, settings):
+        files = [f for f in files if os.path.isfile(f)]
+        if not files:
+            return
+        try:
+            limits = self._folder_limits(folder, settings)
+            if settings.get("storage") == "dedup":
+                store = limits.run if limits is not None else lambda func, *args: func(*args)
+                output, result = store(self._store, folder, files, limits)
+            else:
+                output, result = self._compress(files, settings, limits)
+        except JobCancelled:
+            return
+        except Exception as e:
+            self.batch_failed.emit(folder, files, str(e))
+            return
+        if settings.get("auto_delete"):
+            for file in files:
+                try:
+                    os.remove(file)
+                except OSError:
+                    pass
+        self.batch_finished.emit(folder, output, files, result)
+
+    def _check_cancel(self, done=0, total=0):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _compress(self, files, settings, limits=None):
+        # One archive per source directory of the batch, in a 'compressed'
+        # folder beside the files
+        profile = settings.get("profile", CompressionProfile.NORMAL)
+        password = self.password
+        # New files may still be written to, which a memory-mapped input
+        # does not survive
+        compressor = copy.copy(self.compressor)
+        compressor.map_inputs = False
+        outputs = []
+        results = []
+        by_dir = {}
+        for file in files:
+            by_dir.setdefault(os.path.dirname(file), []).append(file)
+        for directory, group in by_dir.items():
+            ext = _archive_extension(profile, len(group))
+            if password:
+                ext += ENCRYPTED_SUFFIX
+            output_dir = Path(directory) / OUTPUT_DIR
+            if len(group) == 1:
+                name = Path(group[0]).stem
+            else:
+                with self._cond:
+                    self._serial += 1
+                    serial = self._serial
+                name = f"batch-{time.strftime('%Y%m%d-%H%M%S')}-{serial}"
+            output_path = output_dir / (name + ext)
+            results.append(compressor.compress_files(
+                group, output_path, profile,
+                workers=max(1, (os.cpu_count() or 1) // self.workers),
+                progress=self._check_cancel, password=password, limits=limits
+            ))
+            outputs.append(str(output_path))
+        return ", ".join(outputs), {"archives": results}
+
+    def _store(self, folder, files, limits=None):
+        with self._cond:
+            store = self._stores.get(folder)
+            if store is None:
+                store = self._stores[folder] = ChunkStore(Path(folder) / STORE_DIR)
+        # Reads go through the folder's bandwidth limit. The store only
+        # holds a chunk and a read buffer at a time, so a memory limit has
+        # nothing to shrink here.
+        throttle = limits.bucket if limits is not None else None
+        def progress(nbytes):
+            self._check_cancel()
+            if throttle is not None:
+                throttle.consume(nbytes)
+        totals = {"files": 0, "chunks": 0, "new_chunks": 0, "stored_bytes": 0}
+        for file in files:
+            self._check_cancel()
+            # Stored under their path within the folder, so that files of
+            # the same name in different subfolders stay apart
+            stats = store.add_file(file, arcname(file, folder), progress)
+            totals["files"] += 1
+            for key in ("chunks", "new_chunks", "stored_bytes"):
+                totals[key] += stats[key]
+        return str(store.root), totals
+
+    def shutdown(self, wait=True):
+        # Drops queued batches and cancels running ones; partial archives
+        # are removed by the compressor
+        with self._cond:
+            self._closed = True
+            self._queues.clear()
+            self._pending = 0
+            self._cancel.set()
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        if wait:
+            for thread in threads:
+                thread.join()
+        for store in self._stores.values():
+            store.close()
+        self._stores.clear()
@@ -0,0 +1,59 @@
+import importlib
+import importlib.util
+
+# Registry of the heavy or optional third-party modules Zipper uses. They are
+# only imported when first touched, so e.g. a ZIP-only run never pays for
+# py7zr or cryptography, and a missing package only breaks the feature that
+# needs it.
+#
+#   py7zr = backends.lazy("py7zr")
+#   py7zr.SevenZipFile(...)        # imports py7zr here
+#
+# lzma is not routed through here: zipfile imports it at startup anyway.
+
+class BackendUnavailable(ImportError):
+    pass
+
+_REGISTRY = {}
+
+def register(module, package, purpose):
+    _REGISTRY[module] = (package, purpose)
+
+register("py7zr", "py7zr", "7z archives")
+register("py7zr.callbacks", "py7zr", "7z archives")
+register("cryptography.hazmat.primitives.ciphers.aead", "cryptography", "encryption")
+register("cryptography.exceptions", "cryptography", "encryption")
+register("watchdog.observers", "watchdog", "folder monitoring")
+register("zstandard", "zstandard", "Zstandard archives")
+register("lz4.frame", "lz4", "LZ4 archives")
+
+def load(module):
+    if module not in _REGISTRY:
+        raise KeyError(f"Unknown backend module: {module}")
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        package, purpose = _REGISTRY[module]
+        raise BackendUnavailable(
+            f"The '{package}' package is required for {purpose} (pip install {package})"
+        ) from e
+
+def available(module):
+    # True when the backend's package is installed, without importing it
+    package = _REGISTRY[module][0]
+    return importlib.util.find_spec(package) is not None
+
+class _LazyModule:
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        return getattr(load(self._module), name)
+
+    def __repr__(self):
+        return f"<lazy backend {self._module!r}>"
+
+def lazy(module):
+    if module not in _REGISTRY:
+        raise KeyError(f"Unknown backend module: {module}")
+    return _LazyModule(module)
@@ -0,0 +1,52 @@
+import math
+import zlib
+from collections import Counter
+from pathlib import Path
+
+# Decides per input file whether compressing it is worth the CPU. Formats
+# that are compressed already are recognised by extension; everything else
+# is judged from a small sample at the start of the file: a byte-entropy
+# check first, then a quick zlib level 1 trial when the entropy is high.
+
+COMPRESSED_EXTENSIONS = {
+    # Images
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif', '.avif', '.jxl',
+    # Audio and video
+    '.mp3', '.aac', '.m4a', '.ogg', '.opus', '.flac', '.mp4', '.m4v', '.mkv',
+    '.mov', '.avi', '.webm', '.wmv',
+    # Archives and compressed streams
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.txz', '.lzma', '.7z', '.rar', '.zst',
+    '.lz4', '.br', '.cab', '.zstore',
+    # Container formats that deflate their contents
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub', '.jar', '.apk',
+    '.whl',
+    # Encrypted data
+    '.gpg', '.pgp', '.age', '.enc'
+}
+
+SAMPLE_SIZE = 16 * 1024
+TINY_SIZE = 64            # Smaller files gain nothing from a codec
+LOW_ENTROPY = 6.0         # bits per byte; clearly compressible below this
+MIN_SAVING = 0.03         # trial must save at least 3% to bother
+
+def byte_entropy(data):
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(n / total * math.log2(n / total) for n in Counter(data).values())
+
+def classify(path, sample_size=SAMPLE_SIZE):
+    # Returns (compress, reason)
+    path = Path(path)
+    if path.suffix.lower() in COMPRESSED_EXTENSIONS:
+        return False, "extension"
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    if len(sample) < TINY_SIZE:
+        return False, "tiny"
+    if byte_entropy(sample) < LOW_ENTROPY:
+        return True, "entropy"
+    trial = zlib.compress(sample, 1)
+    if len(trial) > len(sample) * (1 - MIN_SAVING):
+        return False, "trial"
+    return True, "trial"
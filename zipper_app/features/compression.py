@@ -1,114 +1,1657 @@
+import copy
+import io
+import itertools
 import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 import zipfile
-import py7zr
+import zlib
 import lzma
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-import base64
+from . import backends
+from .xz_blocks import (XZBlockWriter, XZBlockReader, XZSeekableReader, DEFAULT_BLOCK_SIZE,
+                        DEFAULT_PRESET as XZ_PRESET, read_block_layout,
+                        can_decompress_parallel)
+from .manifest import load_manifest, save_manifest, plan_update
+from .archive_index import index_entry, load_index, save_index
+from .journal import JobJournal
+from .scanner import ScanEntry, arcname, member_path
+from .dedup import ChunkStore
+from .classify import classify
+from .encryption import (EncryptingWriter, DecryptionError, DamagedArchiveError,
+                         is_encrypted, open_decrypted, plain_name)
+from .fileio import InputFile, copy_into
+from .frames import FORMATS as FRAME_FORMATS, FrameError, check_level, open_reader, open_writer
+from .keys import KDF_ITERATIONS, check_iterations
+from .volumes import (VolumeReader, VolumeWriter, archive_size, check_volume_size,
+                      find_volumes, first_volume, open_volumes, publish_volumes,
+                      remove_volumes, split_base)
+
+# Loaded on first use
+py7zr = backends.lazy("py7zr")
 
 class CompressionProfile:
     FAST = "Fast"      # ZIP format, fast compression
     NORMAL = "Normal"  # 7Z format, balanced compression
     MAXIMUM = "Maximum"  # LZMA format, maximum compression
+    ZSTANDARD = "Zstandard"  # zstd, multi-threaded, with selectable levels
+    LZ4 = "LZ4"        # LZ4 frames, fastest
+
+# Profiles whose archives are a Zstandard or LZ4 stream (see frames.py),
+# of a single file or a tar of several
+FRAME_PROFILES = {CompressionProfile.ZSTANDARD: '.zst', CompressionProfile.LZ4: '.lz4'}
+
+# Size of the blocks streamed through the LZMA codec, so memory use stays
+# flat regardless of input size
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# xz preset for large members that would not compress
+XZ_FAST_PRESET = 0
+XZ_FAST_MIN_SIZE = 1024 * 1024
+
+# Streamed input (e.g. a directory scan) goes to the parallel ZIP writer in
+# windows of this many files per worker, so compression starts at once and
+# only a bounded number of files are in flight
+STREAM_WINDOW = 16
+
+# Rough memory use, for fitting a job under a memory ceiling: an LZMA
+# encoder per xz worker, plus about four blocks per worker (and one more)
+# queued or being compressed; a process per parallel ZIP worker
+XZ_ENCODER_MEMORY = 94 * 1024 * 1024
+XZ_MIN_BLOCK_SIZE = 4 * 1024 * 1024
+ZIP_WORKER_MEMORY = 32 * 1024 * 1024
+FRAME_WORKER_MEMORY = 32 * 1024 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+
+# Extracted files at least this large get their full size allocated before
+# they are written, which keeps them contiguous on disk
+PREALLOCATE_MIN_SIZE = 1024 * 1024
+
+class JobCancelled(Exception):
+    # Raised from a progress callback to abort a running job
+    pass
+
+class JobInterrupted(JobCancelled):
+    # Stops a job only for now, e.g. because the application is closing; a
+    # resumable job keeps its journal and partial archive
+    pass
+
+class _Progress:
+    # Accumulates processed bytes and forwards (done, total) to the caller's
+    # callback, which may raise JobCancelled. Safe to call from worker threads.
+    # With a throttle (a TokenBucket), callers are held back to its rate.
+    def __init__(self, callback=None, total=0, throttle=None):
+        self.callback = callback
+        self.total = total
+        self.done = 0
+        self.throttle = throttle
+        self._lock = threading.Lock()
+
+    def __call__(self, nbytes=0):
+        if self.throttle is not None and nbytes:
+            self.throttle.consume(nbytes)
+        self.skipped(nbytes)
+
+    def skipped(self, nbytes=0):
+        # Counts bytes that need no reading, e.g. those already in the
+        # archive a job resumes
+        with self._lock:
+            self.done += nbytes
+            done = self.done
+        if self.callback:
+            self.callback(done, self.total)
+
+# Archive types extract_files, list_archive and test_archive accept
+ARCHIVE_EXTENSIONS = ('.zip', '.7z', '.xz', '.zstore') + FRAME_FORMATS
+
+# Multi-file Maximum archives are a PAX tar inside xz; this global header key
+# tells them apart from a single compressed file that happens to be a tar
+CONTAINER_MARKER = 'ZIPPER.container'
+
+class _ProgressReader:
+    # File wrapper that reports every read to a _Progress
+    def __init__(self, fileobj, progress):
+        self.fileobj = fileobj
+        self.progress = progress
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.progress(len(data))
+        return data
+
+_seven_zip_progress_class = None
+
+def _seven_zip_progress(progress, names=None):
+    # The callback base class lives in py7zr, so the subclass is only
+    # created once 7z support is actually used. With names, only those
+    # members count: py7zr also reports the ones it decodes and skips.
+    global _seven_zip_progress_class
+    if _seven_zip_progress_class is None:
+        callbacks = backends.load("py7zr.callbacks")
+
+        class _SevenZipProgress(callbacks.ExtractCallback):
+            def __init__(self, progress, names):
+                self.progress = progress
+                self.names = names
+
+            def report_start_preparation(self):
+                pass
+
+            def report_start(self, processing_file_path, processing_bytes):
+                pass
+
+            def report_update(self, decompressed_bytes):
+                pass
+
+            def report_end(self, processing_file_path, wrote_bytes):
+                if self.names is None or processing_file_path in self.names:
+                    self.progress(int(wrote_bytes))
+
+            def report_warning(self, message):
+                pass
+
+            def report_postprocess(self):
+                pass
+
+        _seven_zip_progress_class = _SevenZipProgress
+    return _seven_zip_progress_class(progress, names)
+
+def _archive_name(archive_path):
+    # The name that tells an archive's format: without the volume number
+    # of a split archive or the suffix of an encrypted one
+    return Path(plain_name(split_base(archive_path) or archive_path))
+
+def _open_binary(source):
+    # A path is opened here; an already open stream is left to its owner
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    return nullcontext(source)
+
+def _preallocate(f, size):
+    if size >= PREALLOCATE_MIN_SIZE and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except OSError:
+            pass  # e.g. not supported by the file system
+
+def _round_record(size):
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+def _run_threads(tasks, workers):
+    # Runs callables on a thread pool. The first failure (or cancellation)
+    # drops the tasks that have not started and is re-raised once the
+    # running ones have finished.
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zipper-extract') as pool:
+        futures = [pool.submit(task) for task in tasks]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+    for future in futures:
+        if not future.cancelled():
+            future.result()
+
+def _check_names(names, available):
+    missing = [name for name in names if name not in available]
+    if missing:
+        raise KeyError(f"Not in archive: {', '.join(missing)}")
+
+def _tar_index_entry(member):
+    return index_entry(member.name, member.offset_data, member.size, member.mtime, member.isdir())
+
+def _list_entry(name, size, compressed_size, is_dir, mtime):
+    return {"name": name, "size": size, "compressed_size": compressed_size,
+            "is_dir": is_dir, "mtime": mtime}
+
+def _decide(file_path, adaptive):
+    # (compress, reason) for one input file
+    if not adaptive:
+        return True, "disabled"
+    return classify(file_path)
+
+def _member_decision(name, method, reason):
+    return {"name": name, "method": method, "reason": reason}
+
+def _file_size(file):
+    return file.stat.st_size if isinstance(file, ScanEntry) else os.path.getsize(file)
+
+def _windows(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        window = list(itertools.islice(iterator, size))
+        if not window:
+            return
+        yield window
+
+def _streamed(files):
+    # Anything but a list or tuple of files is consumed as it comes
+    return not isinstance(files, (list, tuple))
+
+def _crc(src, chunk_size, progress=None):
+    # (CRC-32, size) of what is left of src
+    crc = 0
+    size = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return crc, size
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        if progress:
+            progress(len(chunk))
+
+def _deflate_member(file_path, temp_path, chunk_size, adaptive=False, mapped=True):
+    # Runs in a worker process: raw-deflate one file into temp_path. One
+    # that would not compress is only checksummed; it is later copied into
+    # the archive straight from the file.
+    compress, reason = _decide(file_path, adaptive)
+    with InputFile(file_path, mapped) as src:
+        if not compress:
+            crc, file_size = _crc(src, chunk_size)
+            return crc, file_size, file_size, compress, reason
+        crc = 0
+        file_size = 0
+        deflater = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        with open(temp_path, 'wb') as dst:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                crc = zlib.crc32(chunk, crc)
+                dst.write(deflater.compress(chunk))
+            dst.write(deflater.flush())
+            compress_size = dst.tell()
+    return crc, file_size, compress_size, compress, reason
+
+_ZIP_ENTRY_FIELDS = ('compress_type', 'external_attr', 'create_system', 'CRC',
+                     'compress_size', 'file_size', 'header_offset')
+
+def _zip_entry(zinfo):
+    # A committed member as the journal keeps it, to rebuild the central
+    # directory when a job resumes
+    entry = {field: getattr(zinfo, field) for field in _ZIP_ENTRY_FIELDS}
+    entry["name"] = zinfo.filename
+    entry["date_time"] = list(zinfo.date_time)
+    return entry
+
+def _zip_info(entry):
+    zinfo = zipfile.ZipInfo(entry["name"], tuple(entry["date_time"]))
+    for field in _ZIP_ENTRY_FIELDS:
+        setattr(zinfo, field, entry[field])
+    return zinfo
+
+def _fsync(fp):
+    fp.flush()
+    if isinstance(fp, VolumeWriter):
+        fp.fsync()
+    else:
+        os.fsync(fp.fileno())
+
+@contextmanager
+def _writing(output):
+    # A writer's output: a path, or a file the caller opened (and closes)
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'wb') as fp:
+            yield fp
+    else:
+        yield output
+
+def _folder(output):
+    # Where scratch files for output go
+    return (output.base if isinstance(output, VolumeWriter) else Path(output)).parent
+
+def _write_raw_member(zf, zinfo, src, chunk_size):
+    # zipfile has no public API for already-compressed data, so write the
+    # local header and payload ourselves and let close() emit the central
+    # directory entry
+    zinfo.header_offset = zf.fp.tell()
+    zf.fp.write(zinfo.FileHeader())
+    copy_into(src, zf.fp, zinfo.compress_size, chunk_size)
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf.start_dir = zf.fp.tell()
+    zf._didModify = True
+
+class _RangeReader:
+    # Reads at most `length` bytes from the current position of fileobj
+    def __init__(self, fileobj, length):
+        self.fileobj = fileobj
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        self.remaining -= len(data)
+        return data
+
+def _copy_raw_member(src_fp, info, zf, chunk_size):
+    # Move a member between ZIP files without recompressing it
+    src_fp.seek(info.header_offset)
+    header = src_fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    src_fp.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+
+    # A fresh ZipInfo drops the data-descriptor flag and stale ZIP64 extras;
+    # the new local header carries the real CRC and sizes
+    zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.CRC = info.CRC
+    zinfo.file_size = info.file_size
+    zinfo.compress_size = info.compress_size
+    zinfo.external_attr = info.external_attr
+    zinfo.create_system = info.create_system
+    _write_raw_member(zf, zinfo, src_fp, chunk_size)
+
+@contextmanager
+def _rollback_append(path, head_size, tail_offset):
+    # Appending rewrites the start of the file and everything from
+    # tail_offset on in place; keep copies so a failed append leaves the
+    # original archive intact
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        head = f.read(head_size)
+        f.seek(tail_offset)
+        tail = f.read()
+    try:
+        yield
+    except BaseException:
+        with open(path, 'r+b') as f:
+            f.write(head)
+            f.seek(tail_offset)
+            f.write(tail)
+            f.truncate()
+        # Keep the manifest valid for the restored archive
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        raise
 
 class Compressor:
-    def __init__(self):
-        self.encryption_key = None
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, block_size=DEFAULT_BLOCK_SIZE,
+                 kdf_iterations=KDF_ITERATIONS):
+        if chunk_size <= 0:
+            raise ValueError(f"Chunk size must be positive: {chunk_size}")
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        # PBKDF2 cost for archives this compressor encrypts
+        self.kdf_iterations = check_iterations(kdf_iterations)
+        self.limits = None
+        # Memory-map large inputs (see fileio.py)
+        self.map_inputs = True
     
-    def generate_key(self, password=None):
-        if password:
-            # Generate a key from the password
-            salt = b'zipper_salt'  # In production, use a random salt
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        else:
-            # Generate a random key
-            key = Fernet.generate_key()
-        
-        self.encryption_key = key
-        return key
+    def _limited(self, limits, profile, workers):
+        # A copy of this compressor for one job under ResourceLimits, and
+        # the number of workers it may use
+        workers = limits.workers(workers)
+        compressor = copy.copy(self)
+        compressor.limits = limits
+        if limits.memory:
+            compressor.chunk_size = max(MIN_CHUNK_SIZE, min(self.chunk_size, limits.memory // 64))
+            if profile == CompressionProfile.MAXIMUM:
+                workers, compressor.block_size = self._fit_xz(limits.memory, workers)
+            elif profile == CompressionProfile.FAST:
+                workers = max(1, min(workers, limits.memory // (ZIP_WORKER_MEMORY +
+                                                                compressor.chunk_size)))
+            elif profile in FRAME_PROFILES:
+                # Two blocks per worker in flight, as with xz
+                compressor.block_size = max(MIN_CHUNK_SIZE, min(self.block_size,
+                                                                limits.memory // 64))
+                workers = max(1, min(workers, limits.memory // (FRAME_WORKER_MEMORY +
+                                                                2 * compressor.block_size)))
+        return compressor, workers
     
-    def compress_files(self, files, output_path, profile=CompressionProfile.NORMAL):
+    def _fit_xz(self, memory, workers):
+        # Smaller blocks first, down to XZ_MIN_BLOCK_SIZE, then fewer workers
+        for count in range(workers, 0, -1):
+            block_size = (memory - count * XZ_ENCODER_MEMORY) // (4 * (count + 1))
+            if block_size >= XZ_MIN_BLOCK_SIZE:
+                return count, min(self.block_size, block_size)
+        return 1, min(self.block_size, XZ_MIN_BLOCK_SIZE)
+    
+    def _copy(self, src, dst, progress, chunk_size=None):
+        # dst=None reads src through and discards it, e.g. to verify it
+        while True:
+            chunk = src.read(chunk_size or self.chunk_size)
+            if not chunk:
+                break
+            if dst is not None:
+                dst.write(chunk)
+            if progress:
+                progress(len(chunk))
+    
+    def compress_files(self, files, output_path, profile=CompressionProfile.NORMAL,
+                       workers=None, progress=None, update=False, adaptive=True,
+                       password=None, resumable=False, restart=False, limits=None,
+                       volume_size=None, level=None):
+        # files may also be an iterable such as a DirectoryScan, which is
+        # compressed while it is still producing files. limits, a
+        # ResourceLimits, caps what the job may use of the machine. With a
+        # volume_size, the archive is split into volumes of that many bytes.
+        # level is the Zstandard or LZ4 level, None for the default.
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if limits is None:
+            return self._compress_files(files, output_path, profile, workers, progress, update,
+                                        adaptive, password, resumable, restart, volume_size,
+                                        level)
+        compressor, workers = self._limited(limits, profile, workers)
+        return limits.run(compressor._compress_files, files, output_path, profile, workers,
+                          progress, update, adaptive, password, resumable, restart, volume_size,
+                          level)
+    
+    def _compress_files(self, files, output_path, profile, workers, progress, update,
+                        adaptive, password, resumable, restart, volume_size, level=None):
         output_path = Path(output_path)
+        throttle = self.limits.bucket if self.limits is not None else None
+        if password and update:
+            raise ValueError("Encrypted archives cannot be updated incrementally")
+        if volume_size and update:
+            raise ValueError("Split archives cannot be updated incrementally")
+        if volume_size:
+            check_volume_size(volume_size)
+        if profile in FRAME_PROFILES:
+            level = check_level(FRAME_PROFILES[profile], level)
+        else:
+            level = None  # the other profiles have fixed settings
+        if _streamed(files) and update:
+            files = list(files)  # the update plan needs them all
+        if _streamed(files):
+            progress = _Progress(progress, throttle=throttle)
+            result = {"output": str(output_path)}
+        else:
+            progress = _Progress(progress, sum(_file_size(f) for f in files), throttle)
+            result = {"output": str(output_path), "files": len(files), "bytes": progress.total}
         
         # Create output directory if it doesn't exist
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
+        if update and profile in (CompressionProfile.FAST, CompressionProfile.NORMAL):
+            result["update"], result["members"] = self._update_archive(
+                files, output_path, profile, workers, progress, adaptive
+            )
+            return result
+        
+        if resumable:
+            result["members"], result["resumed"], volumes = self._compress_resumable(
+                files, output_path, profile, workers, progress, adaptive, password, restart,
+                volume_size, level
+            )
+            if volumes:
+                result["volumes"] = volumes
+            return self._tally(result, progress)
+        if _streamed(files):
+            files = self._counted(files, files, progress, output_path)
+        
+        # An encrypted archive is built in plain form first and then sealed
+        # segment by segment into the output. A split one is built straight
+        # into volumes, under a temporary name until it is complete.
+        target = output_path
+        if password or volume_size:
+            target = output_path.with_name(f".{output_path.name}.{os.getpid()}.plain")
+        tar_index = []
+        try:
+            if volume_size:
+                with VolumeWriter(target, volume_size) as out:
+                    members = self._build(files, out, profile, level, workers, progress,
+                                          adaptive)
+                result["volumes"] = self._publish_volumes(target, output_path, volume_size,
+                                                          password, progress)
+            else:
+                members = self._build(files, target, profile, level, workers, progress,
+                                      adaptive, tar_index)
+                if password:
+                    self._encrypt_file(target, output_path, password, progress)
+                elif tar_index:
+                    save_index(output_path, tar_index)
+        except BaseException:
+            # Never leave a half-written archive behind
+            output_path.unlink(missing_ok=True)
+            raise
+        finally:
+            if target != output_path:
+                target.unlink(missing_ok=True)
+                remove_volumes(target)
+        result["members"] = members
+        return self._tally(result, progress)
+    
+    def _build(self, files, output, profile, level, workers, progress, adaptive,
+               tar_index=None, journal=None, single=None):
+        # Writes the archive into output, a path or an open file. Returns
+        # the members.
         if profile == CompressionProfile.FAST:
-            self._compress_zip(files, output_path)
-        elif profile == CompressionProfile.NORMAL:
-            self._compress_7z(files, output_path)
-        else:  # MAXIMUM
-            self._compress_lzma(files, output_path)
-    
-    def _compress_zip(self, files, output_path):
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for file in files:
-                file_path = Path(file)
-                zf.write(file_path, file_path.name)
+            return self._compress_zip(files, output, workers, progress, adaptive, journal)
+        if profile == CompressionProfile.NORMAL:
+            return self._compress_7z(files, output, progress, adaptive)
+        if profile in FRAME_PROFILES:
+            return self._compress_frames(files, output, FRAME_PROFILES[profile], level,
+                                         workers, progress, adaptive)
+        return self._compress_lzma(files, output, workers, progress, adaptive, tar_index,
+                                   journal, single)
     
-    def _compress_7z(self, files, output_path):
-        with py7zr.SevenZipFile(output_path, 'w') as sz:
-            for file in files:
-                file_path = Path(file)
-                sz.write(file_path, file_path.name)
-    
-    def _compress_lzma(self, files, output_path):
-        if len(files) == 1:
-            # Single file: direct LZMA compression
-            with lzma.open(output_path, 'wb') as lz:
-                with open(files[0], 'rb') as f:
-                    lz.write(f.read())
+    @staticmethod
+    def _counted(files, source, progress, output_path):
+        # Passes streamed files on, keeping the progress total at what the
+        # source has found so far (a scan runs ahead of the compressor).
+        # A scan of the folder the archive goes to would also find the
+        # archive, its partial file and sidecars being written.
+        folder = os.path.abspath(output_path.parent)
+        own = (output_path.name, "." + output_path.name)
+        for file in files:
+            path = os.path.abspath(file)
+            if os.path.dirname(path) == folder and os.path.basename(path).startswith(own):
+                continue
+            progress.total = max(getattr(source, 'bytes_found', 0),
+                                 progress.total + _file_size(file))
+            yield file
+    
+    @staticmethod
+    def _tally(result, progress):
+        # Totals of streamed input are only known at the end
+        if "files" not in result:
+            result["files"] = len(result["members"])
+            result["bytes"] = progress.done
+        return result
+    
+    def _compress_resumable(self, files, output_path, profile, workers, progress, adaptive,
+                            password, restart, volume_size=None, level=None):
+        # Like compress_files, but built in the journal's partial file with
+        # checkpoints, carrying on from an earlier interrupted run of the
+        # same job. Returns the members, how many of them were already done
+        # and the volumes of a split archive. An explicit cancel throws the
+        # work away; anything else (closing, a crash, an error) leaves it to
+        # be resumed.
+        options = {"volume_size": volume_size} if volume_size else {}
+        if level is not None:
+            options["level"] = level
+        if self.limits is not None:
+            # So the job resumes under the same limits
+            options["limits"] = self.limits.to_settings()
+        journal = JobJournal.open(output_path, files, profile, restart=restart,
+                                  adaptive=adaptive, encrypted=bool(password), **options)
+        resumed = journal.count
+        if _streamed(files):
+            # Whatever the scan finds again that is in the archive already
+            done = set(journal.sources)
+            remaining = self._counted((f for f in files if os.fspath(f) not in done), files,
+                                      progress, output_path)
+            single = False
         else:
-            # Multiple files: create ZIP first, then compress with LZMA
-            with lzma.open(output_path, 'wb') as lz:
-                with zipfile.ZipFile(lz, 'w', zipfile.ZIP_DEFLATED) as zf:
-                    for file in files:
-                        file_path = Path(file)
-                        zf.write(file_path, file_path.name)
-    
-    def extract_files(self, archive_path, output_dir):
+            single = len(files) == 1
+            # A single file carries on from inside itself
+            remaining = files if single else files[resumed:]
+        progress.skipped(journal.bytes)
+        try:
+            if not journal.built:
+                with journal.open_partial() as partial:
+                    if profile == CompressionProfile.NORMAL or profile in FRAME_PROFILES:
+                        # py7zr writes a solid archive in one go, and the
+                        # frame formats are fast enough that an interrupted
+                        # run simply starts over: no checkpoint before the end
+                        for member in self._build(remaining, partial, profile, level, workers,
+                                                  progress, adaptive):
+                            journal.commit(None, member)
+                    else:
+                        self._build(remaining, partial, profile, level, workers, progress,
+                                    adaptive, journal=journal, single=single)
+                journal.finish_build(progress.done)
+            volumes = None
+            if volume_size:
+                # Sealing uses up the partial volumes; an interruption then
+                # starts the job over
+                volumes = self._publish_volumes(journal.partial, output_path, volume_size,
+                                                password, progress)
+            elif password:
+                self._replace_output(output_path, lambda temp: self._encrypt_file(
+                    journal.partial, temp, password, progress
+                ))
+                journal.partial.unlink()
+            else:
+                os.replace(journal.partial, output_path)
+                if profile == CompressionProfile.MAXIMUM and not single:
+                    save_index(output_path, journal.entries)
+        except JobInterrupted:
+            journal.close()
+            raise
+        except JobCancelled:
+            journal.discard()
+            raise
+        except BaseException:
+            journal.close()
+            raise
+        journal.complete()
+        return journal.members, resumed, volumes
+    
+    def _publish_volumes(self, plain_base, output_path, volume_size, password, progress):
+        # Moves the finished volumes of plain_base to those of output_path,
+        # sealing them on the way when the archive is to be encrypted. Each
+        # plain volume is deleted once it is read, so the archive is on disk
+        # about once. Returns the volume paths.
+        source = plain_base
+        if password:
+            source = output_path.with_name(f".{output_path.name}.{os.getpid()}.sealed")
+            plain = find_volumes(plain_base)
+            try:
+                with VolumeReader(plain, remove_read=True) as src, \
+                        VolumeWriter(source, volume_size) as dst, \
+                        EncryptingWriter(dst, password, iterations=self.kdf_iterations) as enc:
+                    # The bytes were already counted; this only lets a
+                    # cancellation through
+                    self._copy(src, enc, lambda nbytes: progress())
+            except BaseException:
+                remove_volumes(source)
+                raise
+            finally:
+                for path in plain:
+                    path.unlink(missing_ok=True)
+        return [str(path) for path in publish_volumes(source, output_path)]
+    
+    def _encrypt_file(self, plain_path, output_path, password, progress):
+        with open(plain_path, 'rb') as src, open(output_path, 'wb') as dst:
+            with EncryptingWriter(dst, password, iterations=self.kdf_iterations) as enc:
+                # The bytes were already counted; this only lets a
+                # cancellation through
+                self._copy(src, enc, lambda nbytes: progress())
+    
+    def _update_archive(self, files, output_path, profile, workers, progress, adaptive):
+        # Bring an existing archive in line with `files`, touching only the
+        # members whose content changed since the manifest was written
+        old_members = load_manifest(output_path) if output_path.exists() else None
+        plan = plan_update(files, old_members or {}, self.chunk_size)
+        
+        members = []
+        if old_members is None:
+            # No usable manifest: build from scratch, then record one
+            mode = "rebuilt"
+            members = self._replace_output(output_path, lambda temp: (
+                self._compress_zip(files, temp, workers, progress, adaptive)
+                if profile == CompressionProfile.FAST
+                else self._compress_7z(files, temp, progress, adaptive)
+            ))
+        elif not (plan["changed"] or plan["added"] or plan["removed"]):
+            mode = "unchanged"
+            progress.skipped(progress.total)
+        elif not (plan["changed"] or plan["removed"]):
+            mode = "appended"
+            if profile == CompressionProfile.FAST:
+                members = self._append_zip(plan["added"], output_path, workers, progress, adaptive)
+            else:
+                members = self._append_7z(plan["added"], output_path, progress)
+        elif profile == CompressionProfile.FAST:
+            mode = "rewritten"
+            members = self._replace_output(output_path, lambda temp: self._rewrite_zip(
+                plan, output_path, temp, workers, progress, adaptive
+            ))
+        else:
+            # py7zr cannot drop or replace members of a (solid) 7z archive
+            mode = "rebuilt"
+            members = self._replace_output(
+                output_path, lambda temp: self._compress_7z(files, temp, progress, adaptive)
+            )
+        
+        save_manifest(output_path, plan["members"])
+        summary = {
+            "mode": mode,
+            "added": [arcname(f) for f in plan["added"]],
+            "changed": [arcname(f) for f in plan["changed"]],
+            "removed": plan["removed"],
+            "unchanged": len(plan["unchanged"])
+        }
+        return summary, members
+    
+    def _replace_output(self, output_path, build):
+        # Build into a temporary file beside the output and swap it in, so
+        # the previous archive survives a failed or cancelled update
+        temp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.partial")
+        try:
+            result = build(temp_path)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return result
+    
+    def _append_zip(self, files, output_path, workers, progress, adaptive):
+        with zipfile.ZipFile(output_path) as zf:
+            start_dir = zf.start_dir
+        with _rollback_append(output_path, 0, start_dir):
+            with zipfile.ZipFile(output_path, 'a', zipfile.ZIP_DEFLATED) as zf:
+                return self._write_zip_members(
+                    zf, files, progress, workers, output_path.parent, adaptive
+                )
+    
+    def _append_7z(self, files, output_path, progress):
+        # The signature header points at the archive header, which
+        # appending overwrites with new packed streams. Appended members use
+        # the archive's existing coder. py7zr corrupts the archive when one
+        # append session writes more than one file, so every file gets its
+        # own session (and its own folder).
+        with open(output_path, 'rb') as f:
+            signature = f.read(32)
+        header_offset = 32 + struct.unpack('<Q', signature[12:20])[0]
+        members = []
+        with _rollback_append(output_path, 32, header_offset):
+            for file in files:
+                name = arcname(file)
+                with py7zr.SevenZipFile(output_path, 'a') as sz:
+                    sz.write(Path(file), name)
+                progress(_file_size(file))
+                members.append(_member_decision(name, "7z", "append"))
+        return members
+    
+    def _rewrite_zip(self, plan, old_path, output_path, workers, progress, adaptive):
+        # Unchanged members are copied as already-compressed bytes; only new
+        # and changed files go through the compressor
+        with zipfile.ZipFile(old_path) as old_zf, open(old_path, 'rb') as old_fp, \
+                zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for file in plan["unchanged"]:
+                info = old_zf.getinfo(arcname(file))
+                _copy_raw_member(old_fp, info, zf, self.chunk_size)
+                progress(info.file_size)
+            return self._write_zip_members(
+                zf, plan["changed"] + plan["added"], progress, workers,
+                output_path.parent, adaptive
+            )
+    
+    def _compress_zip(self, files, output, workers, progress, adaptive=True, journal=None):
+        if journal is None:
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+                return self._write_zip_members(
+                    zf, files, progress, workers, _folder(output), adaptive
+                )
+        
+        # Resuming: output is the journal's partial archive, at the last
+        # checkpoint. Members before it are already in the file, only their
+        # central directory entries need to be restored.
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for entry in journal.entries:
+                zinfo = _zip_info(entry)
+                zf.filelist.append(zinfo)
+                zf.NameToInfo[zinfo.filename] = zinfo
+            def sync():
+                _fsync(output)
+                return zf.start_dir, [], {}
+            journal.sync = sync
+            return self._write_zip_members(
+                zf, files, progress, workers, journal.partial.parent, adaptive, journal
+            )
+    
+    def _write_zip_members(self, zf, files, progress, workers=1, scratch_dir=None,
+                           adaptive=True, journal=None):
+        # Returns the per-member codec decisions
+        if workers > 1 and (_streamed(files) or len(files) > 1):
+            return self._write_zip_members_parallel(
+                zf, files, progress, workers, scratch_dir, adaptive, journal
+            )
+        
+        members = []
+        for file in files:
+            file_path = Path(file)
+            compress, reason = _decide(file_path, adaptive)
+            zinfo = zipfile.ZipInfo.from_file(file_path, arcname(file))
+            zinfo.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with InputFile(file_path, self.map_inputs) as src:
+                if compress or not src.mapped:
+                    with zf.open(zinfo, 'w') as dst:
+                        self._copy(src, dst, progress)
+                else:
+                    # Only the checksum needs the data in Python; it goes
+                    # into the archive inside the kernel
+                    zinfo.CRC, zinfo.file_size = _crc(src, self.chunk_size, progress)
+                    zinfo.compress_size = zinfo.file_size
+                    src.seek(0)
+                    _write_raw_member(zf, zinfo, src, self.chunk_size)
+            members.append(_member_decision(
+                zinfo.filename, "deflate" if compress else "stored", reason
+            ))
+            if journal is not None:
+                journal.commit(os.fspath(file), members[-1], _zip_entry(zinfo), zinfo.file_size)
+        return members
+    
+    def _write_zip_members_parallel(self, zf, files, progress, workers, scratch_dir, adaptive,
+                                    journal=None):
+        # Deflate members concurrently into a scratch directory next to the
+        # output, then stitch them into the archive in the original order.
+        # Workers also classify their member, spreading that cost too. A list
+        # goes to the pool in one go; streamed files in windows, the next
+        # one queued while the current one is stitched.
+        temp_dir = tempfile.mkdtemp(prefix='.zipper-', dir=scratch_dir)
+        pool = ProcessPoolExecutor(max_workers=workers)
+        members = []
+        windows = [files]
+        if _streamed(files) or self.limits is not None:
+            # A throttled job must not have its workers read everything
+            # ahead of the throttle either
+            windows = _windows(files, workers * STREAM_WINDOW)
+        try:
+            queued = None
+            for number, window in enumerate(windows):
+                temp_paths = [os.path.join(temp_dir, f"{number}-{i}") for i in range(len(window))]
+                results = pool.map(
+                    _deflate_member,
+                    [os.fspath(f) for f in window],
+                    temp_paths,
+                    [self.chunk_size] * len(window),
+                    [adaptive] * len(window),
+                    [self.map_inputs] * len(window),
+                    chunksize=max(1, len(window) // (workers * 8))
+                )
+                if queued:
+                    self._stitch_zip_members(zf, *queued, progress, members, journal)
+                queued = (window, temp_paths, results)
+            if queued:
+                self._stitch_zip_members(zf, *queued, progress, members, journal)
+        finally:
+            # Drop queued members straight away when cancelled
+            pool.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return members
+    
+    def _stitch_zip_members(self, zf, files, temp_paths, results, progress, members, journal):
+        for file, temp_path, result in zip(files, temp_paths, results):
+            crc, file_size, compress_size, compress, reason = result
+            zinfo = zipfile.ZipInfo.from_file(Path(file), arcname(file))
+            zinfo.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            zinfo.CRC = crc
+            zinfo.file_size = file_size
+            zinfo.compress_size = compress_size
+            # Stored members come straight from their file
+            with open(temp_path if compress else file, 'rb') as src:
+                _write_raw_member(zf, zinfo, src, self.chunk_size)
+            if compress:
+                os.remove(temp_path)
+            progress(file_size)
+            members.append(_member_decision(
+                zinfo.filename, "deflate" if compress else "stored", reason
+            ))
+            if journal is not None:
+                journal.commit(os.fspath(file), members[-1], _zip_entry(zinfo), file_size)
+    
+    def _compress_7z(self, files, output, progress, adaptive=True):
+        # py7zr applies one coder chain to the whole archive, so the copy
+        # filter is only used when no member would benefit from compression.
+        # Streamed files cannot all be looked at first and always get LZMA2.
+        decisions = ((f, *_decide(f, adaptive)) for f in files)
+        store_all = False
+        if not _streamed(files):
+            decisions = list(decisions)
+            store_all = adaptive and not any(compress for _, compress, _ in decisions)
+        filters = [{'id': py7zr.FILTER_COPY}] if store_all else None
+        members = []
+        with py7zr.SevenZipFile(output, 'w', filters=filters) as sz:
+            for file, compress, reason in decisions:
+                name = arcname(file)
+                sz.write(Path(file), name)
+                progress(_file_size(file))
+                if store_all:
+                    members.append(_member_decision(name, "copy", reason))
+                else:
+                    # Incompressible members still go through LZMA2 here
+                    members.append(_member_decision(
+                        name, "lzma2", reason if compress else "solid"
+                    ))
+        return members
+    
+    def _compress_lzma(self, files, output, workers, progress, adaptive=True,
+                       tar_index=None, journal=None, single=None):
+        # Input is cut into independent xz blocks compressed concurrently.
+        # For a tar container, tar_index collects where each member's data
+        # starts in the uncompressed stream. With a journal, a checkpoint
+        # ends the current block, so the stream can be continued from it;
+        # files then only holds those not in it yet, and single says whether
+        # the job is a single plain file, and output is the journal's open
+        # partial archive.
+        if single is None:
+            single = not _streamed(files) and len(files) == 1
+        members = []
+        resume = None
+        if journal is not None and journal.resumed:
+            resume = (journal.blocks, journal.state["pos"])
+        with _writing(output) as raw:
+            with XZBlockWriter(raw, block_size=self.block_size, workers=workers,
+                               resume=resume) as lz:
+                if single:
+                    # Single file: direct LZMA compression
+                    file_path = Path(files[0])
+                    members.append(self._select_xz_preset(lz, files[0], adaptive))
+                    with InputFile(file_path, self.map_inputs) as f:
+                        # Slices of a mapped file go to the block workers
+                        # as they are, a whole block at a time
+                        chunk_size = self.block_size if f.mapped else None
+                        if journal is None:
+                            self._copy(f, lz, progress, chunk_size)
+                        else:
+                            # Checkpoints may fall inside the file
+                            f.seek(journal.state.get("input", 0))
+                            journal.sync = lambda: self._sync_xz(raw, lz, input=f.tell())
+                            def advance(nbytes):
+                                journal.advance(nbytes)
+                                progress(nbytes)
+                            self._copy(f, lz, advance, chunk_size)
+                            if not journal.count:
+                                journal.commit(os.fspath(file_path), members[-1])
+                else:
+                    # Multiple files: a tar stream, written and read in one
+                    # pass. The global header marking Zipper's container is
+                    # already there when resuming.
+                    headers = {} if resume else {"pax_headers": {CONTAINER_MARKER: '1'}}
+                    with tarfile.open(fileobj=lz, mode='w', format=tarfile.PAX_FORMAT,
+                                      **headers) as tf:
+                        if journal is not None:
+                            journal.sync = lambda: self._sync_xz(raw, lz)
+                        for file in files:
+                            file_path = Path(file)
+                            members.append(self._select_xz_preset(lz, file, adaptive))
+                            tarinfo = tf.gettarinfo(file_path, arcname(file))
+                            with InputFile(file_path, self.map_inputs) as f:
+                                tf.copybufsize = self.block_size if f.mapped else None
+                                tf.addfile(tarinfo, _ProgressReader(f, progress))
+                            # The data ends tf.offset, padded to whole records
+                            data_offset = tf.offset - _round_record(tarinfo.size)
+                            entry = index_entry(tarinfo.name, data_offset, tarinfo.size,
+                                                tarinfo.mtime, False)
+                            if tar_index is not None:
+                                tar_index.append(entry)
+                            if journal is not None:
+                                journal.commit(os.fspath(file), members[-1], entry,
+                                               tarinfo.size)
+        return members
+    
+    def _compress_frames(self, files, output, fmt, level, workers, progress,
+                         adaptive=True):
+        # A single file is compressed as it is, several go into a tar
+        # stream like Maximum's. The codecs store incompressible data
+        # uncompressed by themselves, so adaptive only records why.
+        members = []
+        single = not _streamed(files) and len(files) == 1
+        method = fmt.lstrip('.')
+        with _writing(output) as raw, \
+                open_writer(fmt, raw, level, workers, self.block_size) as out:
+            if single:
+                with InputFile(files[0], self.map_inputs) as f:
+                    self._copy(f, out, progress, self.block_size if f.mapped else None)
+                members.append(_member_decision(arcname(files[0]), method,
+                                                _decide(files[0], adaptive)[1]))
+                return members
+            with tarfile.open(fileobj=out, mode='w', format=tarfile.PAX_FORMAT,
+                              pax_headers={CONTAINER_MARKER: '1'}) as tf:
+                for file in files:
+                    file_path = Path(file)
+                    tarinfo = tf.gettarinfo(file_path, arcname(file))
+                    with InputFile(file_path, self.map_inputs) as f:
+                        tf.copybufsize = self.block_size if f.mapped else None
+                        tf.addfile(tarinfo, _ProgressReader(f, progress))
+                    members.append(_member_decision(arcname(file), method,
+                                                    _decide(file, adaptive)[1]))
+        return members
+    
+    @staticmethod
+    def _sync_xz(raw, lz, **state):
+        records, pos = lz.checkpoint()
+        _fsync(raw)
+        return raw.tell(), records, dict(state, pos=pos)
+    
+    @staticmethod
+    def _select_xz_preset(lz, file, adaptive):
+        # xz has no stored mode, so large members that would not compress
+        # get blocks of their own at the cheapest preset. Small ones stay in
+        # the current block rather than breaking up the solid stream.
+        compress, reason = _decide(file, adaptive)
+        if not compress and _file_size(file) >= XZ_FAST_MIN_SIZE:
+            lz.set_preset(XZ_FAST_PRESET)
+            return _member_decision(arcname(file), "lzma2-fast", reason)
+        lz.set_preset(XZ_PRESET)
+        return _member_decision(arcname(file), "lzma2", reason if compress else "small")
+    
+    def extract_files(self, archive_path, output_dir, workers=None, progress=None,
+                      password=None, limits=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if limits is None:
+            return self._extract_files(archive_path, output_dir, workers, progress, password)
+        # Memory goes mostly to buffers here, which chunk_size bounds
+        compressor, workers = self._limited(limits, None, workers)
+        return limits.run(compressor._extract_files, archive_path, output_dir, workers,
+                          progress, password)
+    
+    def _extract_files(self, archive_path, output_dir, workers, progress, password):
         archive_path = Path(archive_path)
         output_dir = Path(output_dir)
+        throttle = self.limits.bucket if self.limits is not None else None
+        progress = _Progress(progress, throttle=throttle)
         
         # Create output directory if it doesn't exist
+        created_dir = not output_dir.exists()
         output_dir.mkdir(parents=True, exist_ok=True)
+        existing = set(os.listdir(output_dir))
         
-        ext = archive_path.suffix.lower()
+        try:
+            with self._open_archive(archive_path, password) as (source, ext):
+                opener = self._opener(archive_path, password)
+                if ext == '.zip':
+                    self._extract_zip(source, output_dir, workers, progress, opener)
+                elif ext == '.7z':
+                    self._extract_7z(source, output_dir, workers, progress, opener)
+                elif ext == '.zstore':
+                    self._extract_store(source, output_dir, progress)
+                elif ext in FRAME_FORMATS:
+                    self._extract_frames(source, archive_path, ext, output_dir, progress)
+                else:
+                    self._extract_lzma(source, archive_path, output_dir, workers, progress,
+                                       opener)
+        except BaseException:
+            # Remove whatever this extraction added to output_dir
+            if created_dir:
+                shutil.rmtree(output_dir, ignore_errors=True)
+            else:
+                for name in set(os.listdir(output_dir)) - existing:
+                    path = output_dir / name
+                    if path.is_dir() and not path.is_symlink():
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        path.unlink(missing_ok=True)
+            raise
+    
+    @staticmethod
+    def _archive_type(archive_path):
+        ext = _archive_name(archive_path).suffix.lower()
+        if ext not in ARCHIVE_EXTENSIONS:
+            raise ValueError(f"Unsupported archive format: {ext}")
+        return ext
+    
+    @contextmanager
+    def _open_archive(self, archive_path, password):
+        # Yields (source, ext): the archive path, or a seekable stream that
+        # joins the volumes of a split archive and decrypts an encrypted one
+        # on the fly
+        ext = self._archive_type(archive_path)
+        if ext == '.zstore':
+            yield archive_path, ext
+            return
+        split = split_base(archive_path) is not None
+        if not is_encrypted(first_volume(archive_path)):
+            if not split:
+                yield archive_path, ext
+                return
+            with open_volumes(archive_path, self.chunk_size) as stream:
+                yield stream, ext
+            return
+        if not password:
+            raise DecryptionError(f"{archive_path.name} is encrypted and needs a password")
+        source = open_volumes(archive_path, self.chunk_size) if split else archive_path
+        with open_decrypted(source, password, self.chunk_size) as stream:
+            yield stream, ext
+    
+    def _opener(self, archive_path, password):
+        # Opens another handle on the archive, one per extraction worker, so
+        # workers never share a file position (and read different volumes
+        # of a split archive at once)
+        if split_base(archive_path) is not None:
+            raw = lambda: open_volumes(archive_path, self.chunk_size)
+        else:
+            raw = lambda: open(archive_path, 'rb')
+        if password and is_encrypted(first_volume(archive_path)):
+            return lambda: open_decrypted(raw(), password, self.chunk_size)
+        return raw
+    
+    def _extract_zip(self, source, output_dir, workers, progress, opener):
+        with zipfile.ZipFile(source, 'r') as zf:
+            self._extract_zip_members(zf, output_dir, progress, workers, opener)
+    
+    def _extract_zip_members(self, zf, output_dir, progress, workers=1, opener=None):
+        members = zf.infolist()
+        # Every directory is created up front, so workers only write files.
+        # A name that occurs twice keeps its last member, as it would
+        # extracting in order.
+        files = {}
+        for info in members:
+            target = member_path(output_dir, info.filename)
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                files.pop(target, None)
+                files[target] = info
+        progress.total = sum(info.file_size for info in files.values())
+        
+        if workers <= 1 or opener is None or len(files) <= 1:
+            for target, info in files.items():
+                self._write_member(zf, info, target, progress)
+            return
+        
+        # Workers zlib-inflate concurrently (it releases the GIL), each
+        # through its own ZipFile on its own file handle. Largest members go
+        # first so the pool drains evenly.
+        local = threading.local()
+        handles = []
+        handles_lock = threading.Lock()
         
+        def worker_zip():
+            if not hasattr(local, 'zf'):
+                fp = opener()
+                local.zf = zipfile.ZipFile(fp, 'r')
+                with handles_lock:
+                    handles.append((local.zf, fp))
+            return local.zf
+        
+        order = sorted(files.items(), key=lambda item: item[1].file_size, reverse=True)
+        try:
+            _run_threads([
+                lambda target=target, info=info: self._write_member(
+                    worker_zip(), info, target, progress
+                )
+                for target, info in order
+            ], min(workers, len(order)))
+        finally:
+            for handle, fp in handles:
+                handle.close()
+                fp.close()
+    
+    def _write_member(self, zf, info, target, progress):
+        with zf.open(info) as src, open(target, 'wb') as dst:
+            _preallocate(dst, info.file_size)
+            self._copy(src, dst, progress)
+            # A member shorter than its header claims must not keep the
+            # preallocated tail
+            dst.truncate()
+    
+    def _extract_7z(self, source, output_dir, workers, progress, opener):
+        with py7zr.SevenZipFile(source, 'r') as sz:
+            infos = sz.list()
+            progress.total = sum(info.uncompressed for info in infos)
+            groups = self._seven_zip_folders(sz, infos) if workers > 1 else None
+            if not groups:
+                sz.extractall(output_dir, callback=_seven_zip_progress(progress))
+        if groups:
+            self._extract_7z_parallel(groups, infos, output_dir, workers, progress, opener)
+        # py7zr may run the callback on its own threads and swallow errors
+        # there, so give a pending cancellation one more chance to surface
+        progress()
+    
+    @staticmethod
+    def _seven_zip_folders(sz, infos):
+        # Member names per 7z folder (an independently compressed block), or
+        # None when there is nothing to run in parallel. A solid archive is
+        # one folder and has to be decoded front to back.
+        names = [info.filename for info in infos]
+        streams = getattr(sz.header, 'main_streams', None)
+        if streams is None or len(set(names)) != len(names):
+            return None
+        folders = [[f.filename for f in folder.files or ()]
+                   for folder in streams.unpackinfo.folders]
+        folders = [group for group in folders if group]
+        if len(folders) <= 1:
+            return None
+        return folders
+    
+    def _extract_7z_parallel(self, groups, infos, output_dir, workers, progress, opener):
+        for info in infos:
+            target = member_path(output_dir, info.filename)
+            (target if info.is_directory else target.parent).mkdir(parents=True, exist_ok=True)
+        # Directories and empty files belong to no folder; the first task
+        # takes them along
+        in_folders = {name for group in groups for name in group}
+        loose = [info.filename for info in infos if info.filename not in in_folders]
+        sizes = {info.filename: info.uncompressed for info in infos}
+        workers = min(workers, len(groups))
+        # Folders are dealt out largest first to the least loaded task
+        tasks = [[] for _ in range(workers)]
+        loads = [0] * workers
+        for group in sorted(groups, key=lambda g: sum(sizes[n] for n in g), reverse=True):
+            i = loads.index(min(loads))
+            tasks[i].extend(group)
+            loads[i] += sum(sizes[n] for n in group)
+        tasks[0].extend(loose)
+        
+        def extract(targets):
+            # An open file object keeps py7zr from spawning threads of its own
+            with opener() as fp, py7zr.SevenZipFile(fp, 'r') as sz:
+                sz.extract(output_dir, targets=targets, callback=_seven_zip_progress(progress))
+            progress()
+        
+        _run_threads([lambda targets=targets: extract(targets) for targets in tasks if targets],
+                     workers)
+    
+    def _extract_store(self, index_path, output_dir, progress):
+        # A deduplicated chunk store is opened through its index file and
+        # extracts the latest version of every stored file
+        if not index_path.is_file():
+            raise FileNotFoundError(f"Chunk store index not found: {index_path}")
+        store = ChunkStore(index_path.parent)
+        try:
+            progress.total = sum(entry["size"] for entry in store.latest_files())
+            store.extract_all(output_dir, progress)
+        finally:
+            store.close()
+    
+    def _extract_lzma(self, source, archive_path, output_dir, workers, progress, opener=None):
+        name = _archive_name(archive_path)
+        with _open_binary(source) as src:
+            # Decode the xz blocks concurrently when the archive has several
+            # of them, otherwise stream it
+            streams = read_block_layout(src)
+            with self._open_xz(src, streams, workers, opener) as lz:
+                head = lz.peek(1024)[:1024]
+                if head[:4] != b'PK\x03\x04':
+                    progress.total = sum(b[2] for _, blocks in streams for b in blocks)
+                    if self._is_tar_container(name, head):
+                        self._extract_tar_stream(_ProgressReader(lz, progress), output_dir)
+                    else:
+                        # Single file
+                        output_file = output_dir / name.stem
+                        with open(output_file, 'wb') as f:
+                            self._copy(lz, f, progress)
+                    return
+            
+            # Archives from older versions stored a ZIP inside the xz stream;
+            # zipfile needs to seek, so use a seekable LZMAFile
+            src.seek(0)
+            with lzma.open(src, 'rb') as lz, zipfile.ZipFile(lz) as zf:
+                self._extract_zip_members(zf, output_dir, progress)
+    
+    def _open_xz(self, src, streams, workers, opener=None):
+        if workers > 1 and can_decompress_parallel(streams):
+            return io.BufferedReader(XZBlockReader(src, streams, workers, opener),
+                                     self.chunk_size)
+        src.seek(0)
+        return lzma.open(src, 'rb')
+    
+    @contextmanager
+    def _open_frames(self, source, fmt, progress=None):
+        # A Zstandard or LZ4 stream, read front to back. Its uncompressed
+        # size is not known up front, so progress, if given, counts the
+        # compressed bytes read.
+        with _open_binary(source) as src:
+            if progress is not None:
+                progress.total = src.seek(0, io.SEEK_END)
+                src.seek(0)
+                src = _ProgressReader(src, progress)
+            with open_reader(fmt, src, self.chunk_size) as stream:
+                yield stream
+    
+    def _extract_frames(self, source, archive_path, fmt, output_dir, progress):
+        name = _archive_name(archive_path)
+        with self._open_frames(source, fmt, progress) as stream:
+            if self._is_tar_container(name, stream.peek(1024)[:1024]):
+                self._extract_tar_stream(stream, output_dir)
+            else:
+                # Single file
+                with open(output_dir / name.stem, 'wb') as f:
+                    self._copy(stream, f, None)
+    
+    @staticmethod
+    def _is_tar_container(archive_path, head):
+        name = archive_path.name.lower()
+        if name.endswith(('.tar.xz', '.txz', '.tar.zst', '.tzst', '.tar.lz4')):
+            return True
+        return CONTAINER_MARKER.encode() in head
+    
+    def _extract_tar_stream(self, stream, output_dir):
+        # 'r|' reads the tar strictly forward, never seeking back
+        with tarfile.open(fileobj=stream, mode='r|') as tf:
+            for member in tf:
+                target = member_path(output_dir, member.name)
+                if member.isdir():
+                    target.mkdir(parents=True, exist_ok=True)
+                elif member.isfile():
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    with tf.extractfile(member) as src, open(target, 'wb') as dst:
+                        self._copy(src, dst, None)
+                    os.utime(target, (member.mtime, member.mtime))
+                # Links and special files are never written by Zipper and
+                # are skipped rather than trusted
+    
+    def extract_members(self, archive_path, names, output_dir, workers=None, progress=None,
+                        password=None, limits=None):
+        # Extracts only the named members (as list_archive names them),
+        # decoding no more of the archive than its format needs. Returns the
+        # paths of the extracted files; raises KeyError for names the
+        # archive does not have.
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if limits is None:
+            return self._extract_members(archive_path, names, output_dir, workers, progress,
+                                         password)
+        compressor, workers = self._limited(limits, None, workers)
+        return limits.run(compressor._extract_members, archive_path, names, output_dir,
+                          workers, progress, password)
+    
+    def _extract_members(self, archive_path, names, output_dir, workers, progress, password):
+        archive_path = Path(archive_path)
+        output_dir = Path(output_dir)
+        names = list(dict.fromkeys(names))
+        throttle = self.limits.bucket if self.limits is not None else None
+        progress = _Progress(progress, throttle=throttle)
+        written = []
+        try:
+            with self._open_archive(archive_path, password) as (source, ext):
+                if ext == '.zip':
+                    with zipfile.ZipFile(source, 'r') as zf:
+                        self._extract_zip_subset(zf, names, output_dir, progress, written)
+                elif ext == '.7z':
+                    self._extract_7z_subset(source, names, output_dir, progress, written)
+                elif ext == '.zstore':
+                    self._extract_store_subset(source, names, output_dir, progress, written)
+                elif ext in FRAME_FORMATS:
+                    self._extract_frames_subset(source, archive_path, ext, names, output_dir,
+                                                progress, written)
+                else:
+                    self._extract_lzma_subset(source, archive_path, names, output_dir,
+                                              workers, progress, written)
+        except BaseException:
+            for path in written:
+                path.unlink(missing_ok=True)
+            raise
+        return [str(path) for path in written]
+    
+    def _extract_zip_subset(self, zf, names, output_dir, progress, written):
+        # The central directory says where each member starts
+        infos = {info.filename: info for info in zf.infolist()}
+        _check_names(names, infos)
+        progress.total = sum(infos[name].file_size for name in names)
+        for name in names:
+            info = infos[name]
+            target = member_path(output_dir, name)
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            written.append(target)
+            self._write_member(zf, info, target, progress)
+    
+    def _extract_7z_subset(self, source, names, output_dir, progress, written):
+        # py7zr skips the folders that hold none of the targets; inside a
+        # solid folder it has to decode up to the last target
+        with py7zr.SevenZipFile(source, 'r') as sz:
+            infos = {info.filename: info for info in sz.list()}
+            _check_names(names, infos)
+            progress.total = sum(infos[name].uncompressed for name in names)
+            written.extend(member_path(output_dir, name) for name in names
+                           if not infos[name].is_directory)
+            sz.extract(output_dir, targets=names,
+                       callback=_seven_zip_progress(progress, set(names)))
+        progress()
+    
+    def _extract_store_subset(self, index_path, names, output_dir, progress, written):
+        if not index_path.is_file():
+            raise FileNotFoundError(f"Chunk store index not found: {index_path}")
+        store = ChunkStore(index_path.parent)
+        try:
+            latest = {entry["name"]: entry for entry in store.latest_files()}
+            _check_names(names, latest)
+            progress.total = sum(latest[name]["size"] for name in names)
+            for name in names:
+                # Same layout as extract_all
+                target = member_path(output_dir, name)
+                written.append(target)
+                store.restore_file(latest[name]["id"], target, progress)
+        finally:
+            store.close()
+    
+    def _extract_lzma_subset(self, source, archive_path, names, output_dir, workers, progress,
+                             written):
+        name = _archive_name(archive_path)
+        # Only plain archives have an index; source is then the path itself
+        index = load_index(archive_path) if source is archive_path else None
+        with _open_binary(source) as src:
+            streams = read_block_layout(src)
+            with io.BufferedReader(XZSeekableReader(src, streams, self.chunk_size),
+                                   self.chunk_size) as lz:
+                head = lz.peek(1024)[:1024]
+                if head[:4] == b'PK\x03\x04':
+                    # Older archives: a ZIP inside the xz stream, read in place
+                    with zipfile.ZipFile(lz) as zf:
+                        self._extract_zip_subset(zf, names, output_dir, progress, written)
+                    return
+                if not self._is_tar_container(name, head):
+                    # Single file
+                    _check_names(names, {name.stem})
+                    progress.total = lz.raw.size
+                    output_file = output_dir / name.stem
+                    output_dir.mkdir(parents=True, exist_ok=True)
+                    written.append(output_file)
+                    with open(output_file, 'wb') as f:
+                        self._copy(lz, f, progress)
+                    return
+                if index is None:
+                    self._extract_tar_subset(src, streams, archive_path, source, names,
+                                             output_dir, workers, progress, written)
+                    return
+                
+                # With the index, only the blocks holding the wanted members
+                # are decoded, in stream order
+                entries = {entry["name"]: entry for entry in index}
+                _check_names(names, entries)
+                progress.total = sum(entries[n]["size"] for n in names)
+                for entry in sorted((entries[n] for n in names), key=lambda e: e["offset"]):
+                    target = member_path(output_dir, entry["name"])
+                    if entry["is_dir"]:
+                        target.mkdir(parents=True, exist_ok=True)
+                        continue
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    written.append(target)
+                    lz.seek(entry["offset"])
+                    with open(target, 'wb') as dst:
+                        _preallocate(dst, entry["size"])
+                        self._copy(_RangeReader(lz, entry["size"]), dst, progress)
+                        dst.truncate()
+                    os.utime(target, (entry["mtime"], entry["mtime"]))
+    
+    def _extract_tar_subset(self, src, streams, archive_path, source, names, output_dir,
+                            workers, progress, written):
+        # No index yet: one pass over the whole stream extracts the wanted
+        # members and records the index for next time
+        wanted = set(names)
+        index = []
+        progress.total = sum(b[2] for _, blocks in streams for b in blocks)
+        with self._open_xz(src, streams, workers) as lz, \
+                tarfile.open(fileobj=_ProgressReader(lz, progress), mode='r|') as tf:
+            for member in tf:
+                if not (member.isfile() or member.isdir()):
+                    continue
+                index.append(_tar_index_entry(member))
+                if member.name in wanted:
+                    self._extract_tar_member(tf, member, output_dir, written)
+        _check_names(names, {entry["name"] for entry in index})
+        if source is archive_path:
+            save_index(archive_path, index)
+    
+    def _extract_frames_subset(self, source, archive_path, fmt, names, output_dir, progress,
+                               written):
+        # There is no index to seek by: the stream is read up to the last
+        # wanted member
+        name = _archive_name(archive_path)
+        with self._open_frames(source, fmt, progress) as stream:
+            if not self._is_tar_container(name, stream.peek(1024)[:1024]):
+                # Single file
+                _check_names(names, {name.stem})
+                output_file = output_dir / name.stem
+                output_dir.mkdir(parents=True, exist_ok=True)
+                written.append(output_file)
+                with open(output_file, 'wb') as f:
+                    self._copy(stream, f, None)
+                return
+            wanted = set(names)
+            with tarfile.open(fileobj=stream, mode='r|') as tf:
+                for member in tf:
+                    if member.name in wanted and (member.isfile() or member.isdir()):
+                        self._extract_tar_member(tf, member, output_dir, written)
+                        wanted.discard(member.name)
+                        if not wanted:
+                            break
+        _check_names(names, set(names) - wanted)
+    
+    def _extract_tar_member(self, tf, member, output_dir, written):
+        target = member_path(output_dir, member.name)
+        if member.isdir():
+            target.mkdir(parents=True, exist_ok=True)
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        written.append(target)
+        with tf.extractfile(member) as data, open(target, 'wb') as dst:
+            self._copy(data, dst, None)
+        os.utime(target, (member.mtime, member.mtime))
+    
+    def list_archive(self, archive_path, password=None):
+        # [{"name", "size", "compressed_size", "is_dir", "mtime"}, ...];
+        # compressed_size is None where members share compressed data
+        # (solid 7z, tar.xz, chunk stores)
+        archive_path = Path(archive_path)
+        with self._open_archive(archive_path, password) as (source, ext):
+            return self._list_source(source, ext, archive_path)
+    
+    def _list_source(self, source, ext, archive_path):
         if ext == '.zip':
-            self._extract_zip(archive_path, output_dir)
-        elif ext == '.7z':
-            self._extract_7z(archive_path, output_dir)
-        elif ext == '.xz':
-            self._extract_lzma(archive_path, output_dir)
-        else:
-            raise ValueError(f"Unsupported archive format: {ext}")
+            with zipfile.ZipFile(source, 'r') as zf:
+                return self._list_zip_members(zf)
+        if ext == '.7z':
+            with py7zr.SevenZipFile(source, 'r') as sz:
+                return [
+                    _list_entry(info.filename, info.uncompressed, None, info.is_directory,
+                                info.creationtime.timestamp() if info.creationtime else None)
+                    for info in sz.list()
+                ]
+        if ext == '.zstore':
+            if not archive_path.is_file():
+                raise FileNotFoundError(f"Chunk store index not found: {archive_path}")
+            store = ChunkStore(archive_path.parent)
+            try:
+                return [
+                    _list_entry(entry["name"], entry["size"], None, False, entry["mtime"])
+                    for entry in store.latest_files()
+                ]
+            finally:
+                store.close()
+        if ext in FRAME_FORMATS:
+            return self._list_frames(source, archive_path, ext)
+        return self._list_lzma(source, archive_path)
     
-    def _extract_zip(self, archive_path, output_dir):
-        with zipfile.ZipFile(archive_path, 'r') as zf:
-            zf.extractall(output_dir)
+    @staticmethod
+    def _list_zip_members(zf):
+        return [
+            _list_entry(info.filename, info.file_size, info.compress_size, info.is_dir(),
+                        time.mktime(info.date_time + (0, 0, -1)))
+            for info in zf.infolist()
+        ]
     
-    def _extract_7z(self, archive_path, output_dir):
-        with py7zr.SevenZipFile(archive_path, 'r') as sz:
-            sz.extractall(output_dir)
+    def _list_lzma(self, source, archive_path):
+        name = _archive_name(archive_path)
+        index = load_index(archive_path) if source is archive_path else None
+        if index is not None:
+            return [_list_entry(e["name"], e["size"], None, e["is_dir"], e["mtime"])
+                    for e in index]
+        with _open_binary(source) as src:
+            streams = read_block_layout(src)
+            size = sum(b[2] for _, blocks in streams for b in blocks)
+            with self._open_xz(src, streams, 1) as lz:
+                head = lz.peek(1024)[:1024]
+                if head[:4] != b'PK\x03\x04':
+                    if not self._is_tar_container(name, head):
+                        # Single file; its size is in the xz index
+                        st = first_volume(archive_path).stat()
+                        return [_list_entry(name.stem, size, archive_size(archive_path), False,
+                                            st.st_mtime)]
+                    # The tar headers are spread through the stream, so
+                    # listing has to decode it; the index spares the next one
+                    with tarfile.open(fileobj=lz, mode='r|') as tf:
+                        index = [_tar_index_entry(member) for member in tf
+                                 if member.isfile() or member.isdir()]
+                    if source is archive_path:
+                        save_index(archive_path, index)
+                    return [_list_entry(e["name"], e["size"], None, e["is_dir"], e["mtime"])
+                            for e in index]
+            src.seek(0)
+            with lzma.open(src, 'rb') as lz, zipfile.ZipFile(lz) as zf:
+                return self._list_zip_members(zf)
     
-    def _extract_lzma(self, archive_path, output_dir):
-        with lzma.open(archive_path, 'rb') as lz:
+    def _list_frames(self, source, archive_path, fmt):
+        name = _archive_name(archive_path)
+        with self._open_frames(source, fmt) as stream:
+            if self._is_tar_container(name, stream.peek(1024)[:1024]):
+                # The tar headers are spread through the stream
+                with tarfile.open(fileobj=stream, mode='r|') as tf:
+                    return [_list_entry(member.name, member.size, None, member.isdir(),
+                                        member.mtime)
+                            for member in tf if member.isfile() or member.isdir()]
+            # Single file; not every frame records its size, so count it
+            sizes = []
+            self._copy(stream, None, sizes.append)
+        st = first_volume(archive_path).stat()
+        return [_list_entry(name.stem, sum(sizes), archive_size(archive_path), False,
+                            st.st_mtime)]
+    
+    def test_archive(self, archive_path, workers=None, progress=None, password=None):
+        # Reads every member back and checks it against its stored checksum.
+        # Returns the names of damaged members; an archive that cannot be
+        # opened at all raises.
+        archive_path = Path(archive_path)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        progress = _Progress(progress)
+        try:
+            with self._open_archive(archive_path, password) as (source, ext):
+                return self._test_source(source, ext, archive_path, workers, progress)
+        except DamagedArchiveError:
+            # A segment failed authentication somewhere in the middle
+            return [archive_path.name]
+    
+    def _test_source(self, source, ext, archive_path, workers, progress):
+        if ext == '.zip':
+            with zipfile.ZipFile(source, 'r') as zf:
+                return self._test_zip_members(zf, progress)
+        if ext == '.7z':
+            with py7zr.SevenZipFile(source, 'r') as sz:
+                bad = sz.testzip()
+            progress()
+            return [bad] if bad else []
+        if ext == '.zstore':
+            if not archive_path.is_file():
+                raise FileNotFoundError(f"Chunk store index not found: {archive_path}")
+            store = ChunkStore(archive_path.parent)
             try:
-                # Try to open as ZIP (multiple files)
-                with zipfile.ZipFile(lz) as zf:
-                    zf.extractall(output_dir)
-            except zipfile.BadZipFile:
-                # Not a ZIP, treat as single file
-                lz.seek(0)
-                output_file = output_dir / archive_path.stem
-                with open(output_file, 'wb') as f:
-                    f.write(lz.read())
+                progress.total = store.stats()["unique_bytes"]
+                return store.verify(progress)
+            finally:
+                store.close()
+        if ext in FRAME_FORMATS:
+            # Both formats carry a checksum of the content
+            try:
+                with self._open_frames(source, ext, progress) as stream:
+                    self._copy(stream, None, None)
+            except (FrameError, EOFError):
+                return [archive_path.name]
+            return []
+        
+        with _open_binary(source) as src:
+            streams = read_block_layout(src)
+            progress.total = sum(b[2] for _, blocks in streams for b in blocks)
+            with self._open_xz(src, streams, workers) as lz:
+                if lz.peek(4)[:4] != b'PK\x03\x04':
+                    # liblzma verifies the CRC32 of every block while decoding
+                    try:
+                        self._copy(lz, None, progress)
+                    except (lzma.LZMAError, EOFError):
+                        return [archive_path.name]
+                    return []
+            src.seek(0)
+            with lzma.open(src, 'rb') as lz, zipfile.ZipFile(lz) as zf:
+                return self._test_zip_members(zf, progress)
+    
+    def _test_zip_members(self, zf, progress):
+        members = zf.infolist()
+        progress.total = sum(info.file_size for info in members)
+        bad = []
+        for info in members:
+            if info.is_dir():
+                continue
+            try:
+                # ZipExtFile checks the CRC when it reaches the end
+                with zf.open(info) as src:
+                    self._copy(src, None, progress)
+            except (zipfile.BadZipFile, zlib.error, EOFError, lzma.LZMAError):
+                bad.append(info.filename)
+        return bad
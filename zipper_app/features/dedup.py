@@ -0,0 +1,287 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from .scanner import member_path
+
+# Content-defined chunking: a boundary is placed where a hash of the trailing
+# WINDOW bytes hits a mask, so boundaries depend on local content only and an
+# insertion near the start of a file changes just the chunks around it.
+# Near-identical files therefore share almost all of their chunks. A
+# byte-per-iteration rolling hash runs at ~5 MB/s in pure Python, so
+# candidate positions are first narrowed down by a regex over "anchor" bytes
+# (1 in 16 byte values) and the window hash is a C-level crc32 over the bytes
+# ending there.
+# Every unique chunk is compressed once and appended to a pack file; the
+# SQLite index maps chunk hashes to pack locations and files to chunk lists.
+
+INDEX_NAME = 'index.zstore'
+PACK_DIR = 'packs'
+STORE_DIR = '.zipper-store'  # default store location inside a monitored folder
+
+DEFAULT_MIN_CHUNK = 2 * 1024
+DEFAULT_AVG_CHUNK = 8 * 1024
+DEFAULT_MAX_CHUNK = 64 * 1024
+DEFAULT_PACK_SIZE = 64 * 1024 * 1024
+
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+
+HASH_SIZE = 32  # sha256
+WINDOW = 32
+_ANCHORS = re.compile(
+    b'[' + b''.join(re.escape(bytes([b])) for b in range(256) if b & 0x0F == 0x05) + b']'
+)
+
+def _boundary_mask(avg_size):
+    # Roughly one position in 16 is an anchor
+    bits = max(1, avg_size.bit_length() - 1 - 4)
+    return (1 << bits) - 1
+
+def find_cut(buf, min_size, max_size, mask):
+    # Length of the first chunk in buf (all of buf if no boundary is found)
+    n = len(buf)
+    if n <= min_size:
+        return n
+    limit = min(n, max_size)
+    crc32 = zlib.crc32
+    for match in _ANCHORS.finditer(buf, min_size, limit):
+        end = match.end()
+        if not crc32(buf[end - WINDOW:end]) & mask:
+            return end
+    return limit
+
+def iter_chunks(fileobj, min_size=DEFAULT_MIN_CHUNK, avg_size=DEFAULT_AVG_CHUNK,
+                max_size=DEFAULT_MAX_CHUNK, read_size=1024 * 1024):
+    mask = _boundary_mask(avg_size)
+    buf = bytearray()
+    eof = False
+    while True:
+        while not eof and len(buf) < max_size:
+            data = fileobj.read(read_size)
+            if not data:
+                eof = True
+            buf += data
+        if not buf:
+            return
+        cut = find_cut(buf, min_size, max_size, mask)
+        yield bytes(buf[:cut])
+        del buf[:cut]
+
+class ChunkStore:
+    def __init__(self, root, min_size=DEFAULT_MIN_CHUNK, avg_size=DEFAULT_AVG_CHUNK,
+                 max_size=DEFAULT_MAX_CHUNK, pack_size=DEFAULT_PACK_SIZE, level=6):
+        if not WINDOW <= min_size <= avg_size <= max_size:
+            raise ValueError(f"Chunk sizes must satisfy {WINDOW} <= min <= avg <= max")
+        self.root = Path(root)
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        self.pack_size = pack_size
+        self.level = level
+        self._lock = threading.Lock()
+
+        (self.root / PACK_DIR).mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.root / INDEX_NAME), check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                hash BLOB PRIMARY KEY,
+                pack INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                codec INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                source TEXT,
+                size INTEGER NOT NULL,
+                mtime REAL,
+                added REAL NOT NULL,
+                chunks BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_name ON files (name);
+        """)
+        row = self.db.execute("SELECT MAX(pack) FROM chunks").fetchone()
+        self._pack = row[0] or 1
+        self._pack_fp = None
+        self._readers = {}
+
+    def _pack_path(self, pack):
+        return self.root / PACK_DIR / f"{pack:06d}.pack"
+
+    def _writer(self):
+        if self._pack_fp is None:
+            self._pack_fp = open(self._pack_path(self._pack), 'ab')
+        elif self._pack_fp.tell() >= self.pack_size:
+            self._pack_fp.close()
+            self._pack += 1
+            self._pack_fp = open(self._pack_path(self._pack), 'ab')
+        return self._pack_fp
+
+    def add_file(self, path, name=None, progress=None):
+        path = Path(path)
+        name = name or path.name
+        st = path.stat()
+        hashes = []
+        stats = {"size": 0, "chunks": 0, "new_chunks": 0, "stored_bytes": 0}
+        with self._lock:
+            try:
+                with open(path, 'rb') as f:
+                    for chunk in iter_chunks(f, self.min_size, self.avg_size, self.max_size):
+                        digest = hashlib.sha256(chunk).digest()
+                        hashes.append(digest)
+                        stats["size"] += len(chunk)
+                        stats["chunks"] += 1
+                        if not self._has_chunk(digest):
+                            stats["new_chunks"] += 1
+                            stats["stored_bytes"] += self._store_chunk(digest, chunk)
+                        if progress:
+                            progress(len(chunk))
+
+                # Pack data must be durable before the index points at it
+                if self._pack_fp:
+                    self._pack_fp.flush()
+                    os.fsync(self._pack_fp.fileno())
+                cursor = self.db.execute(
+                    "INSERT INTO files (name, source, size, mtime, added, chunks) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, str(path), stats["size"], st.st_mtime, time.time(), b''.join(hashes))
+                )
+                self.db.commit()
+            except BaseException:
+                # Chunk rows of a failed or cancelled add would otherwise
+                # be committed with the next one; their pack data is
+                # left unreferenced
+                self.db.rollback()
+                raise
+        stats["file_id"] = cursor.lastrowid
+        return stats
+
+    def _has_chunk(self, digest):
+        row = self.db.execute("SELECT 1 FROM chunks WHERE hash = ?", (digest,)).fetchone()
+        return row is not None
+
+    def _store_chunk(self, digest, chunk):
+        data = zlib.compress(chunk, self.level)
+        codec = CODEC_ZLIB
+        if len(data) >= len(chunk):
+            data = chunk
+            codec = CODEC_RAW
+        fp = self._writer()
+        offset = fp.tell()
+        fp.write(data)
+        self.db.execute(
+            "INSERT INTO chunks (hash, pack, offset, length, size, codec) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, self._pack, offset, len(data), len(chunk), codec)
+        )
+        return len(data)
+
+    def _read_chunk(self, digest):
+        row = self.db.execute(
+            "SELECT pack, offset, length, codec FROM chunks WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"Chunk {digest.hex()} missing from store")
+        pack, offset, length, codec = row
+        if pack == self._pack and self._pack_fp:
+            self._pack_fp.flush()
+        fp = self._readers.get(pack)
+        if fp is None:
+            fp = self._readers[pack] = open(self._pack_path(pack), 'rb')
+        fp.seek(offset)
+        data = fp.read(length)
+        return zlib.decompress(data) if codec == CODEC_ZLIB else data
+
+    def files(self):
+        rows = self.db.execute("SELECT id, name, source, size, mtime, added FROM files ORDER BY id")
+        return [
+            {"id": r[0], "name": r[1], "source": r[2], "size": r[3], "mtime": r[4], "added": r[5]}
+            for r in rows
+        ]
+
+    def latest_files(self):
+        # Most recent version of every stored name
+        latest = {}
+        for entry in self.files():
+            latest[entry["name"]] = entry
+        return list(latest.values())
+
+    def restore_file(self, file_id, dest_path, progress=None):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT mtime, chunks FROM files WHERE id = ?", (file_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"No stored file with id {file_id}")
+            mtime, chunks = row
+            dest_path = Path(dest_path)
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(dest_path, 'wb') as f:
+                for i in range(0, len(chunks), HASH_SIZE):
+                    data = self._read_chunk(chunks[i:i + HASH_SIZE])
+                    f.write(data)
+                    if progress:
+                        progress(len(data))
+        if mtime is not None:
+            os.utime(dest_path, (mtime, mtime))
+
+    def extract_all(self, output_dir, progress=None):
+        output_dir = Path(output_dir)
+        for entry in self.latest_files():
+            self.restore_file(entry["id"], member_path(output_dir, entry["name"]), progress)
+
+    def verify(self, progress=None):
+        # Re-hash every stored chunk; returns the names of stored files that
+        # reference a missing or damaged chunk
+        with self._lock:
+            if self._pack_fp:
+                self._pack_fp.flush()
+            bad_chunks = set()
+            for (digest,) in self.db.execute("SELECT hash FROM chunks").fetchall():
+                try:
+                    data = self._read_chunk(digest)
+                except (OSError, zlib.error):
+                    bad_chunks.add(digest)
+                    continue
+                if hashlib.sha256(data).digest() != digest:
+                    bad_chunks.add(digest)
+                if progress:
+                    progress(len(data))
+
+            bad_files = []
+            known = {row[0] for row in self.db.execute("SELECT hash FROM chunks")}
+            for name, chunks in self.db.execute("SELECT name, chunks FROM files ORDER BY id"):
+                for i in range(0, len(chunks), HASH_SIZE):
+                    digest = chunks[i:i + HASH_SIZE]
+                    if digest in bad_chunks or digest not in known:
+                        if name not in bad_files:
+                            bad_files.append(name)
+                        break
+        return bad_files
+
+    def stats(self):
+        stored, logical = self.db.execute(
+            "SELECT COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) FROM chunks"
+        ).fetchone()
+        files, referenced = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files"
+        ).fetchone()
+        return {"files": files, "file_bytes": referenced, "unique_bytes": logical,
+                "stored_bytes": stored}
+
+    def close(self):
+        with self._lock:
+            if self._pack_fp:
+                self._pack_fp.close()
+                self._pack_fp = None
+            for fp in self._readers.values():
+                fp.close()
+            self._readers.clear()
+            self.db.close()
@@ -0,0 +1,245 @@
+import io
+import os
+import struct
+from . import backends
+from .keys import (KDF_ITERATIONS, MAX_KDF_ITERATIONS, SALT_SIZE, hkdf,
+                   session_keys)
+
+# Encrypted archives are the finished archive cut into fixed-size segments,
+# each sealed with AES-256-GCM. The nonce of every segment is a random
+# per-archive prefix, the segment counter and a final-segment flag (the
+# STREAM construction), so segments cannot be reordered, dropped or
+# truncated without failing authentication. The header carries the KDF salt
+# and parameters and is bound to every segment as associated data.
+#
+#   magic | version | kdf | iterations | kdf salt | archive salt | nonce prefix
+#   | segment size
+#
+# The PBKDF2 key from the password and KDF salt is only a master key; each
+# archive's AES key comes from it through HKDF with the archive salt, so the
+# expensive part can be cached across a session (see keys.py).
+#
+# Segments are independent, so reads can seek to any segment and decrypt
+# just that one: zipfile and py7zr open encrypted archives directly.
+
+aead = backends.lazy("cryptography.hazmat.primitives.ciphers.aead")
+exceptions = backends.lazy("cryptography.exceptions")
+
+MAGIC = b'ZIPENC'
+VERSION = 2
+KDF_PBKDF2_SHA256 = 1
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+DEFAULT_SEGMENT_SIZE = 1024 * 1024
+ENCRYPTED_SUFFIX = '.enc'
+ARCHIVE_KEY_INFO = b'zipper archive key'
+
+_HEADER = struct.Struct(f'<{len(MAGIC)}sBBI{SALT_SIZE}s{SALT_SIZE}s{NONCE_PREFIX_SIZE}sI')
+HEADER_SIZE = _HEADER.size
+
+class DecryptionError(ValueError):
+    pass
+
+class DamagedArchiveError(DecryptionError):
+    # The password was right, but a later segment fails authentication
+    pass
+
+def archive_key(master_key, archive_salt):
+    return hkdf(master_key, archive_salt, ARCHIVE_KEY_INFO)
+
+def _nonce(prefix, index, last):
+    return prefix + struct.pack('>IB', index, 1 if last else 0)
+
+def is_encrypted(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def plain_name(path):
+    # archive.zip.enc -> archive.zip; the inner name tells the format
+    name = os.fspath(path)
+    return name[:-len(ENCRYPTED_SUFFIX)] if name.lower().endswith(ENCRYPTED_SUFFIX) else name
+
+class EncryptingWriter(io.BufferedIOBase):
+    def __init__(self, fileobj, password, segment_size=DEFAULT_SEGMENT_SIZE,
+                 iterations=KDF_ITERATIONS, keys=None):
+        super().__init__()
+        if segment_size <= 0:
+            raise ValueError(f"Segment size must be positive: {segment_size}")
+        keys = session_keys if keys is None else keys
+        kdf_salt = keys.session_salt(password, iterations)
+        archive_salt = os.urandom(SALT_SIZE)
+        self._prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self._header = _HEADER.pack(MAGIC, VERSION, KDF_PBKDF2_SHA256, iterations,
+                                              kdf_salt, archive_salt, self._prefix,
+                                              segment_size)
+        master_key = keys.derive(password, kdf_salt, iterations)
+        self._cipher = aead.AESGCM(archive_key(master_key, archive_salt))
+        self._fp = fileobj
+        self._segment_size = segment_size
+        # Reused for every partial segment; a fresh allocation per segment
+        # costs more than the encryption itself
+        self._buffer = bytearray(segment_size)
+        self._fill = 0
+        self._index = 0
+        self._fp.write(self._header)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        data = memoryview(data).cast('B')
+        size = self._segment_size
+        # Always keep at least one byte back: only close() knows which
+        # segment is the final one
+        pos = 0
+        if self._fill:
+            pos = size - self._fill
+            if len(data) <= pos:
+                self._buffer[self._fill:self._fill + len(data)] = data
+                self._fill += len(data)
+                return len(data)
+            self._buffer[self._fill:] = data[:pos]
+            self._seal(self._buffer, False)
+            self._fill = 0
+        # Full segments are sealed straight from the caller's buffer
+        while len(data) - pos > size:
+            self._seal(data[pos:pos + size], False)
+            pos += size
+        rest = len(data) - pos
+        self._buffer[:rest] = data[pos:]
+        self._fill = rest
+        return len(data)
+
+    def _seal(self, data, last):
+        nonce = _nonce(self._prefix, self._index, last)
+        self._fp.write(self._cipher.encrypt(nonce, data, self._header))
+        self._index += 1
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._seal(memoryview(self._buffer)[:self._fill], True)
+            self._fill = 0
+        finally:
+            super().close()
+
+class DecryptingReader(io.RawIOBase):
+    # Seekable plaintext view of an encrypted file, one segment in memory
+    def __init__(self, fileobj, password, close_file=False, keys=None):
+        super().__init__()
+        self._fp = fileobj
+        self._close_file = close_file
+        keys = session_keys if keys is None else keys
+        self._fp.seek(0)
+        start = self._fp.read(len(MAGIC) + 1)
+        if len(start) < len(MAGIC) + 1 or not start.startswith(MAGIC):
+            raise DecryptionError("Not an encrypted Zipper archive")
+        version = start[-1]
+        if version != VERSION:
+            raise DecryptionError(f"Unsupported encryption format version {version}")
+        header = start + self._fp.read(HEADER_SIZE - len(start))
+        if len(header) < HEADER_SIZE:
+            raise DamagedArchiveError("Encrypted archive is truncated")
+        _, _, kdf, iterations, kdf_salt, archive_salt, self._prefix, self._segment_size = \
+            _HEADER.unpack(header)
+        if kdf != KDF_PBKDF2_SHA256 or self._segment_size <= 0 or \
+                iterations > MAX_KDF_ITERATIONS:
+            raise DecryptionError("Unsupported key derivation in encrypted archive")
+        self._header = header
+        key = archive_key(keys.derive(password, kdf_salt, iterations), archive_salt)
+        self._cipher = aead.AESGCM(key)
+
+        body = self._fp.seek(0, os.SEEK_END) - HEADER_SIZE
+        stride = self._segment_size + TAG_SIZE
+        self._count = max(1, -(-body // stride))
+        last_size = body - (self._count - 1) * stride - TAG_SIZE
+        if last_size < 0:
+            raise DamagedArchiveError("Encrypted archive is truncated")
+        self.size = (self._count - 1) * self._segment_size + last_size
+
+        self._pos = 0
+        self._cached = None
+        self._data = b''
+        # Fails right away on a wrong password rather than mid-extraction
+        self._load(0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def _load(self, index):
+        if index == self._cached:
+            return
+        stride = self._segment_size + TAG_SIZE
+        self._fp.seek(HEADER_SIZE + index * stride)
+        sealed = self._fp.read(stride)
+        last = index == self._count - 1
+        try:
+            self._data = self._cipher.decrypt(_nonce(self._prefix, index, last), sealed,
+                                              self._header)
+        except exceptions.InvalidTag:
+            if last and self._opens_as_middle(index, sealed):
+                raise DamagedArchiveError("Encrypted archive is truncated") from None
+            if index == 0:
+                raise DecryptionError("Wrong password or damaged archive") from None
+            raise DamagedArchiveError(f"Encrypted archive is damaged (segment {index})") from None
+        self._cached = index
+
+    def _opens_as_middle(self, index, sealed):
+        # A file cut at a segment boundary ends in a segment that was not
+        # sealed as the final one
+        try:
+            self._cipher.decrypt(_nonce(self._prefix, index, False), sealed, self._header)
+        except exceptions.InvalidTag:
+            return False
+        return True
+
+    def readinto(self, b):
+        if self._pos >= self.size:
+            return 0
+        index, offset = divmod(self._pos, self._segment_size)
+        self._load(index)
+        n = min(len(b), len(self._data) - offset)
+        b[:n] = memoryview(self._data)[offset:offset + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed and self._close_file:
+            self._fp.close()
+        super().close()
+
+def open_decrypted(path, password, buffer_size=DEFAULT_SEGMENT_SIZE):
+    # Buffered, seekable plaintext stream over an encrypted file, given by
+    # its path or as a seekable stream, which it then owns
+    fp = open(path, 'rb') if isinstance(path, (str, os.PathLike)) else path
+    try:
+        return io.BufferedReader(DecryptingReader(fp, password, close_file=True), buffer_size)
+    except BaseException:
+        fp.close()
+        raise
@@ -0,0 +1,151 @@
+import io
+import mmap
+import os
+
+# Input side of the compressor, built to copy data as rarely as possible:
+#
+#   InputFile   reads an input file. Large ones are memory-mapped and read()
+#               hands out memoryview slices of the mapping, which the codecs
+#               (zlib, lzma) and zipfile take as they are: the data goes from
+#               the page cache straight into the compressor.
+#   copy_range  copies between two files inside the kernel
+#               (copy_file_range, else sendfile), for data that is stored
+#               as it is: stored ZIP members, members moved between
+#               archives, volumes of a split archive.
+#
+# A mapped file that another program truncates while it is read makes the
+# process crash (SIGBUS) instead of a read coming up short, so callers that
+# read files which may still be changing, such as the folder monitor, turn
+# mapping off.
+
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+class InputFile(io.RawIOBase):
+    def __init__(self, path, mapped=True):
+        super().__init__()
+        self._fp = open(path, 'rb')
+        self.size = os.fstat(self._fp.fileno()).st_size
+        self._map = None
+        self._view = None
+        self._pos = 0
+        if mapped and self.size >= MMAP_MIN_SIZE:
+            try:
+                self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass  # e.g. a special file system; read it the usual way
+            else:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    self._map.madvise(mmap.MADV_SEQUENTIAL)
+                self._view = memoryview(self._map)
+
+    @property
+    def mapped(self):
+        return self._view is not None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def fileno(self):
+        return self._fp.fileno()
+
+    def tell(self):
+        return self._pos if self.mapped else self._fp.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if not self.mapped:
+            return self._fp.seek(offset, whence)
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def read(self, size=-1):
+        if not self.mapped:
+            return self._fp.read(size)
+        end = self.size if size is None or size < 0 else min(self.size, self._pos + size)
+        data = self._view[self._pos:end]
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._view is not None:
+                self._view.release()
+            if self._map is not None:
+                self._map.close()
+        except BufferError:
+            # Slices are still in use, e.g. by xz blocks being compressed;
+            # the mapping goes away with the last of them
+            pass
+        self._view = self._map = None
+        self._fp.close()
+        super().close()
+
+def copy_range(src_fd, dst_fd, length, src_offset, dst_offset, progress=None):
+    # Copies length bytes at src_offset to dst_offset. progress(nbytes), if
+    # given, is called after every piece and may raise to stop.
+    copied = 0
+    kernel = hasattr(os, 'copy_file_range')
+    sendfile = hasattr(os, 'sendfile')
+    while copied < length:
+        count = min(COPY_CHUNK_SIZE, length - copied)
+        n = 0
+        if kernel:
+            try:
+                n = os.copy_file_range(src_fd, dst_fd, count, src_offset + copied,
+                                       dst_offset + copied)
+            except OSError:
+                kernel = False  # e.g. across file systems on older kernels
+        if not n and sendfile:
+            try:
+                os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+                n = os.sendfile(dst_fd, src_fd, src_offset + copied, count)
+            except OSError:
+                sendfile = False
+        if not n:
+            data = os.pread(src_fd, count, src_offset + copied)
+            if not data:
+                raise EOFError(f"File ended {length - copied} bytes early")
+            n = os.pwrite(dst_fd, data, dst_offset + copied)
+        copied += n
+        if progress:
+            progress(n)
+
+def copy_into(src, dst, length, chunk_size, progress=None):
+    # length bytes from the current position of src to that of dst, both
+    # file objects, moving both positions on. Inside the kernel when both
+    # are plain files.
+    try:
+        src_fd = src.fileno()
+        dst_fd = dst.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        src_fd = dst_fd = None
+    if src_fd is None:
+        while length:
+            data = src.read(min(chunk_size, length))
+            if not data:
+                raise EOFError(f"File ended {length} bytes early")
+            dst.write(data)
+            length -= len(data)
+            if progress:
+                progress(len(data))
+        return
+    dst.flush()
+    src_offset = src.tell()
+    dst_offset = dst.tell()
+    copy_range(src_fd, dst_fd, length, src_offset, dst_offset, progress)
+    src.seek(src_offset + length)
+    dst.seek(dst_offset + length)
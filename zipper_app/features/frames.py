@@ -0,0 +1,249 @@
+import io
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from . import backends
+
+# Zstandard (.zst) and LZ4 (.lz4) streams, for when speed matters more than
+# ratio. Both formats allow frames to follow one another in a file, which is
+# how the writers here use several cores:
+#
+#   .zst   libzstd's own worker threads compress one frame, at a level
+#          from ZSTD_LEVELS (negative ones trade ratio for speed, like
+#          `zstd --fast`)
+#   .lz4   input is cut into blocks of block_size, each compressed into a
+#          frame of its own on a thread pool, as XZBlockWriter does with xz
+#          blocks (LZ4 releases the GIL)
+#
+# Both write a content checksum, so damage is caught when reading.
+
+# Loaded on first use
+zstandard = backends.lazy("zstandard")
+lz4frame = backends.lazy("lz4.frame")
+
+FORMATS = ('.zst', '.lz4')
+# (lowest, highest, default)
+ZSTD_LEVELS = (-7, 22, 3)
+LZ4_LEVELS = (0, 16, 0)    # 3 and above are LZ4 HC
+LEVELS = {'.zst': ZSTD_LEVELS, '.lz4': LZ4_LEVELS}
+
+DEFAULT_FRAME_SIZE = 8 * 1024 * 1024   # input per LZ4 frame
+READ_SIZE = 1024 * 1024
+
+ZSTD_MAGIC = 0xFD2FB528
+SKIPPABLE_MAGIC = 0x184D2A50   # up to 0x184D2A5F
+
+class FrameError(ValueError):
+    # The compressed data is damaged
+    pass
+
+def check_level(fmt, level):
+    # The level to use, the format's default for None
+    lowest, highest, default = LEVELS[fmt]
+    if level is None:
+        return default
+    if not lowest <= level <= highest:
+        raise ValueError(f"Level must be between {lowest} and {highest}: {level}")
+    return level
+
+def open_writer(fmt, fileobj, level=None, workers=1, block_size=None):
+    # Writable stream compressing into fileobj, which it leaves open
+    level = check_level(fmt, level)
+    if fmt == '.lz4':
+        return LZ4FrameWriter(fileobj, level, block_size, workers)
+    compressor = zstandard.ZstdCompressor(level=level, write_checksum=True,
+                                          threads=workers if workers > 1 else 0)
+    return compressor.stream_writer(fileobj, closefd=False)
+
+def _compress_frame(data, level):
+    return lz4frame.compress(data, compression_level=level, content_checksum=True)
+
+class LZ4FrameWriter(io.BufferedIOBase):
+    def __init__(self, fileobj, level=0, block_size=None, workers=1):
+        super().__init__()
+        if block_size is not None and block_size <= 0:
+            raise ValueError(f"Block size must be positive: {block_size}")
+        self._fp = fileobj
+        self._level = level
+        self._block_size = block_size or DEFAULT_FRAME_SIZE
+        self._workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self._workers)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        data = memoryview(data).cast('B')
+        size = len(data)
+        self._pos += size
+        if self._buffer:
+            missing = self._block_size - len(self._buffer)
+            self._buffer += data[:missing]
+            data = data[missing:]
+            if len(self._buffer) < self._block_size:
+                return size
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while len(data) >= self._block_size:
+            block = data[:self._block_size]
+            self._submit(block if data.readonly else bytes(block))
+            data = data[self._block_size:]
+        self._buffer += data
+        return size
+
+    def _submit(self, data):
+        self._pending.append(self._pool.submit(_compress_frame, data, self._level))
+        while len(self._pending) > self._workers * 2:
+            self._fp.write(self._pending.popleft().result())
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def abort(self):
+        if self.closed:
+            return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pending.clear()
+        self._buffer.clear()
+        super().close()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            # An empty input still gets one (empty) frame
+            if self._buffer or not self._pos:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._fp.write(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            super().close()
+
+class _ZstdFrames:
+    # Follows the frame layout of the compressed bytes as they go by, only
+    # to tell whether the stream ends where a frame does: libzstd's reader
+    # stops quietly at a truncated frame. Block and checksum bytes are
+    # skipped by their sizes in the headers, never looked at.
+    def __init__(self):
+        self._need = 4          # header bytes the next step needs
+        self._step = self._magic
+        self._head = bytearray()
+        self._skip = 0
+        self._checksum = False
+
+    def feed(self, data):
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            if self._skip:
+                n = min(self._skip, len(view) - pos)
+                self._skip -= n
+                pos += n
+                continue
+            n = min(self._need - len(self._head), len(view) - pos)
+            self._head += view[pos:pos + n]
+            pos += n
+            if len(self._head) == self._need:
+                head = bytes(self._head)
+                self._head.clear()
+                self._step(head)
+
+    def _expect(self, need, step):
+        self._need = need
+        self._step = step
+
+    def _magic(self, head):
+        magic = struct.unpack('<I', head)[0]
+        if magic == ZSTD_MAGIC:
+            self._expect(1, self._descriptor)
+        elif magic & 0xFFFFFFF0 == SKIPPABLE_MAGIC:
+            self._expect(4, self._skippable)
+        else:
+            raise FrameError("Not a Zstandard stream")
+
+    def _skippable(self, head):
+        self._skip = struct.unpack('<I', head)[0]
+        self._expect(4, self._magic)
+
+    def _descriptor(self, head):
+        flags = head[0]
+        single_segment = flags >> 5 & 1
+        self._checksum = bool(flags >> 2 & 1)
+        size = (0 if single_segment else 1) + (0, 1, 2, 4)[flags & 3]
+        size += (single_segment, 2, 4, 8)[flags >> 6]
+        self._skip = size   # window, dictionary ID, content size
+        self._expect(3, self._block)
+
+    def _block(self, head):
+        header = head[0] | head[1] << 8 | head[2] << 16
+        kind = header >> 1 & 3
+        if kind == 3:
+            raise FrameError("Damaged Zstandard block header")
+        self._skip = 1 if kind == 1 else header >> 3   # an RLE block is one byte
+        if header & 1:   # the frame's last block
+            self._skip += 4 if self._checksum else 0
+            self._expect(4, self._magic)
+
+    def complete(self):
+        return self._step == self._magic and not self._head and not self._skip
+
+class _CheckedSource:
+    # The compressed input of a .zst reader, fed through _ZstdFrames
+    def __init__(self, fp):
+        self._fp = fp
+        self.frames = _ZstdFrames()
+
+    def read(self, size=-1):
+        data = self._fp.read(size)
+        self.frames.feed(data)
+        return data
+
+class FrameReader(io.RawIOBase):
+    # Readable stream over a .zst or .lz4 file, frame after frame. Damage
+    # raises FrameError; a stream cut short raises EOFError, as lzma does.
+    def __init__(self, fmt, fileobj):
+        super().__init__()
+        self._fmt = fmt
+        if fmt == '.lz4':
+            self._source = None
+            self._reader = lz4frame.LZ4FrameFile(fileobj, 'rb')
+            self._errors = (RuntimeError,)
+        else:
+            self._source = _CheckedSource(fileobj)
+            self._reader = zstandard.ZstdDecompressor().stream_reader(
+                self._source, read_size=READ_SIZE, read_across_frames=True, closefd=False
+            )
+            self._errors = (zstandard.ZstdError,)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        try:
+            n = self._reader.readinto(b)
+        except self._errors as e:
+            raise FrameError(f"Damaged {self._fmt} data: {e}") from e
+        if not n and self._source is not None and not self._source.frames.complete():
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._reader.close()
+        super().close()
+
+def open_reader(fmt, fileobj, buffer_size=READ_SIZE):
+    return io.BufferedReader(FrameReader(fmt, fileobj), buffer_size)
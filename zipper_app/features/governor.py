@@ -0,0 +1,141 @@
+import ctypes
+import os
+import platform
+import sys
+import threading
+import time
+
+# Limits on what one compression job may take of a shared machine:
+#
+#   cores      at most this many workers, whatever the job asks for
+#   nice       CPU scheduling priority, 1 (slightly) to 19 (only idle CPU)
+#   io_class   disk scheduling class, "low" (lowest best-effort level) or
+#              "idle" (only when no one else uses the disk); Linux only
+#   bandwidth  bytes per second the job may read, through a token bucket
+#   memory     ceiling in bytes for the job's buffers and blocks in flight;
+#              the compressor shrinks chunk, block and queue sizes and the
+#              number of workers to fit
+#
+# Priorities can only be lowered without privileges, never raised again, so
+# a job with any is run on a thread of its own, which its worker processes
+# inherit them from. They never stick to the GUI or to a shared worker.
+
+IO_CLASSES = {"low": (2, 7), "idle": (3, 0)}   # (ioprio class, level)
+MIN_MEMORY = 16 * 1024 * 1024
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+# ioprio_set has no wrapper in libc or the os module
+_IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv7l": 314,
+               "ppc64le": 273, "s390x": 282}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+
+def parse_size(text):
+    # "512k", "10M", "2G" or plain bytes
+    text = str(text).strip().lower().removesuffix('b').removesuffix('i')
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    try:
+        value = float(text[:len(text) - len(unit)])
+    except ValueError:
+        raise ValueError(f"Invalid size: {text!r}") from None
+    if value <= 0:
+        raise ValueError(f"Size must be positive: {text!r}")
+    return int(value * SIZE_UNITS[unit])
+
+def set_thread_priority(nice=None, io_class=None):
+    # Lowers the calling thread's CPU and disk priority, as far as the
+    # platform allows; anything it does not support is left as it is
+    tid = threading.get_native_id()
+    if nice and hasattr(os, 'setpriority'):
+        # Per thread on Linux; elsewhere this is the whole process
+        who = tid if sys.platform == 'linux' else 0
+        try:
+            os.setpriority(os.PRIO_PROCESS, who, max(nice, os.getpriority(os.PRIO_PROCESS, who)))
+        except OSError:
+            pass
+    number = _IOPRIO_SET.get(platform.machine())
+    if io_class and sys.platform == 'linux' and number is not None:
+        ioprio_class, level = IO_CLASSES[io_class]
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.syscall(number, _IOPRIO_WHO_PROCESS, tid,
+                     (ioprio_class << _IOPRIO_CLASS_SHIFT) | level)
+
+class TokenBucket:
+    # Lets `rate` bytes per second through on average, with bursts of up to
+    # `burst`. A caller that takes more than there is runs into debt and
+    # sleeps it off, so large reads need no splitting. Thread-safe.
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or rate
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            self.sleep(wait)
+
+class ResourceLimits:
+    def __init__(self, cores=None, nice=None, io_class=None, bandwidth=None, memory=None):
+        if cores is not None and cores < 1:
+            raise ValueError(f"Cores must be at least 1: {cores}")
+        if nice is not None and not 0 <= nice <= 19:
+            raise ValueError(f"Nice value must be between 0 and 19: {nice}")
+        if io_class is not None and io_class not in IO_CLASSES:
+            raise ValueError(f"Unknown I/O class: {io_class!r}")
+        if bandwidth is not None and bandwidth <= 0:
+            raise ValueError(f"Bandwidth must be positive: {bandwidth}")
+        if memory is not None and memory < MIN_MEMORY:
+            raise ValueError(f"Memory ceiling must be at least {MIN_MEMORY // 2 ** 20} MB")
+        self.cores = cores
+        self.nice = nice or None
+        self.io_class = io_class
+        self.bandwidth = bandwidth
+        self.memory = memory
+        # Shared by all the job's threads
+        self.bucket = TokenBucket(bandwidth) if bandwidth else None
+
+    @classmethod
+    def from_settings(cls, settings):
+        # From a settings dict (as saved with a monitored folder or a
+        # scheduled job); None when it sets no limit. Zero means no limit.
+        settings = {key: value for key, value in (settings or {}).items() if value}
+        if not settings:
+            return None
+        return cls(**settings)
+
+    def to_settings(self):
+        return {"cores": self.cores, "nice": self.nice, "io_class": self.io_class,
+                "bandwidth": self.bandwidth, "memory": self.memory}
+
+    def workers(self, workers):
+        return min(workers, self.cores) if self.cores else workers
+
+    def run(self, func, *args, **kwargs):
+        # func(*args, **kwargs) with the job's priorities, on a thread of its
+        # own if there are any
+        if not (self.nice or self.io_class):
+            return func(*args, **kwargs)
+        outcome = {}
+
+        def target():
+            set_thread_priority(self.nice, self.io_class)
+            try:
+                outcome["result"] = func(*args, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target, name='zipper-limited', daemon=True)
+        thread.start()
+        thread.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
@@ -0,0 +1,157 @@
+import itertools
+import threading
+import time
+from collections import deque
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from .compression import Compressor, JobCancelled, JobInterrupted
+from .scanner import DirectoryScan
+
+class Job:
+    COMPRESS = "compress"
+    EXTRACT = "extract"
+
+    def __init__(self, job_id, kind, source, destination, options=None):
+        self.id = job_id
+        self.kind = kind
+        self.source = source            # list of files, a DirectoryScan, or an archive path
+        self.destination = destination  # archive path, or an output directory
+        self.options = options or {}    # extra keyword arguments for Compressor
+        self.cancel_event = threading.Event()
+        self.interrupted = False        # stopped by shutdown, may be resumed later
+
+class JobThread(QThread):
+    # Signals are emitted from the worker thread and delivered queued to the
+    # GUI thread
+    progress = pyqtSignal(int, object, object, float)  # id, done, total, bytes/s
+    succeeded = pyqtSignal(int, object)  # id, result dict from Compressor
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+    # Minimum seconds between two progress signals, to spare the event loop
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, compressor, job, parent=None):
+        super().__init__(parent)
+        self.compressor = compressor
+        self.job = job
+
+    def run(self):
+        job = self.job
+        start = time.monotonic()
+        last_report = 0.0
+
+        def report(done, total):
+            nonlocal last_report
+            if job.cancel_event.is_set():
+                raise JobInterrupted() if job.interrupted else JobCancelled()
+            now = time.monotonic()
+            if now - last_report >= self.PROGRESS_INTERVAL or done >= total:
+                last_report = now
+                elapsed = max(now - start, 1e-6)
+                self.progress.emit(job.id, done, total, done / elapsed)
+
+        try:
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            if job.kind == Job.COMPRESS:
+                result = self.compressor.compress_files(
+                    job.source, job.destination, progress=report, **job.options
+                )
+            else:
+                result = self.compressor.extract_files(
+                    job.source, job.destination, progress=report, **job.options
+                )
+        except JobCancelled:
+            self.cancelled.emit(job.id)
+        except Exception as e:
+            self.failed.emit(job.id, str(e))
+        else:
+            self.succeeded.emit(job.id, result)
+
+class JobManager(QObject):
+    job_started = pyqtSignal(int)
+    job_progress = pyqtSignal(int, object, object, float)  # id, done, total, bytes/s
+    job_finished = pyqtSignal(int, object)  # id, result dict from Compressor
+    job_failed = pyqtSignal(int, str)
+    job_cancelled = pyqtSignal(int)
+
+    def __init__(self, compressor=None, max_concurrent=1, parent=None):
+        super().__init__(parent)
+        self.compressor = compressor or Compressor()
+        self.max_concurrent = max(1, max_concurrent)
+        self.jobs = {}
+        self.queue = deque()
+        self.running = {}
+        self._ids = itertools.count(1)
+
+    def submit_compress(self, files, output_path, profile, **options):
+        options["profile"] = profile
+        # A scan runs inside the job, off the GUI thread
+        if not isinstance(files, DirectoryScan):
+            files = list(files)
+        return self._submit(Job.COMPRESS, files, output_path, options)
+
+    def submit_extract(self, archive_path, output_dir, **options):
+        return self._submit(Job.EXTRACT, archive_path, output_dir, options)
+
+    def _submit(self, kind, source, destination, options):
+        job = Job(next(self._ids), kind, source, destination, options)
+        self.jobs[job.id] = job
+        self.queue.append(job)
+        self._start_next()
+        return job.id
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        job.cancel_event.set()
+        if job in self.queue:
+            # Never started, so there is nothing to clean up
+            self.queue.remove(job)
+            del self.jobs[job_id]
+            self.job_cancelled.emit(job_id)
+
+    def interrupt(self, job_id):
+        # Stops a job so that it can carry on later; a resumable job keeps
+        # its journal
+        job = self.jobs.get(job_id)
+        if job:
+            job.interrupted = True
+            self.cancel(job_id)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def pending_count(self):
+        return len(self.queue) + len(self.running)
+
+    def shutdown(self):
+        # Cancel everything and wait for running workers to clean up.
+        # Running resumable jobs keep their journal for the next start.
+        for job_id in self.running:
+            self.jobs[job_id].interrupted = True
+        self.cancel_all()
+        for thread in list(self.running.values()):
+            thread.wait()
+
+    def _start_next(self):
+        while self.queue and len(self.running) < self.max_concurrent:
+            job = self.queue.popleft()
+            thread = JobThread(self.compressor, job, self)
+            thread.progress.connect(self.job_progress)
+            thread.succeeded.connect(self.job_finished)
+            thread.failed.connect(self.job_failed)
+            thread.cancelled.connect(self.job_cancelled)
+            thread.finished.connect(lambda job_id=job.id: self._on_thread_finished(job_id))
+            self.running[job.id] = thread
+            self.job_started.emit(job.id)
+            thread.start()
+
+    def _on_thread_finished(self, job_id):
+        thread = self.running.pop(job_id, None)
+        self.jobs.pop(job_id, None)
+        if thread:
+            thread.deleteLater()
+        self._start_next()
@@ -0,0 +1,264 @@
+import json
+import os
+import time
+from pathlib import Path
+from .volumes import VolumeWriter, remove_volumes, volumes_size
+
+# Crash-safe record of a running compression job, so that one interrupted by
+# a crash, a power cut or the application closing carries on from its last
+# checkpoint instead of starting over. The archive is built in a hidden
+# partial file beside the output and only renamed over it once complete.
+#
+# The journal, <archive>.journal.json, is JSON lines:
+#
+#   first line   the job: profile, options and each input's size and mtime,
+#                or for a streamed directory scan, the scan's settings. A
+#                journal whose job differs from the one asked for (other
+#                files, or files changed since) is discarded.
+#   then         checkpoints. Each adds the members committed since the
+#                previous one and records how long the partial archive was
+#                then, plus what its writer needs to carry on (ZIP entries,
+#                xz blocks).
+#
+# Checkpoints are taken at member boundaries every CHECKPOINT_BYTES of input
+# or CHECKPOINT_INTERVAL seconds, after the partial archive was fsync'ed, so
+# they never point at data that did not reach the disk. Resuming truncates
+# the partial archive to the last checkpoint. A torn last line, where the
+# crash came mid-write, is ignored.
+#
+# A split job (a volume_size option) builds its partial archive as volumes
+# too, .<archive>.partial.001 and on, so no partial file outgrows a volume.
+
+JOURNAL_SUFFIX = '.journal.json'
+JOURNAL_VERSION = 1
+CHECKPOINT_BYTES = 64 * 1024 * 1024
+CHECKPOINT_INTERVAL = 30.0
+
+def journal_path(archive_path):
+    return Path(str(archive_path) + JOURNAL_SUFFIX)
+
+def partial_path(archive_path):
+    archive_path = Path(archive_path)
+    return archive_path.with_name(f".{archive_path.name}.partial")
+
+def _describe(files):
+    described = []
+    for file in files:
+        st = os.stat(file)
+        described.append([os.path.abspath(file), st.st_size, st.st_mtime_ns])
+    return described
+
+def _fsync(fp):
+    fp.flush()
+    os.fsync(fp.fileno())
+
+def _job(files, profile, options):
+    job = {"version": JOURNAL_VERSION, "profile": profile, "options": options}
+    if isinstance(files, (list, tuple)):
+        job["files"] = _describe(files)
+    elif hasattr(files, "describe"):
+        # A scan is recognised by its settings; the files it found that are
+        # in the archive already are skipped when it resumes
+        job["source"] = files.describe()
+    else:
+        raise ValueError("Only a list of files or a directory scan can be resumed")
+    return job
+
+def _same_job(a, b):
+    # Resource limits do not change what is built, so a job resumes under
+    # other limits too
+    def strip(job):
+        options = {k: v for k, v in job["options"].items() if k != "limits"}
+        return dict(job, options=options)
+    return strip(a) == strip(b)
+
+def load_journal(archive_path):
+    # (job, [checkpoint, ...]), or None without a usable journal
+    try:
+        with open(journal_path(archive_path), 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break  # torn by the crash
+    if not records or records[0].get("version") != JOURNAL_VERSION:
+        return None
+    return records[0], records[1:]
+
+def read_job(archive_path):
+    # What an interrupted job was doing, for offering to resume it
+    loaded = load_journal(archive_path)
+    if loaded is None:
+        return None
+    job, checkpoints = loaded
+    journal = JobJournal(archive_path, job, checkpoints)
+    return {
+        "files": [f[0] for f in job["files"]] if "files" in job else None,
+        "source": job.get("source"),
+        "profile": job["profile"],
+        "options": job["options"],
+        "committed": journal.count,
+        "built": journal.built
+    }
+
+def discard_journal(archive_path):
+    journal_path(archive_path).unlink(missing_ok=True)
+    partial_path(archive_path).unlink(missing_ok=True)
+    remove_volumes(partial_path(archive_path))
+
+class JobJournal:
+    def __init__(self, archive_path, job, checkpoints=(), clock=time.monotonic):
+        self.archive_path = Path(archive_path)
+        self.path = journal_path(archive_path)
+        self.partial = partial_path(archive_path)
+        self.job = job
+        self.count = 0        # members committed
+        self.bytes = 0        # input bytes they hold
+        self.offset = 0       # durable length of the partial archive
+        self.sources = []     # the files they came from
+        self.members = []     # per-member codec decisions
+        self.entries = []     # what the writer needs per member
+        self.blocks = []      # xz block records
+        self.state = {}
+        self.built = False
+        for checkpoint in checkpoints:
+            self._apply(checkpoint)
+        self.sync = None      # set by the writer: () -> (offset, blocks, state)
+        self.clock = clock
+        self._saved = (len(self.members), len(self.entries), len(self.blocks))
+        self._done = self.bytes   # input bytes consumed, also inside a member
+        self._bytes = 0
+        self._last = clock()
+        self._fp = None
+
+    @classmethod
+    def open(cls, archive_path, files, profile, restart=False, **options):
+        # Picks up a journal left for the same job, otherwise starts afresh
+        job = _job(files, profile, options)
+        loaded = None if restart else load_journal(archive_path)
+        journal = None
+        if loaded is not None and _same_job(loaded[0], job):
+            journal = cls(archive_path, job, loaded[1])
+            try:
+                usable = journal.offset and journal.partial_size() >= journal.offset
+            except OSError:
+                usable = False
+            if not usable:
+                journal = None
+        if journal is None:
+            discard_journal(archive_path)
+            journal = cls(archive_path, job)
+            with open(journal.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(job) + '\n')
+                _fsync(f)
+        else:
+            with journal.open_partial() as f:
+                f.truncate(journal.offset)
+        journal._fp = open(journal.path, 'a', encoding='utf-8')
+        return journal
+
+    @property
+    def volume_size(self):
+        return self.job["options"].get("volume_size")
+
+    def partial_size(self):
+        if self.volume_size:
+            return volumes_size(self.partial)
+        return self.partial.stat().st_size
+
+    def open_partial(self):
+        # The partial archive for writing, at the last checkpoint
+        if self.volume_size:
+            fp = VolumeWriter(self.partial, self.volume_size, resume=self.resumed)
+        else:
+            fp = open(self.partial, 'r+b' if self.resumed else 'w+b')
+        fp.seek(self.offset)
+        return fp
+
+    @property
+    def resumed(self):
+        return self.offset > 0
+
+    def _apply(self, checkpoint):
+        self.count = checkpoint["count"]
+        self.bytes = checkpoint["bytes"]
+        self.offset = checkpoint["offset"]
+        self.sources += checkpoint["sources"]
+        self.members += checkpoint["members"]
+        self.entries += checkpoint["entries"]
+        self.blocks += checkpoint["blocks"]
+        self.state = checkpoint["state"]
+        self.built = checkpoint.get("built", False)
+
+    def commit(self, source, member, entry=None, nbytes=0):
+        # A member is completely in the partial archive
+        self.count += 1
+        self.sources.append(source)
+        self.members.append(member)
+        if entry is not None:
+            self.entries.append(entry)
+        self.advance(nbytes)
+
+    def advance(self, nbytes):
+        # Input consumed; checkpoints when one is due
+        self._done += nbytes
+        self._bytes += nbytes
+        if self.sync is not None and (self._bytes >= CHECKPOINT_BYTES or
+                                      self.clock() - self._last >= CHECKPOINT_INTERVAL):
+            self.checkpoint()
+
+    def checkpoint(self, built=False):
+        offset, blocks, self.state = self.sync()
+        members, entries, saved_blocks = self._saved
+        record = {
+            "count": self.count,
+            "bytes": self._done,
+            "offset": offset,
+            "sources": self.sources[members:],
+            "members": self.members[members:],
+            "entries": self.entries[entries:],
+            "blocks": blocks[saved_blocks:],
+            "state": self.state
+        }
+        self.blocks = list(blocks)
+        if built:
+            record["built"] = self.built = True
+        self._fp.write(json.dumps(record) + '\n')
+        _fsync(self._fp)
+        self.offset = offset
+        self.bytes = self._done
+        self._saved = (len(self.members), len(self.entries), len(self.blocks))
+        self._bytes = 0
+        self._last = self.clock()
+
+    def finish_build(self, nbytes):
+        # The partial archive, holding nbytes of input, is complete; only
+        # sealing or renaming it is left
+        self._done = nbytes
+        if self.volume_size:
+            # Each volume was fsync'ed as it was written
+            size = volumes_size(self.partial)
+        else:
+            with open(self.partial, 'r+b') as f:
+                os.fsync(f.fileno())
+                size = f.seek(0, os.SEEK_END)
+        self.sync = lambda: (size, self.blocks, self.state)
+        self.checkpoint(built=True)
+
+    def close(self):
+        # Leaves the journal and partial archive for a later run
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def complete(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def discard(self):
+        self.close()
+        discard_journal(self.archive_path)
@@ -0,0 +1,137 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# PBKDF2 is deliberately slow, so a session caches what it derived. Every
+# archive written in a session reuses one PBKDF2 salt per password (rotated
+# when its entry expires) and gets its own key from that master key through
+# HKDF with a random per-archive salt. A batch of thousands of encrypted
+# archives therefore runs PBKDF2 once. Cache entries are keyed by an HMAC
+# fingerprint of the password under a per-process secret, so the raw
+# password is never kept as a dictionary key.
+#
+# hashlib.pbkdf2_hmac releases the GIL, so derivations run on worker
+# threads and concurrent requests for the same key share one derivation.
+
+KDF_ITERATIONS = 600_000
+MIN_KDF_ITERATIONS = 10_000
+MAX_KDF_ITERATIONS = 50_000_000  # refuse headers that would stall for minutes
+KEY_SIZE = 32
+SALT_SIZE = 16
+
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_TTL = 15 * 60  # seconds
+
+def check_iterations(iterations):
+    if not MIN_KDF_ITERATIONS <= iterations <= MAX_KDF_ITERATIONS:
+        raise ValueError(f"KDF iterations must be between {MIN_KDF_ITERATIONS} and "
+                         f"{MAX_KDF_ITERATIONS}: {iterations}")
+    return iterations
+
+def pbkdf2(password, salt, iterations=KDF_ITERATIONS):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, KEY_SIZE)
+
+def hkdf(master_key, salt, info, length=KEY_SIZE):
+    # RFC 5869 HKDF-SHA256
+    prk = hmac.new(salt, master_key, hashlib.sha256).digest()
+    out = b''
+    block = b''
+    counter = 1
+    while len(out) < length:
+        block = hmac.new(prk, block + info + bytes([counter]), hashlib.sha256).digest()
+        out += block
+        counter += 1
+    return out[:length]
+
+class KeyCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, workers=2):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._keys = OrderedDict()      # (fingerprint, salt, iterations) -> (key, expires)
+        self._salts = {}                # (fingerprint, iterations) -> (salt, expires)
+        self._pending = {}              # (fingerprint, salt, iterations) -> Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers),
+                                        thread_name_prefix='zipper-kdf')
+        self.derivations = 0
+
+    def _fingerprint(self, password):
+        return hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+
+    def _expire(self, now):
+        for cache_key, (_, expires) in list(self._keys.items()):
+            if expires <= now:
+                del self._keys[cache_key]
+        for salt_key, (_, expires) in list(self._salts.items()):
+            if expires <= now:
+                del self._salts[salt_key]
+
+    def session_salt(self, password, iterations=KDF_ITERATIONS):
+        # PBKDF2 salt shared by the archives this session writes
+        key = (self._fingerprint(password), iterations)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._salts.get(key)
+            if entry is None:
+                entry = self._salts[key] = (os.urandom(SALT_SIZE), now + self.ttl)
+            return entry[0]
+
+    def derive_async(self, password, salt, iterations=KDF_ITERATIONS):
+        # Future of the PBKDF2 key; done at once on a cache hit
+        cache_key = (self._fingerprint(password), salt, iterations)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._keys.get(cache_key)
+            if entry is not None:
+                self._keys.move_to_end(cache_key)
+                future = Future()
+                future.set_result(entry[0])
+                return future
+            future = self._pending.get(cache_key)
+            if future is None:
+                future = self._pool.submit(self._derive, cache_key, password, salt, iterations)
+                self._pending[cache_key] = future
+            return future
+
+    def _derive(self, cache_key, password, salt, iterations):
+        try:
+            key = pbkdf2(password, salt, iterations)
+        except BaseException:
+            with self._lock:
+                self._pending.pop(cache_key, None)
+            raise
+        with self._lock:
+            # Cached before the pending entry goes, so no caller can miss both
+            self._pending.pop(cache_key, None)
+            self.derivations += 1
+            self._keys[cache_key] = (key, time.monotonic() + self.ttl)
+            self._keys.move_to_end(cache_key)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+        return key
+
+    def derive(self, password, salt, iterations=KDF_ITERATIONS):
+        return self.derive_async(password, salt, iterations).result()
+
+    def prefetch(self, password, iterations=KDF_ITERATIONS):
+        # Start deriving the session key for writing, e.g. as soon as the
+        # user has entered a password
+        return self.derive_async(password, self.session_salt(password, iterations), iterations)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._salts.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+# Shared by everything in this process
+session_keys = KeyCache()
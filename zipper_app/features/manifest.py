@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from .scanner import ScanEntry, arcname
+
+# The manifest lives next to the archive and records, for every member, the
+# source path, size, mtime and content hash of the file it was built from.
+# It is only trusted while the archive is exactly the one it describes.
+
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+
+def manifest_path(archive_path):
+    archive_path = Path(archive_path)
+    return archive_path.with_name(archive_path.name + MANIFEST_SUFFIX)
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(archive_path):
+    # Returns the member entries, or None when there is no usable manifest
+    archive_path = Path(archive_path)
+    try:
+        with open(manifest_path(archive_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        st = archive_path.stat()
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    if data.get("archive_size") != st.st_size or data.get("archive_mtime_ns") != st.st_mtime_ns:
+        # The archive was rewritten by something else
+        return None
+    return data.get("members", {})
+
+def save_manifest(archive_path, members):
+    archive_path = Path(archive_path)
+    st = archive_path.stat()
+    data = {
+        "version": MANIFEST_VERSION,
+        "archive_size": st.st_size,
+        "archive_mtime_ns": st.st_mtime_ns,
+        "members": members
+    }
+    path = manifest_path(archive_path)
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+def plan_update(files, old_members, chunk_size=1024 * 1024):
+    # Sort the inputs into unchanged, changed and added members and work out
+    # which old members are gone. Files are only hashed when their size or
+    # mtime differ from the manifest.
+    plan = {"unchanged": [], "changed": [], "added": [], "removed": [], "members": {}}
+    for file in files:
+        file_path = Path(file)
+        name = arcname(file)
+        # A scan has the stat() result already
+        st = file.stat if isinstance(file, ScanEntry) else file_path.stat()
+        old = old_members.get(name)
+        entry = {
+            "path": str(file_path.resolve()),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns
+        }
+        if old and old["path"] == entry["path"] and old["size"] == st.st_size \
+                and old["mtime_ns"] == st.st_mtime_ns:
+            entry["sha256"] = old["sha256"]
+            plan["unchanged"].append(file)
+        else:
+            entry["sha256"] = file_digest(file_path, chunk_size)
+            if old and old["sha256"] == entry["sha256"]:
+                # Touched but identical content
+                plan["unchanged"].append(file)
+            elif old:
+                plan["changed"].append(file)
+            else:
+                plan["added"].append(file)
+        plan["members"][name] = entry
+    plan["removed"] = [name for name in old_members if name not in plan["members"]]
+    return plan
+
+def build_members(files, chunk_size=1024 * 1024):
+    return plan_update(files, {}, chunk_size)["members"]
@@ -1,71 +1,297 @@
 import os
+import threading
+import time
 from pathlib import Path
 from PyQt6.QtCore import QObject, pyqtSignal
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent
+from . import backends
+from .rules import FileRules
 
-class FileHandler(FileSystemEventHandler):
-    def __init__(self, callback, patterns, min_size):
-        super().__init__()
+# watchdog is only imported once a monitor actually starts
+observers = backends.lazy("watchdog.observers")
+
+# A new file is ready once its size and mtime have not changed for
+# SETTLE_TIME seconds, or as soon as the writer closes it (inotify's
+# close-write, where the platform reports it). Ready files are handed on in
+# batches: a batch closes BATCH_WINDOW seconds after its first file, or when
+# it reaches BATCH_SIZE files. A callback that returns False refuses the
+# batch (its queue is full); the files stay ready and are offered again on
+# the next poll.
+SETTLE_TIME = 2.0
+POLL_INTERVAL = 0.5
+BATCH_WINDOW = 1.0
+BATCH_SIZE = 100
+
+class WriteTracker:
+    # Follows new files until they are completely written and passes them
+    # to callback(list of paths) in batches. poll() does the work; start()
+    # runs it on a thread of its own.
+    def __init__(self, callback, settle_time=SETTLE_TIME, poll_interval=POLL_INTERVAL,
+                 batch_window=BATCH_WINDOW, batch_size=BATCH_SIZE, clock=time.monotonic):
         self.callback = callback
-        self.patterns = patterns
-        self.min_size = min_size
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+        self.batch_window = batch_window
+        self.batch_size = max(1, batch_size)
+        self.clock = clock
+        self._pending = {}      # path -> (size, mtime_ns, time of the last change)
+        self._ready = []
+        self._batch_started = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
 
-    def on_created(self, event):
-        if not isinstance(event, FileCreatedEvent):
-            return
-            
-        file_path = Path(event.src_path)
-        
-        # Skip if it's a directory
-        if not file_path.is_file():
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, path):
+        # A new file appeared; it is stat'ed on the next poll
+        with self._lock:
+            self._pending[path] = (None, None, self.clock())
+
+    def changed(self, path):
+        with self._lock:
+            if path in self._pending:
+                self._pending[path] = (None, None, self.clock())
+
+    def closed(self, path):
+        # The writer closed the file: no need to wait for it to settle
+        with self._lock:
+            if self._pending.pop(path, None) is None:
+                return
+            batch = self._mark_ready(path, self.clock())
+        if batch:
+            self._deliver([batch])
+
+    def discard(self, path):
+        with self._lock:
+            self._pending.pop(path, None)
+            if path in self._ready:
+                self._ready.remove(path)
+
+    def _mark_ready(self, path, now):
+        # Returns a full batch to hand on, if this completed one
+        if not self._ready:
+            self._batch_started = now
+        self._ready.append(path)
+        if len(self._ready) >= self.batch_size:
+            return self._take_batch()
+        return None
+
+    def _take_batch(self):
+        # Anything left over was refused before and stays due
+        batch, self._ready = self._ready[:self.batch_size], self._ready[self.batch_size:]
+        if not self._ready:
+            self._batch_started = None
+        return batch
+
+    def _deliver(self, batches):
+        for i, batch in enumerate(batches):
+            if self.callback(batch) is False:
+                with self._lock:
+                    # Back to the front, in order, due again on the next poll
+                    self._ready[:0] = [path for rest in batches[i:] for path in rest]
+                    self._batch_started = self.clock() - self.batch_window
+                return batches[:i]
+        return batches
+
+    def poll(self):
+        now = self.clock()
+        batches = []
+        with self._lock:
+            pending = list(self._pending.items())
+        for path, (size, mtime_ns, last_change) in pending:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.discard(path)  # gone again, e.g. a temporary file
+                continue
+            with self._lock:
+                if self._pending.get(path, (None, None, None))[2] != last_change:
+                    continue  # an event arrived meanwhile
+                if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                    self._pending[path] = (st.st_size, st.st_mtime_ns, now)
+                elif now - last_change >= self.settle_time:
+                    del self._pending[path]
+                    batch = self._mark_ready(path, now)
+                    if batch:
+                        batches.append(batch)
+        with self._lock:
+            while self._ready and now - self._batch_started >= self.batch_window:
+                batches.append(self._take_batch())
+        return self._deliver(batches)
+
+    def start(self):
+        if self._thread:
             return
-            
-        # Check if file matches any pattern
-        if not any(file_path.match(pattern) for pattern in self.patterns):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='zipper-monitor', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def stop(self):
+        # Files that were not handed on yet are dropped
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._pending.clear()
+            self._ready.clear()
+
+class FileHandler:
+    # watchdog only calls dispatch() on a handler, so there is no need to
+    # subclass (and import) its FileSystemEventHandler up front
+    def __init__(self, callback, rules, tracker_options=None):
+        self.callback = callback
+        self.rules = rules
+        self.tracker = WriteTracker(self.on_ready, **(tracker_options or {}))
+
+    def dispatch(self, event):
+        if event.is_directory:
             return
-            
-        # Check file size
-        try:
-            if file_path.stat().st_size < self.min_size:
+        if event.event_type == "created":
+            self.on_created(event)
+        elif event.event_type == "modified":
+            self.tracker.changed(event.src_path)
+        elif event.event_type == "closed":
+            self.tracker.closed(event.src_path)
+        elif event.event_type == "moved":
+            # A file renamed into place counts as new under its new name
+            self.tracker.discard(event.src_path)
+            self.on_created(event, event.dest_path)
+        elif event.event_type == "deleted":
+            self.tracker.discard(event.src_path)
+
+    def on_created(self, event, path=None):
+        path = path or event.src_path
+        # Name rules only; size and age are checked once the file is complete
+        if self.rules.match_name(path):
+            self.tracker.add(path)
+
+    def on_ready(self, paths):
+        ready = []
+        now = time.time()
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # Skip if can't access file
+            if self.rules.match_stat(st, now):
+                ready.append(path)
+        if ready:
+            return self.callback(ready)
+        return True
+
+class ObserverHub:
+    # One watchdog observer and one polling thread for every monitored
+    # folder, however many there are. Watches are added and removed as
+    # monitors start and stop; the observer stops with the last one.
+    def __init__(self):
+        self._handlers = {}     # handler -> watch
+        self._observer = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._handlers)
+
+    def add(self, handler, path):
+        with self._lock:
+            if self._observer is None:
+                observer = observers.Observer()
+                observer.start()
+                self._observer = observer
+            # Monitors of the same folder share its watch
+            try:
+                self._handlers[handler] = self._observer.schedule(handler, path, recursive=True)
+            except Exception:
+                if not self._handlers:
+                    self._observer.stop()
+                    self._observer = None
+                raise
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='zipper-monitor',
+                                                daemon=True)
+                self._thread.start()
+
+    def remove(self, handler):
+        with self._lock:
+            watch = self._handlers.pop(handler, None)
+            if watch is None:
                 return
-        except OSError:
-            return  # Skip if can't access file
-            
-        self.callback(str(file_path))
+            if watch in self._handlers.values():
+                self._observer.remove_handler_for_watch(handler, watch)
+            else:
+                self._observer.unschedule(watch)
+            if self._handlers:
+                return
+            observer, self._observer = self._observer, None
+            thread, self._thread = self._thread, None
+            self._stop.set()
+        observer.stop()
+        if thread is not threading.current_thread():
+            thread.join()
+        observer.join()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                handlers = list(self._handlers)
+            interval = min((h.tracker.poll_interval for h in handlers), default=POLL_INTERVAL)
+            if self._stop.wait(interval):
+                return
+            for handler in handlers:
+                try:
+                    handler.tracker.poll()
+                except Exception as e:
+                    print(f"Error in folder monitor: {e}")
+
+hub = ObserverHub()
 
 class FolderMonitor(QObject):
-    file_found = pyqtSignal(str)
+    # Emitted with a batch of complete new files, once the sink (if any)
+    # has accepted it. A sink that returns False refuses the batch and gets
+    # it again later.
+    file_found = pyqtSignal(list)
     
-    def __init__(self, folder_path, patterns=None, min_size=0):
+    def __init__(self, folder_path, patterns=None, min_size=0, exclude=None, ignore_dirs=None,
+                 max_size=None, max_age=None, sink=None, **tracker_options):
         super().__init__()
         self.folder_path = str(Path(folder_path))  # Convert to string representation
         self.patterns = patterns or ["*.*"]
         self.min_size = min_size
-        self.observer = None
+        self.rules = FileRules(self.patterns, exclude, ignore_dirs, min_size, max_size, max_age,
+                               root=self.folder_path)
+        self.sink = sink
+        self.tracker_options = tracker_options
         self.handler = None
         
     def start(self):
-        if self.observer:
+        if self.handler:
             return
             
-        self.handler = FileHandler(
-            lambda f: self.file_found.emit(f),
-            self.patterns,
-            self.min_size
-        )
-        
-        self.observer = Observer()
-        self.observer.schedule(self.handler, self.folder_path, recursive=True)
+        handler = FileHandler(self._on_batch, self.rules, self.tracker_options)
         
         try:
-            self.observer.start()
+            hub.add(handler, self.folder_path)
         except Exception as e:
             print(f"Error starting folder monitor: {e}")
-            self.observer = None
+            return
+        self.handler = handler
+
+    def _on_batch(self, files):
+        if self.sink is not None and self.sink(files) is False:
+            return False
+        self.file_found.emit(files)
+        return True
     
     def stop(self):
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
-            self.observer = None
+        if self.handler:
+            hub.remove(self.handler)
+            self.handler.tracker.stop()
+            self.handler = None
@@ -0,0 +1,165 @@
+import os
+import re
+import stat
+import time
+
+# Include/exclude rules for monitored folders, compiled once so that checking
+# an event costs a few dictionary lookups and at most one regex match.
+#
+#   include      glob patterns, Path.match semantics (matched from the right,
+#                a '*' never crosses a '/'). Pure '*.ext' patterns are looked
+#                up in a set of suffixes; the rest are joined into one regex.
+#   exclude      glob patterns; an excluded file is never picked up
+#   ignore_dirs  directory names (globs allowed) whose whole subtree is
+#                ignored, e.g. '.git' or 'node_modules'
+#   min_size, max_size   bytes; max_size None means no limit
+#   max_age      seconds; older files (by mtime) are ignored, e.g. ones
+#                restored from a backup
+#
+# Name rules are checked when an event arrives, without touching the file
+# system; size and age need a stat and are checked once a file is complete.
+
+CASE_SENSITIVE = os.path.normcase('A') == 'A'
+
+_GLOB_CHARS = re.compile(r'[*?\[]')
+_PURE_SUFFIX = re.compile(r'\*\.([^*?\[\]/\\]+)')
+
+def _translate_part(part):
+    # fnmatch.translate for one path component: wildcards stop at '/'
+    out = []
+    i = 0
+    while i < len(part):
+        c = part[i]
+        i += 1
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i
+            if j < len(part) and part[j] in '!^':
+                j += 1
+            if j < len(part) and part[j] == ']':
+                j += 1
+            while j < len(part) and part[j] != ']':
+                j += 1
+            if j >= len(part):
+                out.append('\\[')
+                continue
+            body = part[i:j].replace('\\', '\\\\')
+            if body[:1] in '!^':
+                # A negated set must not match the separator either
+                body = '^/' + body[1:]
+            out.append(f'[{body}]')
+            i = j + 1
+        else:
+            out.append(re.escape(c))
+    return ''.join(out)
+
+def _translate(pattern):
+    pattern = pattern.replace('\\', '/')
+    anchored = pattern.startswith('/')
+    parts = [_translate_part(p) for p in pattern.strip('/').split('/') if p]
+    return ('^/' if anchored else '(?:^|/)') + '/'.join(parts) + '$'
+
+class PatternSet:
+    # Any-of matcher for a list of glob patterns
+    def __init__(self, patterns):
+        flags = 0 if CASE_SENSITIVE else re.IGNORECASE
+        self.suffixes = set()
+        regexes = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+            pure = _PURE_SUFFIX.fullmatch(pattern)
+            if pure:
+                self.suffixes.add(self._fold(pure.group(1)))
+            else:
+                regexes.append(_translate(pattern))
+        self.regex = re.compile('|'.join(f'(?:{r})' for r in regexes), flags) if regexes else None
+
+    def __bool__(self):
+        return bool(self.suffixes or self.regex)
+
+    @staticmethod
+    def _fold(text):
+        return text if CASE_SENSITIVE else text.lower()
+
+    def match(self, path, name):
+        # path uses '/' separators; name is its last component
+        if self.suffixes:
+            folded = self._fold(name)
+            dot = folded.find('.')
+            while dot >= 0:
+                if folded[dot + 1:] in self.suffixes:
+                    return True
+                dot = folded.find('.', dot + 1)
+        return self.regex is not None and self.regex.search(path) is not None
+
+class FileRules:
+    def __init__(self, include=None, exclude=None, ignore_dirs=None, min_size=0,
+                 max_size=None, max_age=None, root=None):
+        self.include = PatternSet(include or ())
+        self.exclude = PatternSet(exclude or ())
+        names = [d.strip().strip('/\\') for d in ignore_dirs or () if d.strip()]
+        self.ignored_names = {PatternSet._fold(d) for d in names if not _GLOB_CHARS.search(d)}
+        globs = [_translate_part(d) for d in names if _GLOB_CHARS.search(d)]
+        self.ignored_globs = re.compile('|'.join(globs), 0 if CASE_SENSITIVE else re.IGNORECASE) \
+            if globs else None
+        self.min_size = min_size or 0
+        self.max_size = max_size or None
+        self.max_age = max_age or None
+        # Directories above the monitored folder never count as ignored
+        self.root = os.path.normpath(root) + os.sep if root else None
+
+    def _relative_parts(self, path):
+        if self.root and path.startswith(self.root):
+            path = path[len(self.root):]
+        return path.replace('\\', '/').split('/')
+
+    def _ignored(self, parts):
+        for part in parts:
+            if PatternSet._fold(part) in self.ignored_names:
+                return True
+            if self.ignored_globs is not None and self.ignored_globs.fullmatch(part):
+                return True
+        return False
+
+    def ignores_dir(self, path):
+        # True when a directory (or anything inside it) is ignored, so a
+        # scanner need not descend into it
+        return bool(self.ignored_names or self.ignored_globs) and \
+            self._ignored(self._relative_parts(os.fspath(path)))
+
+    def match_name(self, path):
+        # The rules that need no stat()
+        path = os.fspath(path)
+        if (self.ignored_names or self.ignored_globs) and \
+                self._ignored(self._relative_parts(path)[:-1]):
+            return False
+        posix = path.replace('\\', '/')
+        name = posix[posix.rfind('/') + 1:]
+        if self.include and not self.include.match(posix, name):
+            return False
+        return not (self.exclude and self.exclude.match(posix, name))
+
+    def match_stat(self, st, now=None):
+        if not stat.S_ISREG(st.st_mode):
+            return False
+        if st.st_size < self.min_size:
+            return False
+        if self.max_size is not None and st.st_size > self.max_size:
+            return False
+        if self.max_age is not None:
+            if (now if now is not None else time.time()) - st.st_mtime > self.max_age:
+                return False
+        return True
+
+    def matches(self, path):
+        if not self.match_name(path):
+            return False
+        try:
+            return self.match_stat(os.stat(path))
+        except OSError:
+            return False
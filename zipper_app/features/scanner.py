@@ -0,0 +1,178 @@
+import os
+import queue
+import stat
+import threading
+from collections import deque
+from pathlib import Path
+from .rules import FileRules
+
+# Directory scanner built on os.scandir. Directories are listed by a few
+# threads at once (listing is bound by disk and network latency, not CPU),
+# and the matching files go to the consumer in batches through a bounded
+# queue: compression starts on the first files while the rest of a large
+# tree is still being listed, and memory stays flat however many entries
+# it has.
+#
+# Each file is found once, however many of the patterns match it; links to
+# directories are not followed. Entries carry the stat() result scandir
+# already had, so nobody needs to stat them again.
+
+SCAN_WORKERS = 8
+BATCH_SIZE = 256
+QUEUE_BATCHES = 64        # batches listed ahead of the consumer
+
+class ScanEntry:
+    # A file found by a scan; works wherever a path does. name is its path
+    # relative to the scanned folder, '/'-separated, and is its name in an
+    # archive.
+    __slots__ = ('path', 'name', 'stat')
+
+    def __init__(self, path, name, st):
+        self.path = path
+        self.name = name
+        self.stat = st
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        return f"ScanEntry({self.path!r})"
+
+def arcname(file, root=None):
+    # Member name for an input file: its path within a scanned folder (or
+    # within root), or just the file name
+    if isinstance(file, ScanEntry):
+        return file.name
+    if root is not None:
+        return Path(os.path.relpath(file, root)).as_posix()
+    return Path(file).name
+
+def member_path(output_dir, name):
+    # Where a member is extracted to. Same sanitising as zipfile.extractall:
+    # no absolute paths, drive letters or parent references may escape
+    # output_dir.
+    name = name.replace('\\', '/')
+    parts = [p for p in name.split('/') if p not in ('', '.', '..')]
+    if parts and parts[0].endswith(':'):
+        parts = parts[1:]
+    return Path(output_dir).joinpath(*parts)
+
+class DirectoryScan:
+    # Iterable of ScanEntry for the files in root matching any of patterns
+    # (globs, as in the folder monitor rules), optionally in subfolders too.
+    # Every iteration scans afresh.
+    def __init__(self, root, patterns=None, recursive=False, ignore_dirs=None,
+                 workers=SCAN_WORKERS):
+        self.root = os.path.abspath(root)
+        self.patterns = [p for p in patterns or () if p.strip()] or ["*.*"]
+        self.recursive = recursive
+        self.ignore_dirs = list(ignore_dirs or ())
+        self.workers = max(1, workers) if recursive else 1
+        self.rules = FileRules(self.patterns, ignore_dirs=self.ignore_dirs, root=self.root)
+        # Running totals of the current scan, ahead of what was consumed
+        self.files_found = 0
+        self.bytes_found = 0
+        self.finished = False
+
+    def describe(self):
+        # What a journal records to recognise the same job
+        return {"root": self.root, "patterns": self.patterns, "recursive": self.recursive,
+                "ignore_dirs": self.ignore_dirs}
+
+    def _list(self, directory, subdirs):
+        # Yields batches of matching files; subfolders go into subdirs
+        prefix = len(self.root) + 1
+        batch = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive and not self.rules.ignores_dir(entry.path):
+                                subdirs.append(entry.path)
+                            continue
+                        if not self.rules.match_name(entry.path):
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue  # vanished meanwhile
+                    if not stat.S_ISREG(st.st_mode):
+                        continue
+                    name = entry.path[prefix:].replace(os.sep, '/')
+                    batch.append(ScanEntry(entry.path, name, st))
+                    if len(batch) >= BATCH_SIZE:
+                        yield batch
+                        batch = []
+        except OSError:
+            pass  # unreadable folders are skipped, as os.walk does
+        if batch:
+            yield batch
+
+    def __iter__(self):
+        if not os.path.isdir(self.root):
+            raise NotADirectoryError(f"Not a directory: {self.root}")
+        self.files_found = self.bytes_found = 0
+        self.finished = False
+        pending = deque([self.root])
+        unfinished = [1]      # folders queued or being listed
+        cond = threading.Condition()
+        results = queue.Queue(QUEUE_BATCHES)
+        stop = threading.Event()
+
+        def put(item):
+            # Blocks while the consumer is behind, unless it went away
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def work():
+            try:
+                while True:
+                    with cond:
+                        while not pending and unfinished[0] and not stop.is_set():
+                            cond.wait()
+                        if stop.is_set() or not pending:
+                            return
+                        directory = pending.popleft()
+                    subdirs = []
+                    for batch in self._list(directory, subdirs):
+                        with cond:
+                            self.files_found += len(batch)
+                            self.bytes_found += sum(e.stat.st_size for e in batch)
+                        if not put(batch):
+                            return
+                    with cond:
+                        pending.extend(subdirs)
+                        unfinished[0] += len(subdirs) - 1
+                        cond.notify_all()
+            except BaseException as e:
+                put(e)
+            finally:
+                put(None)
+
+        threads = [threading.Thread(target=work, name=f'zipper-scan-{i}', daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            running = len(threads)
+            while running:
+                item = results.get()
+                if item is None:
+                    running -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield from item
+            self.finished = True
+        finally:
+            # Also when the consumer stops early
+            stop.set()
+            with cond:
+                cond.notify_all()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,338 @@
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from .governor import ResourceLimits
+from .jobs import JobManager
+from .scanner import DirectoryScan
+
+# Compression jobs set to run later. The queue lives in a JSON file that is
+# rewritten on every change, so scheduled jobs survive closing Zipper, and
+# crashes. A job starts once its time has come and, if it has a time window
+# such as 01:00-05:00 (which may run past midnight), only inside it. Due jobs
+# go highest priority first, then earliest first, and at most `max_running`
+# of them run at once. A job still running when its window closes is
+# interrupted and carries on from its journal when the window opens again.
+#
+# On the next start, jobs that were running are resumed, and jobs whose time
+# came while Zipper was closed run late, unless they were set to be skipped
+# then.
+
+SCHEDULE_VERSION = 1
+
+QUEUED = "queued"
+RUNNING = "running"
+
+CATCH_UP_RUN = "run"
+CATCH_UP_SKIP = "skip"
+CATCH_UP_GRACE = 60.0    # seconds late before a job counts as missed
+MAX_SLEEP = 60.0         # look again at least this often (clock changes, suspend)
+
+def _minutes(text):
+    hours, minutes = (int(part) for part in text.strip().split(':'))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(text)
+    return hours * 60 + minutes
+
+def parse_window(window):
+    # "HH:MM-HH:MM" -> (start, end) in minutes after midnight
+    try:
+        start, end = window.split('-')
+        return _minutes(start), _minutes(end)
+    except ValueError:
+        raise ValueError(f"Invalid time window: {window!r} (expected HH:MM-HH:MM)") from None
+
+def _at(dt, minutes):
+    # The first time at `minutes` after midnight that is later than dt
+    at = dt.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+    return at if at > dt else at + timedelta(days=1)
+
+def in_window(window, when):
+    # A window that ends before it starts runs past midnight; one that ends
+    # where it starts is open all day. No window is always open.
+    if window is None:
+        return True
+    start, end = parse_window(window)
+    dt = datetime.fromtimestamp(when)
+    minute = dt.hour * 60 + dt.minute
+    if start < end:
+        return start <= minute < end
+    if start > end:
+        return minute >= start or minute < end
+    return True
+
+def window_opens(window, when):
+    # The earliest time from `when` on inside the window
+    if in_window(window, when):
+        return when
+    return _at(datetime.fromtimestamp(when), parse_window(window)[0]).timestamp()
+
+def window_closes(window, when):
+    # When the window `when` is in closes; None if it never does
+    if window is None:
+        return None
+    start, end = parse_window(window)
+    if start == end:
+        return None
+    return _at(datetime.fromtimestamp(when), end).timestamp()
+
+def job_input(job):
+    # What to hand to the compressor for a scheduled job
+    if "source" in job:
+        return DirectoryScan(**job["source"])
+    return job["files"]
+
+class JobSchedule:
+    # The persistent queue. Jobs are plain dicts:
+    #
+    #   id, output, profile     where and how to compress
+    #   files | source          a list of files, or a folder scan's settings
+    #   options                 compress_files options, plus "encrypted"
+    #                           (the password itself is never stored) and
+    #                           "limits", ResourceLimits settings
+    #   when, window            not before this time, and only in this window
+    #   priority, catch_up      higher goes first; "run" or "skip" when missed
+    #   state, started          queued or running; whether it ever started
+    def __init__(self, path, clock=time.time):
+        self.path = Path(path)
+        self.clock = clock
+        self.jobs = {}
+        self._next_id = 1
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != SCHEDULE_VERSION:
+            data = {}
+        self.jobs = {job["id"]: job for job in data.get("jobs", [])}
+        self._next_id = max(self.jobs, default=0) + 1
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": SCHEDULE_VERSION, "jobs": list(self.jobs.values())}, f)
+        os.replace(temp_path, self.path)
+
+    def add(self, files, output_path, profile, when=None, priority=0, window=None,
+            catch_up=CATCH_UP_RUN, **options):
+        if window is not None:
+            parse_window(window)
+        if catch_up not in (CATCH_UP_RUN, CATCH_UP_SKIP):
+            raise ValueError(f"Invalid catch-up policy: {catch_up!r}")
+        job = {
+            "id": self._next_id,
+            "output": str(output_path),
+            "profile": profile,
+            "options": options,
+            "when": self.clock() if when is None else when,
+            "window": window,
+            "priority": priority,
+            "catch_up": catch_up,
+            "state": QUEUED,
+            "started": False
+        }
+        if isinstance(files, DirectoryScan):
+            job["source"] = files.describe()
+        else:
+            job["files"] = [os.fspath(f) for f in files]
+        self._next_id += 1
+        self.jobs[job["id"]] = job
+        self.save()
+        return job["id"]
+
+    def remove(self, job_id):
+        if self.jobs.pop(job_id, None) is not None:
+            self.save()
+
+    def requeue(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job["state"] = QUEUED
+            self.save()
+
+    def starts_at(self, job, now=None):
+        # When a queued job may start, from now on
+        now = self.clock() if now is None else now
+        return window_opens(job["window"], max(job["when"], now))
+
+    def take_due(self, limit, ready=None, now=None):
+        # Up to `limit` jobs that may start now, best first, marked running.
+        # ready(job) can hold a job back for the time being.
+        now = self.clock() if now is None else now
+        heap = [(-job["priority"], job["when"], job["id"]) for job in self.jobs.values()
+                if job["state"] == QUEUED and job["when"] <= now
+                and in_window(job["window"], now)]
+        heapq.heapify(heap)
+        taken = []
+        while heap and len(taken) < limit:
+            job = self.jobs[heapq.heappop(heap)[2]]
+            if ready is None or ready(job):
+                job["state"] = RUNNING
+                job["started"] = True
+                taken.append(job)
+        if taken:
+            self.save()
+        return taken
+
+    def next_start(self, now=None):
+        # The earliest time after now at which a queued job may start
+        now = self.clock() if now is None else now
+        return min((start for start in (self.starts_at(job, now) for job in self.jobs.values()
+                                        if job["state"] == QUEUED) if start > now),
+                   default=None)
+
+    def recover(self, now=None):
+        # For a fresh start: jobs that were running were cut short and go
+        # back in the queue (their journal resumes them); those that could
+        # have started while Zipper was closed but are set to be skipped
+        # then are dropped, unless they had started before. Returns the
+        # dropped jobs.
+        now = self.clock() if now is None else now
+        missed = []
+        for job in list(self.jobs.values()):
+            if job["state"] == RUNNING:
+                job["state"] = QUEUED
+            elif job["catch_up"] == CATCH_UP_SKIP and not job["started"] and \
+                    self.starts_at(job, job["when"]) < now - CATCH_UP_GRACE:
+                missed.append(self.jobs.pop(job["id"]))
+        self.save()
+        return missed
+
+class Scheduler(QObject):
+    # Starts scheduled jobs on a JobManager of their own as they become due
+    job_started = pyqtSignal(object)            # job
+    job_finished = pyqtSignal(object, object)   # job, result dict from Compressor
+    job_failed = pyqtSignal(object, str)        # job, error
+
+    def __init__(self, schedule, compressor=None, max_running=1, parent=None):
+        super().__init__(parent)
+        self.schedule = schedule
+        self.manager = JobManager(compressor, max_concurrent=max_running, parent=self)
+        self.manager.job_finished.connect(self._on_finished)
+        self.manager.job_failed.connect(self._on_failed)
+        self.manager.job_cancelled.connect(self._on_cancelled)
+        self.password = None
+        self._running = {}        # job manager id -> scheduled job id
+        self._interrupted = set()
+        self._closed = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.check)
+
+    @property
+    def max_running(self):
+        return self.manager.max_concurrent
+
+    @max_running.setter
+    def max_running(self, value):
+        self.manager.max_concurrent = max(1, value)
+        self.check()
+
+    def start(self):
+        # Returns the jobs dropped as missed while Zipper was closed
+        self._closed = False
+        missed = self.schedule.recover()
+        self.check()
+        return missed
+
+    def add(self, files, output_path, profile, **schedule_options):
+        job_id = self.schedule.add(files, output_path, profile, **schedule_options)
+        self.check()
+        return job_id
+
+    def remove(self, job_id):
+        # Stops the job as well when it is running
+        self.schedule.remove(job_id)
+        for manager_id, scheduled_id in list(self._running.items()):
+            if scheduled_id == job_id:
+                self.manager.cancel(manager_id)
+
+    def is_running(self, job_id):
+        return job_id in self._running.values()
+
+    def _ready(self, job):
+        # Encrypted jobs wait until a password is set in this session
+        return not job["options"].get("encrypted") or bool(self.password)
+
+    def check(self):
+        if self._closed:
+            return
+        now = self.schedule.clock()
+        wakeups = [now + MAX_SLEEP]
+        for manager_id, job_id in self._running.items():
+            job = self.schedule.jobs.get(job_id)
+            if job is None or manager_id in self._interrupted:
+                continue
+            if not in_window(job["window"], now):
+                # Off-hours jobs do not run on into working hours
+                self._interrupted.add(manager_id)
+                self.manager.interrupt(manager_id)
+            else:
+                wakeups.append(window_closes(job["window"], now) or wakeups[0])
+        free = self.max_running - len(self._running)
+        if free > 0:
+            for job in self.schedule.take_due(free, self._ready, now):
+                self._submit(job)
+        if len(self._running) < self.max_running:
+            wakeups.append(self.schedule.next_start(now) or wakeups[0])
+        self._timer.start(max(0, int((min(wakeups) - now) * 1000)) + 100)
+
+    def _submit(self, job):
+        options = dict(job["options"])
+        password = self.password if options.pop("encrypted", False) else None
+        limits = ResourceLimits.from_settings(options.pop("limits", None))
+        manager_id = self.manager.submit_compress(
+            job_input(job), job["output"], job["profile"], password=password,
+            resumable=not options.get("update"), limits=limits, **options
+        )
+        self._running[manager_id] = job["id"]
+        self.job_started.emit(job)
+
+    def _done(self, manager_id):
+        # The scheduled job a finished manager job was, now off the queue
+        job_id = self._running.pop(manager_id, None)
+        job = self.schedule.jobs.get(job_id)
+        if job is not None:
+            self.schedule.remove(job_id)
+        return job
+
+    def _on_finished(self, manager_id, result):
+        if self._closed:
+            return
+        job = self._done(manager_id)
+        if job is not None:
+            self.job_finished.emit(job, result)
+        self.check()
+
+    def _on_failed(self, manager_id, error):
+        if self._closed:
+            return
+        job = self._done(manager_id)
+        if job is not None:
+            self.job_failed.emit(job, error)
+        self.check()
+
+    def _on_cancelled(self, manager_id):
+        if self._closed:
+            return
+        if manager_id in self._interrupted:
+            # Its window closed; it waits for the next one
+            self._interrupted.discard(manager_id)
+            self.schedule.requeue(self._running.pop(manager_id))
+        else:
+            self._done(manager_id)
+        self.check()
+
+    def shutdown(self):
+        # Running jobs stay marked as running, so the next start resumes them
+        self._closed = True
+        self._timer.stop()
+        self.manager.shutdown()
@@ -0,0 +1,282 @@
+import bisect
+import io
+import os
+import re
+from pathlib import Path
+
+# Split archives, for file systems and object stores with a size limit per
+# file: archive.zip.001, archive.zip.002, ... of volume_size bytes each (as
+# 7-Zip splits any archive, so it opens them too). Archives are written
+# straight into volumes through VolumeWriter, so no file ever grows past
+# volume_size, not even while the archive is built. Writers that go back
+# to patch a header (ZIP, 7z) reopen the volume it is in.
+#
+# Reading joins them into one seekable stream. Every extraction worker opens
+# its own, so workers read from different volumes at the same time.
+
+VOLUME_DIGITS = 3
+MIN_VOLUME_SIZE = 64 * 1024
+
+_VOLUME_NUMBER = re.compile(r'\.(\d{%d,})$' % VOLUME_DIGITS)
+
+def volume_path(archive_path, number):
+    archive_path = Path(archive_path)
+    return archive_path.with_name(f"{archive_path.name}.{number:0{VOLUME_DIGITS}d}")
+
+def check_volume_size(volume_size):
+    if volume_size < MIN_VOLUME_SIZE:
+        raise ValueError(f"Volume size must be at least {MIN_VOLUME_SIZE // 1024} KB")
+    return volume_size
+
+def split_base(archive_path):
+    # archive.zip for any of its volumes (or for archive.zip itself when only
+    # its volumes exist); None when the path is no split archive
+    archive_path = Path(archive_path)
+    match = _VOLUME_NUMBER.search(archive_path.name)
+    if match:
+        return archive_path.with_name(archive_path.name[:match.start()])
+    if not archive_path.exists() and volume_path(archive_path, 1).exists():
+        return archive_path
+    return None
+
+def find_volumes(base):
+    # The volumes that exist, in order, from the first one on
+    volumes = []
+    while True:
+        path = volume_path(base, len(volumes) + 1)
+        if not path.exists():
+            break
+        volumes.append(path)
+    if not volumes:
+        raise FileNotFoundError(f"First volume not found: {volume_path(base, 1)}")
+    return volumes
+
+def first_volume(archive_path):
+    # Where an archive starts: its first volume, or the archive itself
+    base = split_base(archive_path)
+    return archive_path if base is None else volume_path(base, 1)
+
+def archive_size(archive_path):
+    base = split_base(archive_path)
+    if base is None:
+        return os.path.getsize(archive_path)
+    return sum(os.path.getsize(path) for path in find_volumes(base))
+
+def remove_volumes(base, first=1):
+    # Removes volumes from number `first` on, e.g. those left from an
+    # earlier, longer archive
+    number = first
+    while True:
+        path = volume_path(base, number)
+        if not path.exists():
+            break
+        path.unlink()
+        number += 1
+
+def volumes_size(base):
+    # Total size of the volumes of base, 0 when there are none
+    try:
+        return sum(os.path.getsize(path) for path in find_volumes(base))
+    except FileNotFoundError:
+        return 0
+
+def publish_volumes(source, base):
+    # Renames the volumes of source, e.g. those of a finished partial
+    # archive, to those of base, replacing an earlier archive of that name.
+    # Returns their paths.
+    paths = []
+    for number, path in enumerate(find_volumes(source), 1):
+        paths.append(volume_path(base, number))
+        os.replace(path, paths[-1])
+    remove_volumes(base, len(paths) + 1)
+    # A whole archive of the same name would be opened instead of them
+    Path(base).unlink(missing_ok=True)
+    return paths
+
+class VolumeWriter(io.RawIOBase):
+    # Writable, seekable file spread over the volumes of base, each at most
+    # volume_size bytes. A volume is fsync'ed when writing moves on to
+    # another one, the last one on close. Without resume, volumes left
+    # from an earlier archive of base are removed first.
+    def __init__(self, base, volume_size, resume=False):
+        super().__init__()
+        self.base = Path(base)
+        self.volume_size = check_volume_size(volume_size)
+        if not resume:
+            remove_volumes(self.base)
+        self.size = volumes_size(self.base)
+        self._pos = 0
+        self._index = None
+        self._fp = None
+        self._dirty = False
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._pos = offset
+        return offset
+
+    def _volume(self, index):
+        # Only one volume is open at a time
+        if index != self._index:
+            self._release()
+            path = volume_path(self.base, index + 1)
+            self._fp = open(path, 'r+b' if path.exists() else 'w+b')
+            self._index = index
+        return self._fp
+
+    def _release(self):
+        if self._fp is None:
+            return
+        if self._dirty:
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+            self._dirty = False
+        self._fp.close()
+        self._fp = None
+        self._index = None
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        view = memoryview(b).cast('B')
+        written = 0
+        while written < len(view):
+            index, offset = divmod(self._pos, self.volume_size)
+            fp = self._volume(index)
+            fp.seek(offset)
+            n = fp.write(view[written:written + min(len(view) - written,
+                                                    self.volume_size - offset)])
+            self._dirty = True
+            written += n
+            self._pos += n
+        self.size = max(self.size, self._pos)
+        return written
+
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        filled = 0
+        while filled < len(view) and self._pos < self.size:
+            index, offset = divmod(self._pos, self.volume_size)
+            fp = self._volume(index)
+            fp.seek(offset)
+            n = fp.readinto(view[filled:filled + min(len(view) - filled,
+                                                     self.volume_size - offset)])
+            if not n:
+                break
+            filled += n
+            self._pos += n
+        return filled
+
+    def truncate(self, size=None):
+        # Drops everything from size on, whole volumes included
+        size = self._pos if size is None else size
+        self._release()
+        count = -(-size // self.volume_size)
+        remove_volumes(self.base, count + 1)
+        if count:
+            with open(volume_path(self.base, count), 'r+b') as f:
+                f.truncate(size - (count - 1) * self.volume_size)
+                os.fsync(f.fileno())
+        self.size = size
+        return size
+
+    def fsync(self):
+        # Volumes written before the current one are already durable
+        if self._fp is not None and self._dirty:
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+            self._dirty = False
+
+    def close(self):
+        if not self.closed:
+            self._release()
+        super().close()
+
+class VolumeReader(io.RawIOBase):
+    # Seekable view of a split archive's volumes as one file. With
+    # remove_read, a volume is deleted once reading moves on past it; for
+    # reading the volumes through once, e.g. to seal them.
+    def __init__(self, paths, remove_read=False):
+        super().__init__()
+        self.paths = [Path(path) for path in paths]
+        self.remove_read = remove_read
+        self._starts = [0]
+        for path in self.paths:
+            self._starts.append(self._starts[-1] + os.path.getsize(path))
+        self.size = self._starts[-1]
+        self._pos = 0
+        self._index = None
+        self._fp = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._pos = offset
+        return offset
+
+    def _volume(self, index):
+        # Only one volume is open at a time
+        if index != self._index:
+            if self._fp is not None:
+                self._fp.close()
+            if self.remove_read:
+                for path in self.paths[:index]:
+                    path.unlink(missing_ok=True)
+            self._fp = open(self.paths[index], 'rb')
+            self._index = index
+        return self._fp
+
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        filled = 0
+        while filled < len(view) and self._pos < self.size:
+            index = bisect.bisect_right(self._starts, self._pos) - 1
+            fp = self._volume(index)
+            fp.seek(self._pos - self._starts[index])
+            wanted = min(len(view) - filled, self._starts[index + 1] - self._pos)
+            n = fp.readinto(view[filled:filled + wanted])
+            if not n:
+                break  # the volume shrank since it was opened
+            filled += n
+            self._pos += n
+        return filled
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        super().close()
+
+def open_volumes(archive_path, buffer_size=io.DEFAULT_BUFFER_SIZE):
+    # Buffered, seekable stream over all volumes of a split archive
+    return io.BufferedReader(VolumeReader(find_volumes(split_base(archive_path))), buffer_size)
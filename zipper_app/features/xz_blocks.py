@@ -0,0 +1,446 @@
+import bisect
+import io
+import lzma
+import os
+import struct
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Independent xz blocks let both compression and decompression run on
+# several cores while the output stays a single standard .xz stream (the
+# same layout `xz -T` produces). liblzma releases the GIL, so threads are
+# enough to keep every core busy.
+
+DEFAULT_BLOCK_SIZE = 24 * 1024 * 1024  # 3x the preset 6 dictionary, as xz does
+DEFAULT_PRESET = 6
+
+HEADER_MAGIC = b'\xfd7zXZ\x00'
+FOOTER_MAGIC = b'YZ'
+CHECK_CRC32 = 0x01
+FILTER_LZMA2 = 0x21
+
+# Blocks whose uncompressed size exceeds this are streamed instead of being
+# decoded in memory (e.g. single-block archives written by older versions)
+MAX_PARALLEL_BLOCK = 64 * 1024 * 1024
+
+def _vli(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _read_vli(buf, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise lzma.LZMAError("Invalid variable-length integer in xz index")
+
+def _pad4(size):
+    return -size % 4
+
+def _round4(size):
+    return size + _pad4(size)
+
+def _stream_header(flags):
+    return HEADER_MAGIC + flags + struct.pack('<I', zlib.crc32(flags))
+
+def _stream_footer(flags, index_size):
+    body = struct.pack('<I', index_size // 4 - 1) + flags
+    return struct.pack('<I', zlib.crc32(body)) + body + FOOTER_MAGIC
+
+def _index(records):
+    data = bytearray(b'\x00')
+    data += _vli(len(records))
+    for unpadded_size, uncompressed_size in records:
+        data += _vli(unpadded_size)
+        data += _vli(uncompressed_size)
+    data += b'\x00' * _pad4(len(data))
+    data += struct.pack('<I', zlib.crc32(data))
+    return bytes(data)
+
+def _lzma2_dict_byte(dict_size):
+    # Smallest encodable dictionary size that is >= dict_size
+    for value in range(40):
+        if (2 | (value & 1)) << (value // 2 + 11) >= dict_size:
+            return value
+    return 40
+
+def _compress_block(data, preset):
+    filters = [{'id': lzma.FILTER_LZMA2, 'preset': preset}]
+    compressed = lzma.compress(data, format=lzma.FORMAT_RAW, filters=filters)
+    dict_size = _preset_dict_size(preset)
+
+    # Block header with both sizes recorded so readers can seek past blocks
+    body = bytearray([0x40 | 0x80])
+    body += _vli(len(compressed))
+    body += _vli(len(data))
+    body += _vli(FILTER_LZMA2) + _vli(1) + bytes([_lzma2_dict_byte(dict_size)])
+    header_size = _round4(1 + len(body)) + 4
+    header = bytearray([header_size // 4 - 1]) + body
+    header += b'\x00' * (header_size - 4 - len(header))
+    header += struct.pack('<I', zlib.crc32(header))
+
+    check = struct.pack('<I', zlib.crc32(data))
+    block = bytes(header) + compressed + b'\x00' * _pad4(len(compressed)) + check
+    unpadded_size = len(header) + len(compressed) + len(check)
+    return block, unpadded_size, len(data)
+
+def _preset_dict_size(preset):
+    # Dictionary sizes of the liblzma presets 0-9
+    sizes = [256, 1024, 2048, 4096, 4096, 8192, 8192, 16384, 32768, 65536]
+    return sizes[min(preset & 0x1F, 9)] * 1024
+
+class XZBlockWriter(io.BufferedIOBase):
+    def __init__(self, fileobj, preset=DEFAULT_PRESET, block_size=DEFAULT_BLOCK_SIZE,
+                 workers=1, resume=None):
+        super().__init__()
+        if block_size <= 0:
+            raise ValueError(f"Block size must be positive: {block_size}")
+        self._fp = fileobj
+        self._preset = preset
+        self._block_size = block_size
+        self._workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self._workers)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._records = []
+        self._pos = 0
+        self._flags = bytes([0x00, CHECK_CRC32])
+        if resume is None:
+            self._fp.write(_stream_header(self._flags))
+        else:
+            # Carry on a stream cut short after checkpoint() returned
+            # (records, pos); fileobj is positioned where its blocks end
+            records, self._pos = resume
+            self._records = [tuple(r) for r in records]
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        data = memoryview(data).cast('B')
+        size = len(data)
+        self._pos += size
+        if self._buffer:
+            # Top up the block being collected
+            missing = self._block_size - len(self._buffer)
+            self._buffer += data[:missing]
+            data = data[missing:]
+            if len(self._buffer) < self._block_size:
+                return size
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        # Whole blocks of data that cannot change (bytes, a read-only
+        # mapping) go to the workers without a copy
+        while len(data) >= self._block_size:
+            block = data[:self._block_size]
+            self._submit(block if data.readonly else bytes(block))
+            data = data[self._block_size:]
+        self._buffer += data
+        return size
+
+    def set_preset(self, preset):
+        # Data written from now on goes into new blocks with this preset
+        if preset == self._preset:
+            return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        self._preset = preset
+
+    def _submit(self, data):
+        self._pending.append(self._pool.submit(_compress_block, data, self._preset))
+        # Bound the number of blocks in flight so memory stays constant
+        while len(self._pending) > self._workers * 2:
+            self._drain_one()
+
+    def checkpoint(self):
+        # Ends the current block and writes out all blocks in flight. The
+        # returned (records, pos) lets a new writer continue the stream from
+        # what is in the file now.
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._drain_one()
+        return [list(r) for r in self._records], self._pos
+
+    def _drain_one(self):
+        block, unpadded_size, uncompressed_size = self._pending.popleft().result()
+        self._fp.write(block)
+        self._records.append((unpadded_size, uncompressed_size))
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Don't finish the stream for a failed or cancelled job
+            self.abort()
+        else:
+            self.close()
+
+    def abort(self):
+        if self.closed:
+            return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pending.clear()
+        self._buffer.clear()
+        super().close()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._drain_one()
+            index = _index(self._records)
+            self._fp.write(index)
+            self._fp.write(_stream_footer(self._flags, len(index)))
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            super().close()
+
+def read_block_layout(fp):
+    # Walk the stream footers and indexes backwards from the end of the file,
+    # returning [(stream_flags, [(offset, unpadded, uncompressed), ...]), ...]
+    fp.seek(0, os.SEEK_END)
+    pos = fp.tell()
+    streams = []
+    while pos > 0:
+        if pos < 12:
+            raise lzma.LZMAError("File is too small to be an xz stream")
+
+        # Skip stream padding between concatenated streams
+        fp.seek(pos - 4)
+        if fp.read(4) == b'\x00\x00\x00\x00':
+            pos -= 4
+            continue
+
+        fp.seek(pos - 12)
+        footer = fp.read(12)
+        if footer[10:] != FOOTER_MAGIC:
+            raise lzma.LZMAError("Missing xz stream footer")
+        backward_size = (struct.unpack('<I', footer[4:8])[0] + 1) * 4
+        flags = footer[8:10]
+
+        index_start = pos - 12 - backward_size
+        if index_start < 12:
+            raise lzma.LZMAError("Corrupt xz index")
+        fp.seek(index_start)
+        index = fp.read(backward_size)
+        if index[0] != 0 or struct.unpack('<I', index[-4:])[0] != zlib.crc32(index[:-4]):
+            raise lzma.LZMAError("Corrupt xz index")
+
+        count, i = _read_vli(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded_size, i = _read_vli(index, i)
+            uncompressed_size, i = _read_vli(index, i)
+            records.append((unpadded_size, uncompressed_size))
+
+        stream_start = index_start - sum(_round4(u) for u, _ in records) - 12
+        if stream_start < 0:
+            raise lzma.LZMAError("Corrupt xz index")
+        fp.seek(stream_start)
+        if fp.read(12)[:6] != HEADER_MAGIC:
+            raise lzma.LZMAError("Missing xz stream header")
+
+        blocks = []
+        offset = stream_start + 12
+        for unpadded_size, uncompressed_size in records:
+            blocks.append((offset, unpadded_size, uncompressed_size))
+            offset += _round4(unpadded_size)
+        streams.insert(0, (flags, blocks))
+        pos = stream_start
+    return streams
+
+def _decompress_block(flags, block, unpadded_size, uncompressed_size):
+    # Wrap the block in a one-block stream so liblzma checks its integrity
+    index = _index([(unpadded_size, uncompressed_size)])
+    stream = _stream_header(flags) + block + index + _stream_footer(flags, len(index))
+    return lzma.decompress(stream, format=lzma.FORMAT_XZ)
+
+def can_decompress_parallel(streams):
+    blocks = [b for _, stream_blocks in streams for b in stream_blocks]
+    return len(blocks) > 1 and all(b[2] <= MAX_PARALLEL_BLOCK for b in blocks)
+
+class XZBlockReader(io.RawIOBase):
+    # Readable stream over an xz file whose blocks are decoded concurrently,
+    # a bounded number ahead of the reader. With an opener, workers also
+    # read their blocks, each through a handle of its own (e.g. from
+    # different volumes of a split archive at once).
+    def __init__(self, fp, streams, workers=1, opener=None):
+        super().__init__()
+        self._fp = fp
+        self._opener = opener
+        self._local = threading.local()
+        self._handles = []
+        self._handles_lock = threading.Lock()
+        self._blocks = iter([
+            (flags, offset, unpadded_size, uncompressed_size)
+            for flags, blocks in streams
+            for offset, unpadded_size, uncompressed_size in blocks
+        ])
+        self._workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self._workers)
+        self._pending = deque()
+        self._buffer = b''
+        self._offset = 0
+        self._fill()
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        while len(self._pending) < self._workers * 2:
+            block = next(self._blocks, None)
+            if block is None:
+                return
+            if self._opener is not None:
+                self._pending.append(self._pool.submit(self._read_block, *block))
+                continue
+            flags, offset, unpadded_size, uncompressed_size = block
+            self._fp.seek(offset)
+            data = self._fp.read(_round4(unpadded_size))
+            self._pending.append(self._pool.submit(
+                _decompress_block, flags, data, unpadded_size, uncompressed_size
+            ))
+
+    def _read_block(self, flags, offset, unpadded_size, uncompressed_size):
+        fp = getattr(self._local, 'fp', None)
+        if fp is None:
+            fp = self._local.fp = self._opener()
+            with self._handles_lock:
+                self._handles.append(fp)
+        fp.seek(offset)
+        data = fp.read(_round4(unpadded_size))
+        return _decompress_block(flags, data, unpadded_size, uncompressed_size)
+
+    def readinto(self, b):
+        while self._offset >= len(self._buffer):
+            if not self._pending:
+                return 0
+            self._buffer = self._pending.popleft().result()
+            self._offset = 0
+            self._fill()
+        n = min(len(b), len(self._buffer) - self._offset)
+        b[:n] = self._buffer[self._offset:self._offset + n]
+        self._offset += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pending.clear()
+            for fp in self._handles:
+                fp.close()
+        super().close()
+
+class XZSeekableReader(io.RawIOBase):
+    # Seekable view of an xz file. Blocks are independent, so reading at an
+    # offset only decodes from the start of the block that holds it; moving
+    # forward inside the current block keeps decoding where it left off.
+    def __init__(self, fp, streams, chunk_size=1024 * 1024):
+        super().__init__()
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._blocks = []  # (start, flags, offset, unpadded_size, uncompressed_size)
+        start = 0
+        for flags, blocks in streams:
+            for offset, unpadded_size, uncompressed_size in blocks:
+                self._blocks.append((start, flags, offset, unpadded_size, uncompressed_size))
+                start += uncompressed_size
+        self._starts = [b[0] for b in self._blocks]
+        self.size = start
+        self._pos = 0
+        self._block = None
+        self._decoder = None
+        self._decoded = 0   # stream position the decoder has reached
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def _start_block(self, index):
+        start, flags, offset, unpadded_size, uncompressed_size = self._blocks[index]
+        # The block is decoded as a one-block stream, so liblzma checks its
+        # integrity when the end is reached
+        self._decoder = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        self._decoder.decompress(_stream_header(flags))
+        record = _index([(unpadded_size, uncompressed_size)])
+        self._tail = record + _stream_footer(flags, len(record))
+        self._in_pos = offset
+        self._in_end = offset + _round4(unpadded_size)
+        self._block = index
+        self._decoded = start
+
+    def _decode(self, size):
+        while True:
+            if self._decoder.needs_input:
+                if self._in_pos < self._in_end:
+                    self._fp.seek(self._in_pos)
+                    data = self._fp.read(min(self._chunk_size, self._in_end - self._in_pos))
+                    if not data:
+                        raise EOFError("Compressed file ended before the end-of-stream marker")
+                    self._in_pos += len(data)
+                elif self._tail:
+                    data, self._tail = self._tail, b''
+                else:
+                    raise EOFError("Compressed file ended before the end-of-stream marker")
+            else:
+                data = b''
+            out = self._decoder.decompress(data, size)
+            if out:
+                self._decoded += len(out)
+                return out
+
+    def readinto(self, b):
+        if self._pos >= self.size:
+            return 0
+        index = bisect.bisect_right(self._starts, self._pos) - 1
+        if index != self._block or self._pos < self._decoded:
+            self._start_block(index)
+        while self._decoded < self._pos:
+            self._decode(min(self._chunk_size, self._pos - self._decoded))
+        start, _, _, _, uncompressed_size = self._blocks[index]
+        data = self._decode(min(len(b), start + uncompressed_size - self._pos))
+        n = len(data)
+        b[:n] = data
+        self._pos += n
+        return n
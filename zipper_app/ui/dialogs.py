@@ -4,9 +4,70 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QPushButton,
                             QHBoxLayout, QCheckBox, QDateTimeEdit, QTableWidget,
                             QTableWidgetItem, QHeaderView, QCalendarWidget, QTimeEdit,
                             QGroupBox, QMessageBox, QCalendarWidget, QTimeEdit, QScrollArea)
-from PyQt6.QtCore import Qt, QDateTime, QSize
+from PyQt6.QtCore import Qt, QDateTime, QSize, QTime
 from PyQt6.QtGui import QIcon
-from ..features.compression import CompressionProfile
+from ..features.compression import FRAME_PROFILES, CompressionProfile
+from ..features.frames import LEVELS
+from ..features.scheduler import CATCH_UP_RUN, CATCH_UP_SKIP
+from ..features.governor import MIN_MEMORY
+
+class ResourceLimitsGroup(QGroupBox):
+    # Optional caps on what a job takes of the machine; the settings dict
+    # goes to ResourceLimits.from_settings
+    def __init__(self, limits=None, parent=None):
+        super().__init__("Limit resources", parent)
+        limits = limits or {}
+        self.setCheckable(True)
+        self.setChecked(any(limits.values()))
+        form = QFormLayout(self)
+        
+        self.cores_spin = QSpinBox()
+        self.cores_spin.setRange(0, 256)
+        self.cores_spin.setSpecialValueText("No limit")
+        self.cores_spin.setValue(limits.get("cores") or 0)
+        form.addRow("CPU Cores:", self.cores_spin)
+        
+        self.nice_spin = QSpinBox()
+        self.nice_spin.setRange(0, 19)
+        self.nice_spin.setSpecialValueText("Normal")
+        self.nice_spin.setToolTip("CPU priority: higher values give way to other programs more")
+        self.nice_spin.setValue(limits.get("nice") or 0)
+        form.addRow("Niceness:", self.nice_spin)
+        
+        self.io_combo = QComboBox()
+        self.io_combo.addItem("Normal", None)
+        self.io_combo.addItem("Low", "low")
+        self.io_combo.addItem("Idle only", "idle")
+        self.io_combo.setCurrentIndex(max(0, self.io_combo.findData(limits.get("io_class"))))
+        form.addRow("Disk Priority:", self.io_combo)
+        
+        self.bandwidth_spin = QSpinBox()
+        self.bandwidth_spin.setRange(0, 100000)
+        self.bandwidth_spin.setSuffix(" MB/s")
+        self.bandwidth_spin.setSpecialValueText("No limit")
+        # Rounded up, so a limit set below 1 MB/s elsewhere is not lost
+        self.bandwidth_spin.setValue(-(-(limits.get("bandwidth") or 0) // 2 ** 20))
+        form.addRow("Read Bandwidth:", self.bandwidth_spin)
+        
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(0, 1024 * 1024)
+        self.memory_spin.setSingleStep(64)
+        self.memory_spin.setSuffix(" MB")
+        self.memory_spin.setSpecialValueText("No limit")
+        self.memory_spin.setValue(-(-(limits.get("memory") or 0) // 2 ** 20))
+        form.addRow("Memory:", self.memory_spin)
+    
+    def get_limits(self):
+        if not self.isChecked():
+            return {}
+        memory = self.memory_spin.value() * 2 ** 20
+        return {
+            "cores": self.cores_spin.value() or None,
+            "nice": self.nice_spin.value() or None,
+            "io_class": self.io_combo.currentData(),
+            "bandwidth": self.bandwidth_spin.value() * 2 ** 20 or None,
+            "memory": max(memory, MIN_MEMORY) if memory else None
+        }
 
 class ScheduleDialog(QDialog):
     def __init__(self, parent=None):
@@ -18,6 +79,31 @@ class ScheduleDialog(QDialog):
         self.datetime_edit = QDateTimeEdit(QDateTime.currentDateTime())
         self.datetime_edit.setCalendarPopup(True)
         form.addRow("Schedule Time:", self.datetime_edit)
+        
+        self.priority_spin = QSpinBox()
+        self.priority_spin.setRange(-10, 10)
+        self.priority_spin.setToolTip("Jobs due at the same time run highest priority first")
+        form.addRow("Priority:", self.priority_spin)
+        
+        # Off-hours window, e.g. 01:00 to 05:00
+        window_layout = QHBoxLayout()
+        self.window_check = QCheckBox("Only between")
+        self.window_start = QTimeEdit(QTime(1, 0))
+        self.window_end = QTimeEdit(QTime(5, 0))
+        for edit in (self.window_start, self.window_end):
+            edit.setDisplayFormat("HH:mm")
+            edit.setEnabled(False)
+            self.window_check.toggled.connect(edit.setEnabled)
+        window_layout.addWidget(self.window_check)
+        window_layout.addWidget(self.window_start)
+        window_layout.addWidget(QLabel("and"))
+        window_layout.addWidget(self.window_end)
+        form.addRow("Time Window:", window_layout)
+        
+        self.catch_up_combo = QComboBox()
+        self.catch_up_combo.addItem("Run it as soon as possible", CATCH_UP_RUN)
+        self.catch_up_combo.addItem("Skip it", CATCH_UP_SKIP)
+        form.addRow("If Zipper was closed at that time:", self.catch_up_combo)
         layout.addLayout(form)
         
         buttons = QDialogButtonBox(
@@ -30,6 +116,76 @@ class ScheduleDialog(QDialog):
     
     def get_schedule_time(self):
         return self.datetime_edit.dateTime()
+    
+    def get_schedule(self):
+        # Keyword arguments for Scheduler.add
+        window = None
+        if self.window_check.isChecked():
+            window = (f"{self.window_start.time().toString('HH:mm')}-"
+                      f"{self.window_end.time().toString('HH:mm')}")
+        return {
+            "when": self.datetime_edit.dateTime().toSecsSinceEpoch(),
+            "priority": self.priority_spin.value(),
+            "window": window,
+            "catch_up": self.catch_up_combo.currentData()
+        }
+
+class ScheduledJobsDialog(QDialog):
+    def __init__(self, jobs, max_running=1, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Scheduled Jobs")
+        self.jobs = sorted(jobs, key=lambda job: (-job["priority"], job["when"], job["id"]))
+        self.removed = []
+        
+        layout = QVBoxLayout(self)
+        
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Archive", "Start", "Window", "Priority", "State"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.update_table()
+        layout.addWidget(self.table)
+        
+        remove_btn = QPushButton("Remove")
+        remove_btn.clicked.connect(self.remove_job)
+        layout.addWidget(remove_btn)
+        
+        form = QFormLayout()
+        self.max_running_spin = QSpinBox()
+        self.max_running_spin.setRange(1, 16)
+        self.max_running_spin.setValue(max_running)
+        form.addRow("Jobs at Once:", self.max_running_spin)
+        layout.addLayout(form)
+        
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.resize(600, 300)
+    
+    def update_table(self):
+        self.table.setRowCount(len(self.jobs))
+        for row, job in enumerate(self.jobs):
+            start = QDateTime.fromSecsSinceEpoch(int(job["when"])).toString('yyyy-MM-dd hh:mm')
+            for column, text in enumerate((job["output"], start, job["window"] or "Any time",
+                                           str(job["priority"]), job["state"].capitalize())):
+                self.table.setItem(row, column, QTableWidgetItem(text))
+    
+    def remove_job(self):
+        current = self.table.currentRow()
+        if current >= 0:
+            self.removed.append(self.jobs.pop(current)["id"])
+            self.update_table()
+    
+    def get_removed(self):
+        return self.removed
+    
+    def get_max_running(self):
+        return self.max_running_spin.value()
 
 class MonitoredFolderDialog(QDialog):
     def __init__(self, parent=None):
@@ -53,14 +209,54 @@ class MonitoredFolderDialog(QDialog):
         self.patterns_edit.setPlaceholderText("*.txt, *.pdf, etc.")
         form.addRow("File Patterns:", self.patterns_edit)
         
+        self.exclude_edit = QLineEdit()
+        self.exclude_edit.setPlaceholderText("*.tmp, *.part, etc.")
+        form.addRow("Exclude Patterns:", self.exclude_edit)
+        
+        # Whole subtrees that are never looked at
+        self.ignore_dirs_edit = QLineEdit(".git, node_modules")
+        form.addRow("Ignored Folders:", self.ignore_dirs_edit)
+        
         # Minimum file size
         self.min_size = QSpinBox()
         self.min_size.setRange(0, 1000000)
         self.min_size.setSuffix(" KB")
         form.addRow("Minimum File Size:", self.min_size)
         
+        self.max_size = QSpinBox()
+        self.max_size.setRange(0, 1000000)
+        self.max_size.setSuffix(" MB")
+        self.max_size.setSpecialValueText("No limit")
+        form.addRow("Maximum File Size:", self.max_size)
+        
+        self.max_age = QSpinBox()
+        self.max_age.setRange(0, 3650)
+        self.max_age.setSuffix(" days")
+        self.max_age.setSpecialValueText("No limit")
+        self.max_age.setToolTip("Ignore files last modified longer ago, e.g. restored backups")
+        form.addRow("Maximum File Age:", self.max_age)
+        
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(["Fast", "Normal", "Maximum", "Zstandard", "LZ4"])
+        self.profile_combo.setCurrentText(CompressionProfile.NORMAL)
+        form.addRow("Compression Profile:", self.profile_combo)
+        
+        self.auto_delete_check = QCheckBox("Delete originals once compressed")
+        form.addRow("", self.auto_delete_check)
+        
+        # Deduplicated storage
+        self.dedup_check = QCheckBox("Store in a deduplicated chunk store")
+        self.dedup_check.setToolTip(
+            "Split files into content-defined chunks and keep each unique chunk "
+            "only once. Best for rotated logs and repeated exports."
+        )
+        form.addRow("", self.dedup_check)
+        
         layout.addLayout(form)
         
+        self.limits_group = ResourceLimitsGroup(parent=self)
+        layout.addWidget(self.limits_group)
+        
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok |
             QDialogButtonBox.StandardButton.Cancel
@@ -78,11 +274,20 @@ class MonitoredFolderDialog(QDialog):
         return {
             "folder": self.folder_edit.text(),
             "patterns": [p.strip() for p in self.patterns_edit.text().split(",")],
-            "min_size": self.min_size.value() * 1024  # Convert KB to bytes
+            "exclude": [p.strip() for p in self.exclude_edit.text().split(",") if p.strip()],
+            "ignore_dirs": [d.strip() for d in self.ignore_dirs_edit.text().split(",")
+                            if d.strip()],
+            "min_size": self.min_size.value() * 1024,  # Convert KB to bytes
+            "max_size": self.max_size.value() * 1024 * 1024 or None,
+            "max_age": self.max_age.value() * 86400 or None,
+            "profile": self.profile_combo.currentText(),
+            "auto_delete": self.auto_delete_check.isChecked(),
+            "storage": "dedup" if self.dedup_check.isChecked() else "archive",
+            "limits": self.limits_group.get_limits()
         }
 
 class MonitorSettingsDialog(QDialog):
-    def __init__(self, monitors, parent=None):
+    def __init__(self, monitors, workers=1, folder_limit=1, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Folder Monitor Settings")
         self.monitors = monitors.copy()
@@ -107,6 +312,20 @@ class MonitorSettingsDialog(QDialog):
         
         layout.addLayout(button_layout)
         
+        # Shared by all monitored folders
+        form = QFormLayout()
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 64)
+        self.workers_spin.setValue(workers)
+        form.addRow("Compression Workers:", self.workers_spin)
+        
+        self.folder_limit_spin = QSpinBox()
+        self.folder_limit_spin.setRange(1, 64)
+        self.folder_limit_spin.setValue(folder_limit)
+        self.folder_limit_spin.setToolTip("Batches of one folder compressed at the same time")
+        form.addRow("Per Folder:", self.folder_limit_spin)
+        layout.addLayout(form)
+        
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok |
             QDialogButtonBox.StandardButton.Cancel
@@ -134,9 +353,12 @@ class MonitorSettingsDialog(QDialog):
     
     def get_monitors(self):
         return self.monitors
+    
+    def get_limits(self):
+        return self.workers_spin.value(), self.folder_limit_spin.value()
 
 class FilePreviewDialog(QDialog):
-    def __init__(self, files, parent=None):
+    def __init__(self, files, parent=None, limits=None, volume_size=None):
         super().__init__(parent)
         self.setWindowTitle("Compression Settings")
         self.files = files
@@ -146,17 +368,44 @@ class FilePreviewDialog(QDialog):
         # File list
         layout.addWidget(QLabel("Files to compress:"))
         list_widget = QListWidget()
-        for file in files:
-            list_widget.addItem(file)
+        if hasattr(files, "describe"):
+            # A folder scan only finds its files while compressing
+            scan = files.describe()
+            where = "and its subfolders" if scan["recursive"] else "only"
+            list_widget.addItem(f"{', '.join(scan['patterns'])} in {scan['root']} {where}")
+        else:
+            for file in files:
+                list_widget.addItem(file)
         layout.addWidget(list_widget)
         
         # Compression profile
         form = QFormLayout()
         self.profile_combo = QComboBox()
-        self.profile_combo.addItems(["Fast", "Normal", "Maximum"])
+        self.profile_combo.addItems(["Fast", "Normal", "Maximum", "Zstandard", "LZ4"])
         form.addRow("Compression Profile:", self.profile_combo)
+        
+        # Only Zstandard and LZ4 have a choice of levels
+        self.level_spin = QSpinBox()
+        self.level_spin.setToolTip("Lower levels are faster, higher ones compress better")
+        form.addRow("Level:", self.level_spin)
+        self.profile_combo.currentTextChanged.connect(self.update_level)
+        self.update_level(self.profile_combo.currentText())
+        
+        # For file systems and object stores with a size limit per file
+        self.volume_spin = QSpinBox()
+        self.volume_spin.setRange(0, 1024 * 1024)
+        self.volume_spin.setSingleStep(100)
+        self.volume_spin.setSuffix(" MB")
+        self.volume_spin.setSpecialValueText("Don't split")
+        self.volume_spin.setToolTip("Split the archive into volumes of this size "
+                                    "(archive.zip.001, archive.zip.002, ...)")
+        self.volume_spin.setValue((volume_size or 0) // 2 ** 20)
+        form.addRow("Split into Volumes:", self.volume_spin)
         layout.addLayout(form)
         
+        self.limits_group = ResourceLimitsGroup(limits, self)
+        layout.addWidget(self.limits_group)
+        
         # Buttons
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok |
@@ -166,9 +415,21 @@ class FilePreviewDialog(QDialog):
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
     
+    def update_level(self, profile):
+        fmt = FRAME_PROFILES.get(profile)
+        self.level_spin.setEnabled(fmt is not None)
+        if fmt is not None:
+            lowest, highest, default = LEVELS[fmt]
+            self.level_spin.setRange(lowest, highest)
+            self.level_spin.setValue(default)
+    
     def get_settings(self):
+        profile = self.profile_combo.currentText()
         return {
-            "profile": self.profile_combo.currentText()
+            "profile": profile,
+            "level": self.level_spin.value() if profile in FRAME_PROFILES else None,
+            "limits": self.limits_group.get_limits(),
+            "volume_size": self.volume_spin.value() * 2 ** 20 or None
         }
 
 class BatchProcessDialog(QDialog):
@@ -193,6 +454,13 @@ class BatchProcessDialog(QDialog):
         self.filters_edit.setPlaceholderText("*.txt, *.pdf, etc.")
         form.addRow("File Filters:", self.filters_edit)
         
+        self.recursive_check = QCheckBox("Include subfolders")
+        form.addRow("", self.recursive_check)
+        
+        # Incremental update option
+        self.update_check = QCheckBox("Only update changed files in an existing archive")
+        form.addRow("", self.update_check)
+        
         # Schedule option
         self.schedule_check = QCheckBox("Schedule for later")
         form.addRow("", self.schedule_check)
@@ -216,6 +484,8 @@ class BatchProcessDialog(QDialog):
         return {
             "source_dir": self.dir_edit.text(),
             "filters": [f.strip() for f in self.filters_edit.text().split(",") if f.strip()],
+            "recursive": self.recursive_check.isChecked(),
+            "update": self.update_check.isChecked(),
             "schedule": self.schedule_check.isChecked()
         }
 
@@ -306,7 +576,7 @@ class ExtractDialog(QDialog):
             self,
             "Select Archive",
             "",
-            "Archives (*.zip *.7z *.xz)"
+            "Archives (*.zip *.7z *.xz *.zst *.lz4 *.zstore *.enc *.001)"
         )
         if file:
             self.archive_edit.setText(file)
@@ -319,215 +589,6 @@ class ExtractDialog(QDialog):
     def get_paths(self):
         return self.archive_edit.text(), self.output_edit.text()
 
-class OldScheduleDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Schedule Compression")
-        self.setMinimumSize(400, 500)
-        
-        layout = QVBoxLayout()
-        
-        # Date selection
-        date_group = QGroupBox("Date")
-        date_layout = QVBoxLayout()
-        self.calendar = QCalendarWidget()
-        date_layout.addWidget(self.calendar)
-        date_group.setLayout(date_layout)
-        layout.addWidget(date_group)
-        
-        # Time selection
-        time_group = QGroupBox("Time")
-        time_layout = QVBoxLayout()
-        self.time_edit = QTimeEdit()
-        self.time_edit.setDisplayFormat("HH:mm")
-        time_layout.addWidget(self.time_edit)
-        time_group.setLayout(time_layout)
-        layout.addWidget(time_group)
-        
-        # Buttons
-        button_layout = QHBoxLayout()
-        ok_button = QPushButton("Schedule")
-        ok_button.clicked.connect(self.accept)
-        cancel_button = QPushButton("Cancel")
-        cancel_button.clicked.connect(self.reject)
-        button_layout.addWidget(ok_button)
-        button_layout.addWidget(cancel_button)
-        layout.addLayout(button_layout)
-        
-        self.setLayout(layout)
-    
-    def get_schedule_time(self):
-        date = self.calendar.selectedDate()
-        time = self.time_edit.time()
-        return QDateTime(date, time)
-
-class OldMonitoredFolderDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Add Monitored Folder")
-        self.setMinimumSize(500, 400)
-        
-        layout = QVBoxLayout()
-        
-        # Folder selection
-        folder_group = QGroupBox("Folder Selection")
-        folder_layout = QHBoxLayout()
-        self.folder_label = QLabel("No folder selected")
-        select_btn = QPushButton("Select Folder")
-        select_btn.clicked.connect(self.select_folder)
-        folder_layout.addWidget(self.folder_label)
-        folder_layout.addWidget(select_btn)
-        folder_group.setLayout(folder_layout)
-        layout.addWidget(folder_group)
-        
-        # File patterns
-        patterns_group = QGroupBox("File Patterns")
-        patterns_layout = QVBoxLayout()
-        patterns_layout.addWidget(QLabel("Enter file patterns to monitor (comma separated):"))
-        self.patterns_edit = QLineEdit()
-        self.patterns_edit.setPlaceholderText("*.txt, *.docx, *.pdf")
-        patterns_layout.addWidget(self.patterns_edit)
-        patterns_group.setLayout(patterns_layout)
-        layout.addWidget(patterns_group)
-        
-        # Compression settings
-        compress_group = QGroupBox("Compression Settings")
-        compress_layout = QVBoxLayout()
-        
-        # Profile selection
-        profile_layout = QHBoxLayout()
-        profile_layout.addWidget(QLabel("Compression Profile:"))
-        self.profile_combo = QComboBox()
-        self.profile_combo.addItems(CompressionProfile.get_default_profiles().keys())
-        profile_layout.addWidget(self.profile_combo)
-        compress_layout.addLayout(profile_layout)
-        
-        # Minimum file size
-        size_layout = QHBoxLayout()
-        size_layout.addWidget(QLabel("Minimum File Size (KB):"))
-        self.size_spin = QSpinBox()
-        self.size_spin.setRange(0, 1000000)
-        self.size_spin.setValue(100)
-        size_layout.addWidget(self.size_spin)
-        compress_layout.addLayout(size_layout)
-        
-        # Auto-delete option
-        self.delete_check = QCheckBox("Delete original files after compression")
-        compress_layout.addWidget(self.delete_check)
-        
-        compress_group.setLayout(compress_layout)
-        layout.addWidget(compress_group)
-        
-        # Buttons
-        button_layout = QHBoxLayout()
-        ok_button = QPushButton("Add Monitor")
-        ok_button.clicked.connect(self.validate_and_accept)
-        cancel_button = QPushButton("Cancel")
-        cancel_button.clicked.connect(self.reject)
-        button_layout.addWidget(ok_button)
-        button_layout.addWidget(cancel_button)
-        layout.addLayout(button_layout)
-        
-        self.setLayout(layout)
-        self.folder_path = None
-    
-    def select_folder(self):
-        folder = QFileDialog.getExistingDirectory(
-            self,
-            "Select Folder to Monitor"
-        )
-        if folder:
-            self.folder_path = folder
-            self.folder_label.setText(folder)
-    
-    def validate_and_accept(self):
-        if not self.folder_path:
-            QMessageBox.warning(self, "Error", "Please select a folder to monitor!")
-            return
-        if not self.patterns_edit.text().strip():
-            QMessageBox.warning(self, "Error", "Please enter at least one file pattern!")
-            return
-        self.accept()
-    
-    def get_settings(self):
-        return {
-            "folder": self.folder_path,
-            "patterns": [p.strip() for p in self.patterns_edit.text().split(",") if p.strip()],
-            "profile": self.profile_combo.currentText(),
-            "min_size": self.size_spin.value() * 1024,  # Convert KB to bytes
-            "auto_delete": self.delete_check.isChecked()
-        }
-
-class OldMonitorSettingsDialog(QDialog):
-    def __init__(self, monitors, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Folder Monitors")
-        self.setMinimumSize(800, 500)
-        
-        layout = QVBoxLayout()
-        
-        # Monitors table
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels([
-            "Folder", "Patterns", "Profile", "Min Size", "Auto-Delete"
-        ])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
-        
-        # Add monitors to table
-        self.update_table(monitors)
-        layout.addWidget(self.table)
-        
-        # Buttons
-        button_layout = QHBoxLayout()
-        
-        add_button = QPushButton("Add Monitor")
-        add_button.clicked.connect(self.add_monitor)
-        button_layout.addWidget(add_button)
-        
-        remove_button = QPushButton("Remove Selected")
-        remove_button.clicked.connect(self.remove_monitor)
-        button_layout.addWidget(remove_button)
-        
-        close_button = QPushButton("Close")
-        close_button.clicked.connect(self.accept)
-        button_layout.addWidget(close_button)
-        
-        layout.addLayout(button_layout)
-        self.setLayout(layout)
-        
-        self.monitors = monitors.copy()
-    
-    def update_table(self, monitors):
-        self.table.setRowCount(len(monitors))
-        for i, monitor in enumerate(monitors):
-            self.table.setItem(i, 0, QTableWidgetItem(monitor["folder"]))
-            self.table.setItem(i, 1, QTableWidgetItem(", ".join(monitor["patterns"])))
-            self.table.setItem(i, 2, QTableWidgetItem(monitor["profile"]))
-            self.table.setItem(i, 3, QTableWidgetItem(f"{monitor['min_size'] // 1024} KB"))
-            self.table.setItem(i, 4, QTableWidgetItem("Yes" if monitor["auto_delete"] else "No"))
-    
-    def add_monitor(self):
-        dialog = OldMonitoredFolderDialog(self)
-        if dialog.exec():
-            settings = dialog.get_settings()
-            self.monitors.append(settings)
-            self.update_table(self.monitors)
-    
-    def remove_monitor(self):
-        selected_rows = set(item.row() for item in self.table.selectedItems())
-        if not selected_rows:
-            return
-        
-        # Remove from bottom to top to avoid index shifting
-        for row in sorted(selected_rows, reverse=True):
-            self.monitors.pop(row)
-        
-        self.update_table(self.monitors)
-    
-    def get_monitors(self):
-        return self.monitors
-
 class HelpDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)